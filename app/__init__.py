@@ -1,65 +1,168 @@
 from flask import Flask, render_template
 from flask_pymongo import PyMongo
 from flask_login import LoginManager, login_required
+from pymongo.read_preferences import SecondaryPreferred
 from .config import Config
-import logging
+from .logging_setup import setup_logging
 from datetime import datetime
+import os
 
 mongo = PyMongo()
 login_manager = LoginManager()
 event_service = None
 contact_service = None
+segment_service = None
 sms_service = None
+delivery_status_service = None
 user_service = None
 registration_code_service = None
+job_history_service = None
+sweep_coordinator = None
+deadline_tracker = None
+reactive_engine = None
 task_scheduler = None
 
 def create_app(config_class=Config):
+    """
+    Build the app in two phases. This function is the pre-fork phase: config,
+    services, blueprints and compiled templates, with no connections opened
+    and no threads started, so under `gunicorn --preload` the master builds
+    it once and workers share it copy-on-write. init_worker() is the
+    post-fork phase; it runs here unless DEFER_WORKER_INIT is set, in which
+    case gunicorn.conf.py calls it in each worker.
+    """
     app = Flask(__name__)
     app.config.from_object(config_class)
 
-    # Setup basic app logging
-    logging.basicConfig(level=logging.INFO)
-    
-    # Initialize MongoDB
+    # Initialize MongoDB; the client only connects on first use (connect=False)
     mongo.init_app(app)
 
+    # Indexes are managed by `flask indexes sync`; workers only verify them
+    from .indexes import indexes_cli
+    app.cli.add_command(indexes_cli)
+
     # Initialize Flask-Login
     login_manager.init_app(app)
     login_manager.login_view = 'auth.login'
     login_manager.login_message_category = 'info'
 
     # Initialize services
-    global event_service, contact_service, sms_service, user_service, registration_code_service, task_scheduler
+    global event_service, contact_service, segment_service, sms_service, delivery_status_service, user_service, registration_code_service
+    global job_history_service, sweep_coordinator, deadline_tracker, reactive_engine
     from .services.event_service import EventService
+    from .services.over_invite import OverInvitePolicy
     from .services.contact_service import ContactService
+    from .services.segment_service import SegmentService
     from .services.sms_service import SMSService
+    from .services.message_templates import MessageTemplateRegistry
+    from .services.delivery_status_service import DeliveryStatusService
     from .services.user_service import UserService
+    from .services.password_hasher import PasswordHasher
     from .services.registration_code_service import RegistrationCodeService
-    from .scheduler import TaskScheduler
+    from .services.job_history_service import JobHistoryService
+    from .services.sweep_coordinator import SweepCoordinator
+    from .services.deadline_tracker import DeadlineTracker
+    from .services.reactive_engine import ReactiveEngine
     
     # Initialize SMS service first since EventService needs it
     sms_service = SMSService(
         app.config['TWILIO_SID'],
         app.config['TWILIO_AUTH_TOKEN'],
-        app.config['TWILIO_PHONE']
+        app.config['TWILIO_PHONE'],
+        api_base_url=app.config['TWILIO_API_BASE_URL'],
+        rsvp_base_url=app.config['RSVP_BASE_URL'],
+        max_messages_per_day=app.config['SMS_MAX_PER_DAY'],
+        max_messages_per_second=app.config['SMS_MAX_PER_SECOND'],
+        sender_pool=app.config['TWILIO_PHONE_POOL'],
+        messaging_service_sid=app.config['TWILIO_MESSAGING_SERVICE_SID'],
+        sender_max_wait=app.config['SMS_SENDER_MAX_WAIT'],
+        status_callback_url=app.config['SMS_STATUS_CALLBACK_URL'],
+        templates=MessageTemplateRegistry(mongo.db, refresh_seconds=app.config['MESSAGE_TEMPLATE_REFRESH_SECONDS'])
     )
     
+    # Per-invitee deadline timers, fed by EventService and optionally the change stream
+    if app.config['DEADLINE_TIMERS_ENABLED'] or app.config['REACTIVE_ENGINE_ENABLED']:
+        deadline_tracker = DeadlineTracker(
+            mongo.db,
+            invitation_expiry_hours=app.config['INVITATION_EXPIRY_HOURS'],
+            lease_seconds=app.config['DEADLINE_LEASE_SECONDS'],
+            refresh_seconds=app.config['DEADLINE_REFRESH_SECONDS'],
+            refill_backoff_seconds=app.config['DEADLINE_REFILL_BACKOFF_SECONDS']
+        )
+
+    # Reads that tolerate bounded staleness; everything else stays on the primary
+    reporting_db = mongo.db
+    if app.config['SECONDARY_READS_ENABLED']:
+        reporting_db = mongo.db.with_options(
+            read_preference=SecondaryPreferred(max_staleness=app.config['SECONDARY_MAX_STALENESS_SECONDS'])
+        )
+
     # Initialize services
+    over_invite = OverInvitePolicy(
+        reporting_db,
+        max_factor=app.config['OVER_INVITE_MAX_FACTOR'],
+        prior_weight=app.config['OVER_INVITE_PRIOR_WEIGHT'],
+        min_samples=app.config['OVER_INVITE_MIN_SAMPLES'],
+        history_events=app.config['OVER_INVITE_HISTORY_EVENTS'],
+        refresh_seconds=app.config['OVER_INVITE_HISTORY_REFRESH_SECONDS']
+    )
     event_service = EventService(
         db=mongo.db,
         sms_service=sms_service,
-        invitation_expiry_hours=app.config['INVITATION_EXPIRY_HOURS']
+        invitation_expiry_hours=app.config['INVITATION_EXPIRY_HOURS'],
+        write_batch_size=app.config['SWEEP_WRITE_BATCH_SIZE'],
+        write_flush_interval=app.config['SWEEP_WRITE_FLUSH_SECONDS'],
+        deadline_tracker=deadline_tracker,
+        reporting_db=reporting_db,
+        over_invite=over_invite,
+        over_invite_default=app.config['OVER_INVITE_DEFAULT'],
+        waitlist_enabled=app.config['WAITLIST_ENABLED'],
+        vectorize_min_invitees=app.config['DEADLINE_VECTORIZE_MIN_INVITEES']
+    )
+    delivery_status_service = DeliveryStatusService(
+        mongo.db,
+        deadline_tracker=deadline_tracker,
+        batch_size=app.config['DELIVERY_STATUS_BATCH_SIZE'],
+        flush_interval=app.config['DELIVERY_STATUS_FLUSH_SECONDS'],
+        retry_seconds=app.config['DELIVERY_STATUS_RETRY_SECONDS']
     )
-    contact_service = ContactService(mongo.db)
-    user_service = UserService(mongo.db)
+    segment_service = SegmentService(
+        mongo.db,
+        reporting_db=reporting_db,
+        export_batch_size=app.config['SEGMENT_BATCH_SIZE']
+    )
+    contact_service = ContactService(
+        mongo.db,
+        reporting_db=reporting_db,
+        import_batch_size=app.config['CONTACT_IMPORT_BATCH_SIZE'],
+        import_max_errors=app.config['CONTACT_IMPORT_MAX_ERRORS'],
+        segments=segment_service
+    )
+    password_hasher = PasswordHasher(
+        rounds=app.config['BCRYPT_ROUNDS'],
+        max_workers=app.config['PASSWORD_HASH_WORKERS'],
+        max_pending=app.config['PASSWORD_HASH_MAX_PENDING'],
+        acquire_timeout=app.config['PASSWORD_HASH_TIMEOUT']
+    )
+    user_service = UserService(mongo.db, password_hasher=password_hasher)
     registration_code_service = RegistrationCodeService(mongo.db)
-
-    # Initialize scheduler with app context
-    if app.config.get('SCHEDULER_ENABLED', True):
-        task_scheduler = TaskScheduler.get_instance()
-        task_scheduler.init_app(app, event_service, sms_service)
-        app.logger.info('Task scheduler initialized and started')
+    job_history_service = JobHistoryService(
+        mongo.db,
+        max_bytes=app.config['JOB_HISTORY_MAX_BYTES'],
+        max_runs=app.config['JOB_HISTORY_MAX_RUNS'],
+        reporting_db=reporting_db
+    )
+    if app.config['SWEEP_PARTITIONS'] > 1:
+        sweep_coordinator = SweepCoordinator(
+            mongo.db,
+            event_service,
+            partitions=app.config['SWEEP_PARTITIONS'],
+            lease_seconds=app.config['SWEEP_LEASE_SECONDS'],
+            max_workers=app.config['SWEEP_WORKERS'],
+            sms_max_per_second=app.config['SMS_MAX_PER_SECOND'] * len(sms_service.senders)
+        )
+    if app.config['REACTIVE_ENGINE_ENABLED']:
+        reactive_engine = ReactiveEngine(mongo.db, deadline_tracker)
 
     # User loader for Flask-Login
     @login_manager.user_loader
@@ -75,11 +178,15 @@ def create_app(config_class=Config):
     from .routes.contact_routes import bp as contact_bp
     from .routes.sms_routes import bp as sms_bp
     from .routes.auth_routes import bp as auth_bp
+    from .routes.metrics_routes import bp as metrics_bp
+    from .routes.admin_routes import bp as admin_bp
     
     app.register_blueprint(event_bp)
     app.register_blueprint(contact_bp)
     app.register_blueprint(sms_bp)
     app.register_blueprint(auth_bp)
+    app.register_blueprint(metrics_bp)
+    app.register_blueprint(admin_bp)
 
     @app.route('/')
     @login_required
@@ -94,4 +201,41 @@ def create_app(config_class=Config):
     def not_found(error):
         return render_template('errors/404.html'), 404
 
-    return app
\ No newline at end of file
+    _compile_templates(app)
+    if not app.config['DEFER_WORKER_INIT']:
+        init_worker(app)
+    return app
+
+def _compile_templates(app):
+    """Compile every page and SMS template up front so forked workers inherit them"""
+    from .services.message_templates import DEFAULT_TEMPLATES, compile_template
+    for name in app.jinja_env.list_templates():
+        app.jinja_env.get_template(name)
+    for kind, text in DEFAULT_TEMPLATES.items():
+        compile_template(kind, text)
+
+def init_worker(app):
+    """
+    Post-fork phase of create_app: everything that opens connections or starts
+    threads. Runs once per process; the Mongo and Twilio clients themselves
+    are created lazily on first use.
+    """
+    global task_scheduler
+    if app.extensions.get('worker_pid') == os.getpid():
+        return
+    app.extensions['worker_pid'] = os.getpid()
+
+    # Queue-backed structured logging for every subsystem
+    setup_logging(app.config)
+
+    from .indexes import check_indexes
+    check_indexes(mongo.db, app.config['INDEX_CHECK_ON_STARTUP'])
+
+    # Initialize scheduler with app context
+    if app.config.get('SCHEDULER_ENABLED', True):
+        from .scheduler import TaskScheduler
+        task_scheduler = TaskScheduler.get_instance()
+        task_scheduler.init_app(app, event_service, sms_service, job_history_service, sweep_coordinator,
+                                deadline_tracker, reactive_engine)
+        app.extensions['task_scheduler'] = task_scheduler
+        app.logger.info('Task scheduler initialized and started')
\ No newline at end of file
@@ -0,0 +1,220 @@
+# app/asgi.py
+from types import SimpleNamespace
+from urllib.parse import parse_qs
+from flask_login import AnonymousUserMixin
+from twilio.twiml.messaging_response import MessagingResponse
+from werkzeug.exceptions import HTTPException, RequestEntityTooLarge
+from werkzeug.routing import Map, Rule
+from .config import Config
+from .metrics import HTTP_DURATION, HTTP_REQUESTS
+import logging
+import time
+
+# The public routes served here, under the same endpoint names as the Flask blueprints
+PUBLIC_ROUTES = Map([
+    Rule('/rsvp/<token>', endpoint='events.rsvp_page', methods=['GET']),
+    Rule('/rsvp/submit/<token>/<response>', endpoint='events.submit_rsvp', methods=['GET']),
+    Rule('/sms', endpoint='sms.handle_sms', methods=['POST']),
+])
+# Metric labels, matching @track_route on the Flask views
+ROUTE_LABELS = {'events.rsvp_page': 'rsvp_page', 'events.submit_rsvp': 'rsvp_submit', 'sms.handle_sms': 'sms'}
+# Twilio webhooks are a few hundred bytes; anything far bigger is not one
+MAX_BODY_BYTES = 64 * 1024
+
+sms_logger = logging.getLogger('sms_logger')
+
+
+class RsvpAsgiApp:
+    """
+    ASGI app for the public RSVP link and SMS webhook routes, so the burst of
+    replies after an invitation wave is served from an event loop on the
+    async Mongo driver instead of tying up sync workers. The admin UI stays
+    on the Flask app; route /rsvp and /sms to this process at the proxy.
+
+    Pages are the Flask templates rendered through an async overlay of the
+    Flask Jinja environment. At most `max_in_flight` requests are handled at
+    once; beyond that it answers 503 so memory stays bounded.
+    """
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self.config = flask_app.config
+        self.max_in_flight = self.config['ASYNC_MAX_IN_FLIGHT']
+        self.in_flight = 0
+        self.rsvp_service = None
+        from . import sms_service
+        self.sms_service = sms_service
+        self.url_adapter = flask_app.url_map.bind(self.config.get('SERVER_NAME') or 'localhost')
+        # A fresh cache: the parent's holds templates compiled for sync rendering
+        self.templates = flask_app.jinja_env.overlay(enable_async=True, cache_size=400)
+        self.templates.globals = dict(
+            flask_app.jinja_env.globals,
+            url_for=self.url_for,
+            get_flashed_messages=lambda **kwargs: [],
+            config=self.config,
+            current_user=AnonymousUserMixin(),
+        )
+        for name in ('events/rsvp_page.html', 'events/rsvp_confirmation.html'):
+            self.templates.get_template(name)
+
+    def url_for(self, endpoint, **values):
+        return self.url_adapter.build(endpoint, values)
+
+    def _service(self):
+        # Created in the serving process, on its event loop
+        if self.rsvp_service is None:
+            from .services.async_rsvp_service import AsyncRsvpService
+            self.rsvp_service = AsyncRsvpService(self.config['MONGO_URI'],
+                                                 max_pool_size=self.config['ASYNC_MONGO_POOL_SIZE'],
+                                                 waitlist_enabled=self.config['WAITLIST_ENABLED'])
+        return self.rsvp_service
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self._http(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                from . import init_worker
+                init_worker(self.flask_app)
+                self._service()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                if self.rsvp_service is not None:
+                    await self.rsvp_service.close()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _render(self, template_name, endpoint, **context):
+        template = self.templates.get_template(template_name)
+        return await template.render_async(
+            request=SimpleNamespace(endpoint=endpoint), current_year=time.gmtime().tm_year, **context
+        )
+
+    async def _http(self, scope, receive, send):
+        adapter = PUBLIC_ROUTES.bind('', path_info=scope['path'])
+        try:
+            endpoint, args = adapter.match(method=scope['method'])
+        except HTTPException as e:
+            await self._respond(send, e.code, e.name, 'text/plain')
+            return
+        if self.in_flight >= self.max_in_flight:
+            HTTP_REQUESTS.labels(ROUTE_LABELS[endpoint], '503').inc()
+            await self._respond(send, 503, 'Busy, please retry', 'text/plain', [(b'retry-after', b'1')])
+            return
+
+        self.in_flight += 1
+        start = time.perf_counter()
+        status = 500
+        try:
+            if endpoint == 'sms.handle_sms':
+                status, body, content_type = await self.handle_sms(await self._read_form(receive))
+            elif endpoint == 'events.rsvp_page':
+                status, body, content_type = await self.rsvp_page(**args)
+            else:
+                status, body, content_type = await self.submit_rsvp(**args)
+            await self._respond(send, status, body, content_type)
+        except HTTPException as e:
+            status = e.code
+            await self._respond(send, e.code, e.name, 'text/plain')
+        except Exception as e:
+            status = 500
+            logging.getLogger('event_service').error(f"Error serving {scope['path']}: {str(e)}", exc_info=True)
+            await self._respond(send, 500, 'Internal Server Error', 'text/plain')
+        finally:
+            self.in_flight -= 1
+            label = ROUTE_LABELS[endpoint]
+            HTTP_DURATION.labels(label).observe(time.perf_counter() - start)
+            HTTP_REQUESTS.labels(label, str(status)).inc()
+
+    async def _read_form(self, receive):
+        body = b''
+        while True:
+            message = await receive()
+            body += message.get('body', b'')
+            if len(body) > MAX_BODY_BYTES:
+                raise RequestEntityTooLarge()
+            if not message.get('more_body'):
+                break
+        return {key: values[0] for key, values in parse_qs(body.decode('utf-8')).items()}
+
+    async def _respond(self, send, status, body, content_type, headers=()):
+        body = body.encode('utf-8')
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(b'content-type', f"{content_type}; charset=utf-8".encode()),
+                        (b'content-length', str(len(body)).encode()), *headers],
+        })
+        await send({'type': 'http.response.body', 'body': body})
+
+    # Routes; same behaviour as the Flask views in event_routes and sms_routes
+
+    async def rsvp_page(self, token):
+        event, invitee = await self._service().find_event_and_invitee_by_token(token)
+        if not event or not invitee:
+            page = await self._render("events/rsvp_confirmation.html", 'events.rsvp_page', success=False,
+                                      message="This invitation link is invalid or has expired.")
+        elif invitee['status'] not in ['invited', 'ERROR']:
+            page = await self._render("events/rsvp_confirmation.html", 'events.rsvp_page', success=True,
+                                      message="Thank you, we have already received your response.")
+        else:
+            page = await self._render("events/rsvp_page.html", 'events.rsvp_page',
+                                      event=event, invitee=invitee, token=token)
+        return 200, page, 'text/html'
+
+    async def submit_rsvp(self, token, response):
+        success, message = await self._service().process_rsvp_from_url(token, response)
+        page = await self._render("events/rsvp_confirmation.html", 'events.submit_rsvp',
+                                  success=success, message=message)
+        return 200, page, 'text/html'
+
+    async def handle_sms(self, form):
+        log_context = {'phone': form.get('From'), 'message_sid': form.get('MessageSid'), 'sender': form.get('To')}
+        sms_logger.info("Incoming SMS", extra=log_context)
+        if 'From' not in form or 'Body' not in form:
+            sms_logger.error("Missing required field in SMS webhook", extra=log_context)
+            return 400, "Missing required field", 'text/plain'
+
+        sender = self.sms_service.pool_number(form.get('To'))
+        if form.get('To') and not sender:
+            sms_logger.warning("Reply to a number outside the sender pool", extra=log_context)
+        resp = MessagingResponse()
+        try:
+            result = await self._service().process_rsvp(form['From'], form['Body'].strip(), sender)
+        except Exception as e:
+            sms_logger.error(f"Error processing SMS: {str(e)}", exc_info=True, extra=log_context)
+            resp.message("Sorry, we encountered an error processing your response. Please try again later.")
+            return 200, str(resp), 'application/xml'
+        sms_logger.info(f"RSVP processing result: {result}", extra=log_context)
+
+        if result == 'YES':
+            resp.message("Thank you for your response! You're confirmed for the event.")
+        elif result == 'NO':
+            resp.message("Thank you for letting us know you can't make it.")
+        elif result == 'WAITLIST':
+            resp.message("Thank you! The event is full right now, so you're on the waitlist. We'll text you if a spot opens up.")
+        elif result == 'FULL':
+            resp.message("Sorry, the event is already at full capacity.")
+        else:
+            sms_logger.warning(f"Invalid response: {form['Body']}", extra=log_context)
+            resp.message("Sorry, we couldn't process your response. Please reply with 'EVENT_CODE YES' or 'EVENT_CODE NO'.")
+        return 200, str(resp), 'application/xml'
+
+
+def create_asgi_app(config_class=Config):
+    """
+    ASGI entry point for the public routes, e.g. `uvicorn asgi:app`. The Flask
+    app is built only for its config, templates and URL map; it never starts
+    the scheduler here.
+    """
+    from . import create_app
+
+    class AsgiConfig(config_class):
+        SCHEDULER_ENABLED = False
+        DEFER_WORKER_INIT = True
+
+    return RsvpAsgiApp(create_app(AsgiConfig))
@@ -8,25 +8,128 @@ load_dotenv()
 class Config:
     SECRET_KEY = os.getenv('SECRET_KEY', 'your-secret-key')
     MONGO_URI = os.getenv('MONGO_URI', 'mongodb://localhost:27017/rsvp-system')
+    # Leave logging, the index check and the scheduler to init_worker(), called after
+    # the fork; gunicorn.conf.py sets this so the app can be preloaded
+    DEFER_WORKER_INIT = os.getenv('DEFER_WORKER_INIT', 'false').lower() == 'true'
+    # Route dashboard, listing and sweep-scan reads to secondaries (replica sets only);
+    # the staleness bound is at least 90 seconds, as MongoDB requires
+    SECONDARY_READS_ENABLED = os.getenv('SECONDARY_READS_ENABLED', 'false').lower() == 'true'
+    SECONDARY_MAX_STALENESS_SECONDS = max(90, int(os.getenv('SECONDARY_MAX_STALENESS_SECONDS', '90')))
+    # Async serving of the public RSVP routes (asgi.py): concurrent requests
+    # before answering 503, and Mongo connections per process
+    ASYNC_MAX_IN_FLIGHT = int(os.getenv('ASYNC_MAX_IN_FLIGHT', '2000'))
+    ASYNC_MONGO_POOL_SIZE = int(os.getenv('ASYNC_MONGO_POOL_SIZE', '100'))
+    # Indexes are created at deploy time (`flask indexes sync`); at startup they are
+    # only checked: 'warn' logs missing ones, 'fail' refuses to start, 'off' skips it
+    INDEX_CHECK_ON_STARTUP = os.getenv('INDEX_CHECK_ON_STARTUP', 'warn').lower()
     TWILIO_SID = os.getenv('TWILIO_SID')
     TWILIO_AUTH_TOKEN = os.getenv('TWILIO_AUTH_TOKEN')
     TWILIO_PHONE = os.getenv('TWILIO_PHONE')
+    # Override the Twilio REST endpoint, e.g. a local stand-in for load tests
+    TWILIO_API_BASE_URL = os.getenv('TWILIO_API_BASE_URL')
+    # Comma-separated sender numbers; invitation waves are spread across them
+    TWILIO_PHONE_POOL = [n.strip() for n in os.getenv('TWILIO_PHONE_POOL', '').split(',') if n.strip()]
+    # Send through a Messaging Service instead, letting Twilio pick the number
+    TWILIO_MESSAGING_SERVICE_SID = os.getenv('TWILIO_MESSAGING_SERVICE_SID')
+    # Both SMS limits count segments; the per-second one applies to each sender number
+    SMS_MAX_PER_DAY = int(os.getenv('SMS_MAX_PER_DAY', '100'))
+    SMS_MAX_PER_SECOND = int(os.getenv('SMS_MAX_PER_SECOND', '3'))
+    # How long a send waits for its sender's rate bucket before giving up
+    SMS_SENDER_MAX_WAIT = float(os.getenv('SMS_SENDER_MAX_WAIT', '1'))
+    # Where Twilio reports invitation delivery; defaults to /sms/status under RSVP_BASE_URL
+    SMS_STATUS_CALLBACK_URL = os.getenv('SMS_STATUS_CALLBACK_URL') or (
+        f"{os.getenv('RSVP_BASE_URL').rstrip('/')}/sms/status" if os.getenv('RSVP_BASE_URL') else None
+    )
+    # Reject status callbacks without a valid X-Twilio-Signature
+    SMS_STATUS_VALIDATE_SIGNATURE = os.getenv('SMS_STATUS_VALIDATE_SIGNATURE', 'true').lower() == 'true'
+    # Delivery callbacks are buffered and written in batches
+    DELIVERY_STATUS_BATCH_SIZE = int(os.getenv('DELIVERY_STATUS_BATCH_SIZE', '500'))
+    DELIVERY_STATUS_FLUSH_SECONDS = float(os.getenv('DELIVERY_STATUS_FLUSH_SECONDS', '2'))
+    # A final status for a message not stored yet is retried for this long
+    DELIVERY_STATUS_RETRY_SECONDS = float(os.getenv('DELIVERY_STATUS_RETRY_SECONDS', '60'))
+    # Public base URL used for RSVP links in invitations
+    RSVP_BASE_URL = os.getenv('RSVP_BASE_URL')
+    # How often organisation-wide SMS template overrides are re-read from the database
+    MESSAGE_TEMPLATE_REFRESH_SECONDS = int(os.getenv('MESSAGE_TEMPLATE_REFRESH_SECONDS', '60'))
     
+    # Password hashing; the workers and pending bound are per process, shared by its request threads
+    BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', '12'))
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', '2'))
+    PASSWORD_HASH_MAX_PENDING = int(os.getenv('PASSWORD_HASH_MAX_PENDING', '8'))
+    PASSWORD_HASH_TIMEOUT = float(os.getenv('PASSWORD_HASH_TIMEOUT', '2'))  # seconds
+
     # RSVP System Configuration
     DEFAULT_BATCH_SIZE = int(os.getenv('DEFAULT_BATCH_SIZE', '10'))
     INVITATION_EXPIRY_HOURS = float(os.getenv('INVITATION_EXPIRY_HOURS', '24'))
     AUTO_PROGRESS_BATCHES = os.getenv('AUTO_PROGRESS_BATCHES', 'true').lower() == 'true'
+    # YES replies to a full event are waitlisted and promoted as seats free up; when
+    # disabled they are told the event is full
     WAITLIST_ENABLED = os.getenv('WAITLIST_ENABLED', 'true').lower() == 'true'
+    # Adaptive over-invitation: keep enough invitations out to fill the open seats given
+    # observed reply rates and times. Events opt in or out; this is the default for the rest
+    OVER_INVITE_DEFAULT = os.getenv('OVER_INVITE_DEFAULT', 'false').lower() == 'true'
+    OVER_INVITE_MAX_FACTOR = float(os.getenv('OVER_INVITE_MAX_FACTOR', '2'))  # outstanding + confirmed <= capacity * factor
+    OVER_INVITE_PRIOR_WEIGHT = int(os.getenv('OVER_INVITE_PRIOR_WEIGHT', '20'))  # replies the history counts as
+    OVER_INVITE_MIN_SAMPLES = int(os.getenv('OVER_INVITE_MIN_SAMPLES', '10'))
+    OVER_INVITE_HISTORY_EVENTS = int(os.getenv('OVER_INVITE_HISTORY_EVENTS', '50'))
+    OVER_INVITE_HISTORY_REFRESH_SECONDS = int(os.getenv('OVER_INVITE_HISTORY_REFRESH_SECONDS', '600'))
+    # Contact imports are upserted in bulk_writes of this many rows; the report
+    # lists at most CONTACT_IMPORT_MAX_ERRORS rejected rows
+    CONTACT_IMPORT_BATCH_SIZE = int(os.getenv('CONTACT_IMPORT_BATCH_SIZE', '1000'))
+    CONTACT_IMPORT_MAX_ERRORS = int(os.getenv('CONTACT_IMPORT_MAX_ERRORS', '1000'))
+    # Audience segments are rebuilt and added to events this many contacts at a time
+    SEGMENT_BATCH_SIZE = int(os.getenv('SEGMENT_BATCH_SIZE', '1000'))
     
     # Scheduler Configuration
     SCHEDULER_ENABLED = os.getenv('SCHEDULER_ENABLED', 'true').lower() == 'true'
-    EXPIRY_CHECK_INTERVAL = int(os.getenv('EXPIRY_CHECK_INTERVAL', '1'))  # minutes
-    CAPACITY_CHECK_INTERVAL = int(os.getenv('CAPACITY_CHECK_INTERVAL', '1'))  # minutes
-    REMINDER_CHECK_INTERVAL = int(os.getenv('REMINDER_CHECK_INTERVAL', '30')) # minutes
+    # One job expires, reminds and refills every event; falls back to the old capacity interval
+    SWEEP_INTERVAL = int(os.getenv('SWEEP_INTERVAL', os.getenv('CAPACITY_CHECK_INTERVAL', '1')))  # minutes
+    # Adaptive cadence: shorten intervals while sweeps find work, stretch them when idle
+    SCHEDULER_ADAPTIVE = os.getenv('SCHEDULER_ADAPTIVE', 'true').lower() == 'true'
+    SCHEDULER_BUSY_THRESHOLD = int(os.getenv('SCHEDULER_BUSY_THRESHOLD', '5'))  # events updated
+    SCHEDULER_MIN_INTERVAL_SECONDS = int(os.getenv('SCHEDULER_MIN_INTERVAL_SECONDS', '15'))
+    SCHEDULER_MAX_INTERVAL_FACTOR = float(os.getenv('SCHEDULER_MAX_INTERVAL_FACTOR', '4'))
+    # Hash-partitioned sweeps shared by every worker through Mongo leases; 1 sweeps everything in one pass
+    SWEEP_PARTITIONS = int(os.getenv('SWEEP_PARTITIONS', '1'))
+    SWEEP_LEASE_SECONDS = int(os.getenv('SWEEP_LEASE_SECONDS', '300'))
+    SWEEP_WORKERS = int(os.getenv('SWEEP_WORKERS', '4'))  # partitions swept in parallel per process
+    # Sweep writes go out as unordered bulk_writes of up to this many events
+    SWEEP_WRITE_BATCH_SIZE = int(os.getenv('SWEEP_WRITE_BATCH_SIZE', '500'))
+    SWEEP_WRITE_FLUSH_SECONDS = float(os.getenv('SWEEP_WRITE_FLUSH_SECONDS', '5'))
+    # Fire reminders, expiries and refills at their exact deadline from an in-memory heap
+    # (opt-in; the polling sweep alone handles them within SWEEP_INTERVAL)
+    DEADLINE_TIMERS_ENABLED = os.getenv('DEADLINE_TIMERS_ENABLED', 'false').lower() == 'true'
+    DEADLINE_LEASE_SECONDS = int(os.getenv('DEADLINE_LEASE_SECONDS', '30'))
+    DEADLINE_REFRESH_SECONDS = int(os.getenv('DEADLINE_REFRESH_SECONDS', '300'))
+    # Wait this long after sweeping an event before refilling it again from a timer
+    DEADLINE_REFILL_BACKOFF_SECONDS = int(os.getenv('DEADLINE_REFILL_BACKOFF_SECONDS', '60'))
+    # Sweeps read events with at least this many invitees as columns and find their
+    # expiries and reminders with NumPy (0 disables; needs numpy installed)
+    DEADLINE_VECTORIZE_MIN_INVITEES = int(os.getenv('DEADLINE_VECTORIZE_MIN_INVITEES', '1000'))
+    # React to the events change stream instead of polling (needs a replica set); the
+    # polling sweep then only runs every REACTIVE_RECONCILE_INTERVAL as a safety net
+    REACTIVE_ENGINE_ENABLED = os.getenv('REACTIVE_ENGINE_ENABLED', 'false').lower() == 'true'
+    REACTIVE_RECONCILE_INTERVAL = int(os.getenv('REACTIVE_RECONCILE_INTERVAL', '15'))  # minutes
+
+    # Sweep profiling (opt-in) and job run history
+    SCHEDULER_PROFILING = os.getenv('SCHEDULER_PROFILING', 'false').lower() == 'true'
+    SCHEDULER_CPROFILE_THRESHOLD = float(os.getenv('SCHEDULER_CPROFILE_THRESHOLD', '0'))  # seconds, 0 disables
+    SCHEDULER_PROFILE_DIR = os.getenv('SCHEDULER_PROFILE_DIR', 'logs/profiles')
+    JOB_HISTORY_MAX_BYTES = int(os.getenv('JOB_HISTORY_MAX_BYTES', str(5 * 1024 * 1024)))
+    JOB_HISTORY_MAX_RUNS = int(os.getenv('JOB_HISTORY_MAX_RUNS', '5000'))
+
+    # Prometheus scrapes must send `Authorization: Bearer <METRICS_TOKEN>`;
+    # /metrics is not served at all while it is unset
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN')
     
     # Logging configuration
+    LOG_DIR = os.getenv('LOG_DIR', 'logs')
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+    # Per-subsystem overrides, e.g. LOG_LEVELS="scheduler=DEBUG,sms_service=WARNING"
+    LOG_LEVELS = dict(
+        item.strip().split('=', 1) for item in os.getenv('LOG_LEVELS', '').split(',') if '=' in item
+    )
     SMS_LOG_FILE = 'logs/sms.log'
-    SMS_LOG_LEVEL = 'INFO'
-    SMS_LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+    SMS_LOG_LEVEL = os.getenv('SMS_LOG_LEVEL', 'INFO')
     SMS_LOG_MAX_BYTES = 10000000  # 10MB
     SMS_LOG_BACKUP_COUNT = 5
\ No newline at end of file
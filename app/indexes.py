@@ -0,0 +1,166 @@
+# app/indexes.py
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import PyMongoError
+from flask.cli import AppGroup
+import click
+import logging
+
+# Every index the application relies on, by collection. Created or reconciled
+# at deploy time (the Dockerfile's CMD) with
+#   DEFER_WORKER_INIT=true flask --app app:create_app indexes sync
+# where DEFER_WORKER_INIT keeps the CLI from starting the scheduler; app startup
+# only checks them (INDEX_CHECK_ON_STARTUP), so workers never issue DDL.
+INDEXES = {
+    'events': [
+        # SMS replies look events up by code
+        IndexModel([('event_code', ASCENDING)]),
+        # RSVP links
+        IndexModel([('invitees.rsvp_token', ASCENDING)]),
+        # Twilio status callbacks
+        IndexModel([('invitees.message_sid', ASCENDING)]),
+        # Deadline timer rebuilds: active events with outstanding invitations
+        IndexModel([('invitees.status', ASCENDING), ('automation_status', ASCENDING)]),
+        # Partitioned sweeps
+        IndexModel([('shard_key', ASCENDING)]),
+    ],
+    'master_list': [
+        IndexModel([('phone', ASCENDING)]),
+        IndexModel([('tags', ASCENDING)]),
+    ],
+    'segments': [
+        IndexModel([('name', ASCENDING)], unique=True),
+    ],
+    'segment_members': [
+        # One row per member; also serves member listings and counts by segment
+        IndexModel([('segment_id', ASCENDING), ('contact_id', ASCENDING)], unique=True),
+        # Contact changes and deletions
+        IndexModel([('contact_id', ASCENDING)]),
+    ],
+    'users': [
+        IndexModel([('email', ASCENDING)], unique=True),
+        IndexModel([('username', ASCENDING)], unique=True),
+    ],
+    'registration_codes': [
+        IndexModel([('code', ASCENDING)], unique=True),
+        # Active code listings; expired codes are kept and only filtered out
+        IndexModel([('expires_at', ASCENDING)]),
+    ],
+}
+
+# Options that change what an index does; an index that differs in any of them is rebuilt
+COMPARED_OPTIONS = ('unique', 'sparse', 'expireAfterSeconds', 'partialFilterExpression')
+
+logger = logging.getLogger('indexes')
+
+
+def _spec(index):
+    """(key, options) of an IndexModel or an index_information() entry"""
+    document = getattr(index, 'document', index)
+    key = document['key']
+    key = list(key.items()) if hasattr(key, 'items') else [tuple(field) for field in key]
+    options = {option: document[option] for option in COMPARED_OPTIONS if option in document}
+    return key, options
+
+
+def diff_indexes(db):
+    """
+    Compare the registry with the database.
+    Returns {collection: {'missing': [IndexModel], 'changed': [IndexModel], 'extra': [name]}}
+    for every collection that differs.
+    """
+    differences = {}
+    for collection, models in INDEXES.items():
+        existing = db[collection].index_information()
+        existing.pop('_id_', None)
+        missing, changed = [], []
+        for model in models:
+            name = model.document['name']
+            if name not in existing:
+                missing.append(model)
+            elif _spec(existing.pop(name)) != _spec(model):
+                changed.append(model)
+        if missing or changed or existing:
+            differences[collection] = {'missing': missing, 'changed': changed, 'extra': sorted(existing)}
+    return differences
+
+
+def sync_indexes(db, prune=False):
+    """
+    Create missing indexes and rebuild changed ones; with `prune`, also drop
+    indexes that are not in the registry. Returns the differences it found.
+    """
+    differences = diff_indexes(db)
+    for collection, difference in differences.items():
+        for model in difference['changed']:
+            logger.warning(f"Rebuilding index {collection}.{model.document['name']}")
+            db[collection].drop_index(model.document['name'])
+        models = difference['missing'] + difference['changed']
+        if models:
+            db[collection].create_indexes(models)
+            logger.info(f"Created {len(models)} indexes on {collection}")
+        if prune:
+            for name in difference['extra']:
+                logger.warning(f"Dropping unregistered index {collection}.{name}")
+                db[collection].drop_index(name)
+    return differences
+
+
+def check_indexes(db, mode='warn'):
+    """
+    Startup check: read-only, never creates anything. `mode` is 'warn' to log
+    missing or changed indexes, 'fail' to refuse to start, or 'off'.
+    Returns True when every registered index is in place.
+    """
+    if mode == 'off':
+        return True
+    try:
+        differences = diff_indexes(db)
+    except PyMongoError as e:
+        logger.error(f"Could not check indexes: {str(e)}")
+        return False
+    problems = [
+        f"{collection}.{model.document['name']} ({kind})"
+        for collection, difference in differences.items()
+        for kind in ('missing', 'changed')
+        for model in difference[kind]
+    ]
+    if not problems:
+        return True
+    message = f"Indexes out of date, run 'flask --app app:create_app indexes sync': {', '.join(problems)}"
+    if mode == 'fail':
+        raise RuntimeError(message)
+    logger.warning(message)
+    return False
+
+
+def _describe(differences):
+    for collection, difference in differences.items():
+        for kind in ('missing', 'changed'):
+            for model in difference[kind]:
+                click.echo(f"{collection}.{model.document['name']}: {kind}")
+        for name in difference['extra']:
+            click.echo(f"{collection}.{name}: not in the registry")
+
+
+indexes_cli = AppGroup('indexes', help='Manage MongoDB indexes')
+
+
+@indexes_cli.command('sync')
+@click.option('--prune', is_flag=True, help='Also drop indexes that are not in the registry.')
+def sync_command(prune):
+    """Create or reconcile every registered index"""
+    from . import mongo
+    differences = sync_indexes(mongo.db, prune=prune)
+    _describe(differences)
+    click.echo('Indexes are up to date.' if not differences else 'Indexes synced.')
+
+
+@indexes_cli.command('check')
+def check_command():
+    """List indexes that are missing, changed or unregistered; exits 1 if any are missing or changed"""
+    from . import mongo
+    differences = diff_indexes(mongo.db)
+    _describe(differences)
+    if any(difference['missing'] or difference['changed'] for difference in differences.values()):
+        raise SystemExit(1)
+    click.echo('Indexes are up to date.')
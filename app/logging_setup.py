@@ -0,0 +1,128 @@
+# app/logging_setup.py
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from datetime import datetime, timezone
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+
+# Per-subsystem log files: logger name -> (file name, max bytes, backup count)
+SUBSYSTEM_LOG_FILES = {
+    'event_service': ('event_service.log', 1024 * 1024, 5),
+    'sms_service': ('sms_service.log', 1024 * 1024, 5),
+    'scheduler': ('scheduler.log', 1024 * 1024, 5),
+}
+
+# Attributes passed through `extra=` that are lifted into the JSON line
+CONTEXT_FIELDS = ('event_id', 'invitee_id', 'message_sid', 'phone', 'sender', 'job')
+
+_listener = None
+
+
+class JsonLineFormatter(logging.Formatter):
+    """Formats a record as one JSON object per line"""
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        for field in CONTEXT_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = str(value)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class _StructuredQueueHandler(QueueHandler):
+    """
+    Like QueueHandler, but keeps the message and traceback separate so the
+    listener thread can still write them as structured fields.
+    """
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        record.stack_info = None
+        return record
+
+
+def _file_handler(log_dir, name, file_name, max_bytes, backup_count):
+    handler = RotatingFileHandler(
+        os.path.join(log_dir, file_name),
+        maxBytes=max_bytes,
+        backupCount=backup_count
+    )
+    handler.addFilter(logging.Filter(name))
+    handler.setFormatter(JsonLineFormatter())
+    return handler
+
+
+def setup_logging(config):
+    """
+    Route all logging through a queue so request and scheduler threads only
+    enqueue records; a single listener thread does the formatting and disk I/O.
+    """
+    global _listener
+
+    log_dir = config.get('LOG_DIR', 'logs')
+    if not os.path.exists(log_dir):
+        os.makedirs(log_dir)
+
+    log_files = dict(SUBSYSTEM_LOG_FILES)
+    log_files['sms_logger'] = (
+        os.path.basename(config.get('SMS_LOG_FILE', 'logs/sms.log')),
+        config.get('SMS_LOG_MAX_BYTES', 10000000),
+        config.get('SMS_LOG_BACKUP_COUNT', 5)
+    )
+
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(
+        logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    )
+    handlers = [console_handler] + [
+        _file_handler(log_dir, name, *spec) for name, spec in log_files.items()
+    ]
+
+    _stop_listener()
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_StructuredQueueHandler(log_queue))
+    root.setLevel(config.get('LOG_LEVEL', 'INFO'))
+
+    levels = {name: config.get('LOG_LEVEL', 'INFO') for name in log_files}
+    levels['sms_logger'] = config.get('SMS_LOG_LEVEL', 'INFO')
+    levels.update(config.get('LOG_LEVELS', {}))
+    for name, level in levels.items():
+        subsystem_logger = logging.getLogger(name)
+        subsystem_logger.setLevel(level.upper())
+        for handler in list(subsystem_logger.handlers):
+            subsystem_logger.removeHandler(handler)
+
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def _stop_listener():
+    """Flush queued records and stop the listener thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(_stop_listener)
@@ -0,0 +1,78 @@
+# app/metrics.py
+from prometheus_client import (
+    CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest, multiprocess
+)
+from flask import make_response
+import functools
+import os
+import time
+
+# Scheduler sweeps
+JOB_DURATION = Histogram(
+    'rsvp_scheduler_job_duration_seconds', 'Duration of scheduler job runs', ['job'],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+)
+JOB_RUNS = Counter('rsvp_scheduler_job_runs_total', 'Scheduler job runs by outcome', ['job', 'outcome'])
+SWEEP_EVENTS = Histogram(
+    'rsvp_sweep_events_updated', 'Events changed by a single sweep', ['job'],
+    buckets=(0, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+)
+JOB_SKIPPED = Counter('rsvp_scheduler_job_skipped_total', 'Job runs skipped or coalesced', ['job', 'reason'])
+JOB_INTERVAL = Gauge(
+    'rsvp_scheduler_job_interval_seconds', 'Current adaptive interval per job', ['job'],
+    multiprocess_mode='max'
+)
+
+# Outbound SMS
+SMS_SEND_DURATION = Histogram('rsvp_sms_send_duration_seconds', 'Twilio API call latency', ['kind'])
+SMS_SENDS = Counter('rsvp_sms_sends_total', 'SMS send attempts by outcome', ['kind', 'outcome'])
+SMS_RATE_LIMITED = Counter('rsvp_sms_rate_limited_total', 'Sends rejected by the local rate limiter', ['reason'])
+SMS_SEGMENTS = Counter('rsvp_sms_segments_total', 'Billable SMS segments sent', ['kind', 'encoding'])
+SMS_DELIVERY_STATUS = Counter('rsvp_sms_delivery_status_total', 'Twilio status callbacks received', ['status'])
+
+# Database and public routes
+DB_DURATION = Histogram('rsvp_db_operation_duration_seconds', 'EventService database call latency', ['operation'])
+HTTP_DURATION = Histogram('rsvp_http_request_duration_seconds', 'Public route latency', ['route'])
+HTTP_REQUESTS = Counter('rsvp_http_requests_total', 'Public route requests by status', ['route', 'status'])
+
+
+def observe_db(func):
+    """Record the latency of an EventService method under its own name"""
+    histogram = DB_DURATION.labels(func.__name__)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with histogram.time():
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def track_route(route):
+    """Record latency and response status of a Flask view"""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            status = 500
+            try:
+                response = make_response(view(*args, **kwargs))
+                status = response.status_code
+                return response
+            finally:
+                HTTP_DURATION.labels(route).observe(time.perf_counter() - start)
+                HTTP_REQUESTS.labels(route, str(status)).inc()
+        return wrapper
+    return decorator
+
+
+def render_latest():
+    """
+    Exposition text for this process, or for every gunicorn worker when
+    PROMETHEUS_MULTIPROC_DIR is set (see gunicorn.conf.py).
+    """
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry)
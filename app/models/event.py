@@ -16,6 +16,8 @@ class Event:
         self.event_code = self._generate_event_code()
         self.invitation_expiry_hours = invitation_expiry_hours
         self.automation_status = 'paused' # <-- ADD THIS (default to paused)
+        self.message_templates = {}  # per-event SMS template overrides by message kind
+        self.over_invite = None  # True/False opts in or out of over-invitation; None follows OVER_INVITE_DEFAULT
         self._id = None
 
     def _generate_event_code(self):
@@ -39,6 +41,8 @@ class Event:
         event.created_at = data.get('created_at', datetime.utcnow())
         event.event_code = data.get('event_code', event._generate_event_code())
         event.automation_status = data.get('automation_status', 'paused') # <-- ADD THIS
+        event.message_templates = data.get('message_templates', {})
+        event.over_invite = data.get('over_invite')
         event._id = data.get('_id')
         return event
 
@@ -52,5 +56,7 @@ class Event:
             "created_at": self.created_at,
             "event_code": self.event_code,
             "invitation_expiry_hours": self.invitation_expiry_hours,
-            "automation_status": self.automation_status
+            "automation_status": self.automation_status,
+            "message_templates": self.message_templates,
+            "over_invite": self.over_invite
         }
\ No newline at end of file
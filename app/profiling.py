@@ -0,0 +1,163 @@
+# app/profiling.py
+from contextlib import contextmanager
+from collections import defaultdict
+from datetime import datetime
+import cProfile
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger('scheduler')
+
+_current = threading.local()
+
+
+class SweepProfile:
+    """
+    Counters and optional per-phase timings for one scheduler sweep.
+
+    Sweeps report into whichever profile is current for their thread (see
+    current_profile), so EventService code does not need to thread it through.
+    Phase timing is only done when `time_phases` is set; counters are always kept.
+    """
+    def __init__(self, job, time_phases=False):
+        self.job = job
+        self.time_phases = time_phases
+        self.started_at = datetime.utcnow()
+        self.duration = None
+        self.counters = defaultdict(int)
+        self.phases = defaultdict(float)
+        self.event_phases = defaultdict(lambda: defaultdict(float))
+        self.profile_path = None
+
+    def count(self, name, amount=1):
+        self.counters[name] += amount
+
+    def merge(self, other):
+        """Fold in the counters and timings of a profile kept by another thread"""
+        for name, value in other.counters.items():
+            self.counters[name] += value
+        for name, value in other.phases.items():
+            self.phases[name] += value
+        for event_id, phases in other.event_phases.items():
+            for name, value in phases.items():
+                self.event_phases[event_id][name] += value
+
+    @contextmanager
+    def phase(self, name, event_id=None):
+        if not self.time_phases:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.phases[name] += elapsed
+            if event_id is not None:
+                self.event_phases[str(event_id)][name] += elapsed
+
+    def iterate(self, name, iterable):
+        """Yield from `iterable`, charging the time spent fetching each item to `name`"""
+        iterator = iter(iterable)
+        while True:
+            with self.phase(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def slowest_events(self, limit=5):
+        totals = sorted(
+            ((sum(phases.values()), event_id, phases) for event_id, phases in self.event_phases.items()),
+            reverse=True
+        )
+        return [
+            {'event_id': event_id, 'total_s': round(total, 4),
+             'phases': {k: round(v, 4) for k, v in phases.items()}}
+            for total, event_id, phases in totals[:limit]
+        ]
+
+    def to_dict(self):
+        return {
+            'job': self.job,
+            'started_at': self.started_at,
+            'duration_s': round(self.duration or 0, 4),
+            'events_scanned': self.counters['events_scanned'],
+            'events_updated': self.counters['events_updated'],
+            'messages_sent': self.counters['messages_sent'],
+            'errors': self.counters['errors'],
+            'write_round_trips': self.counters['write_round_trips'],
+            'stages': {k: self.counters[k] for k in ('expired', 'reminded', 'invited') if k in self.counters},
+            'phases': {k: round(v, 4) for k, v in self.phases.items()},
+            'slowest_events': self.slowest_events(),
+            'profile_path': self.profile_path,
+        }
+
+
+class _NullProfile(SweepProfile):
+    """Used outside a sweep; accepts and discards everything"""
+    def __init__(self):
+        super().__init__(job=None)
+
+    def count(self, name, amount=1):
+        pass
+
+    def merge(self, other):
+        pass
+
+
+_NULL_PROFILE = _NullProfile()
+
+
+def current_profile():
+    return getattr(_current, 'profile', None) or _NULL_PROFILE
+
+
+@contextmanager
+def use_profile(profile):
+    """Make `profile` current in this thread, e.g. for a worker thread of a sweep"""
+    previous = getattr(_current, 'profile', None)
+    _current.profile = profile
+    try:
+        yield profile
+    finally:
+        _current.profile = previous
+
+
+@contextmanager
+def profile_sweep(job, time_phases=False, cprofile_threshold=0, dump_dir='logs/profiles'):
+    """
+    Make a SweepProfile current for the duration of a sweep. When
+    `cprofile_threshold` is positive the sweep also runs under cProfile and
+    the stats are dumped to `dump_dir` if it took longer than that many seconds.
+    """
+    profile = SweepProfile(job, time_phases=time_phases)
+    profiler = None
+    if cprofile_threshold:
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another sweep thread already holds the interpreter's profiler
+            profiler = None
+
+    _current.profile = profile
+    start = time.perf_counter()
+    try:
+        yield profile
+    finally:
+        profile.duration = time.perf_counter() - start
+        _current.profile = None
+        if profiler is not None:
+            profiler.disable()
+            if profile.duration > cprofile_threshold:
+                if not os.path.exists(dump_dir):
+                    os.makedirs(dump_dir)
+                path = os.path.join(dump_dir, f"{job}-{profile.started_at:%Y%m%dT%H%M%S}.prof")
+                profiler.dump_stats(path)
+                profile.profile_path = path
+                logger.warning(f"Slow {job} sweep ({profile.duration:.2f}s), profile written to {path}",
+                               extra={'job': job})
@@ -0,0 +1,21 @@
+# app/routes/admin_routes.py
+from flask import Blueprint, current_app, render_template, redirect, url_for, request, flash
+from flask_login import login_required, current_user
+from .. import job_history_service
+
+bp = Blueprint('admin', __name__)
+
+@bp.route('/admin/job-runs', methods=['GET'])
+@login_required
+def job_runs():
+    if not current_user.is_admin:
+        flash('Unauthorized access', 'error')
+        return redirect(url_for('home'))
+
+    job = request.args.get('job')
+    runs = job_history_service.recent_runs(job=job, limit=request.args.get('limit', 200, type=int))
+    # Started by init_worker, after this module is imported
+    task_scheduler = current_app.extensions.get('task_scheduler')
+    cadence = task_scheduler.get_cadence() if task_scheduler else {}
+    jobs = sorted(cadence) or ['sweep_events']
+    return render_template('admin/job_runs.html', runs=runs, jobs=jobs, selected_job=job, cadence=cadence)
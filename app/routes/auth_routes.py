@@ -2,8 +2,11 @@
 from flask import Blueprint, render_template, redirect, url_for, request, flash
 from flask_login import login_user, logout_user, login_required, current_user
 from .. import user_service, registration_code_service
+from ..services.password_hasher import PasswordHasherBusy
+import logging
 
 bp = Blueprint('auth', __name__)
+logger = logging.getLogger('auth')
 
 @bp.route('/login', methods=['GET', 'POST'])
 def login():
@@ -15,7 +18,13 @@ def login():
         password = request.form['password']
         
         user = user_service.get_user_by_email(email)
-        if user and user_service.verify_password(user, password):
+        try:
+            verified = user is not None and user_service.verify_password(user, password)
+        except PasswordHasherBusy:
+            flash('The server is busy, please try again in a moment', 'error')
+            return render_template('auth/login.html'), 503
+
+        if verified:
             login_user(user)
             next_page = request.args.get('next')
             return redirect(next_page if next_page else url_for('home'))
@@ -35,42 +44,34 @@ def register():
         password = request.form['password']
         invitation_code = request.form['invitation_code']
         
-        print(f"\nProcessing registration:")
-        print(f"Username: {username}")
-        print(f"Email: {email}")
-        print(f"Invitation code: {invitation_code}")
-        
+        # Consume the code first so concurrent sign-ups cannot exceed max_uses
+        if not registration_code_service.redeem_code(invitation_code):
+            flash('Invalid or expired invitation code', 'error')
+            return render_template('auth/register.html')
+
         try:
-            # Debug: Show code details before validation
-            registration_code_service.debug_show_code(invitation_code)
-            
-            # Validate invitation code
-            if not registration_code_service.validate_code(invitation_code):
-                flash('Invalid or expired invitation code', 'error')
-                return render_template('auth/register.html')
-            
-            # Create user
             user = user_service.create_user(
                 username=username,
                 email=email,
                 password=password,
                 registration_method='invite_code'
             )
-            
-            # Mark invitation code as used
-            if not registration_code_service.use_code(invitation_code):
-                print(f"Warning: Could not mark invitation code {invitation_code} as used")
-            
+
             # Log the user in
             login_user(user)
             flash('Registration successful!', 'success')
             return redirect(url_for('home'))
-            
+
+        except PasswordHasherBusy:
+            registration_code_service.release_code(invitation_code)
+            flash('The server is busy, please try again in a moment', 'error')
+            return render_template('auth/register.html'), 503
         except ValueError as e:
-            print(f"ValueError during registration: {str(e)}")
+            registration_code_service.release_code(invitation_code)
             flash(str(e), 'error')
         except Exception as e:
-            print(f"Error during registration: {str(e)}")
+            registration_code_service.release_code(invitation_code)
+            logger.error(f"Error during registration: {str(e)}", exc_info=True)
             flash('An error occurred during registration', 'error')
     
     return render_template('auth/register.html')
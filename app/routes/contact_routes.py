@@ -1,7 +1,9 @@
 # app/routes/contact_routes.py
-from flask import Blueprint, render_template, request, redirect, url_for, flash
-from .. import contact_service
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
+from .. import contact_service, segment_service
+from ..services.contact_import import IMPORT_FORMATS
 from flask_login import login_required
+import io
 
 bp = Blueprint('contacts', __name__)
 
@@ -30,8 +32,73 @@ def manage_master_list():
     return render_template('contacts/list.html', 
                          master_list=contacts, 
                          all_tags=all_tags, 
+                         segments=segment_service.get_segments(),
                          selected_tags=tag_filter.split(',') if tag_filter else [])
 
+@bp.route('/master-list/import', methods=['POST'])
+@login_required
+def import_contacts():
+    """
+    Bulk import from an uploaded CSV (name, phone, tags columns) or vCard file.
+    The upload is read as a stream, never whole; ?format=json returns the
+    row-level report instead of flashing a summary.
+    """
+    upload = request.files.get('file')
+    wants_json = request.args.get('format') == 'json'
+    extension = upload.filename.rsplit('.', 1)[-1].lower() if upload and '.' in upload.filename else ''
+    if extension not in IMPORT_FORMATS:
+        message = 'Upload a .csv or .vcf file.'
+        if wants_json:
+            return jsonify({'error': message}), 400
+        flash(message, 'danger')
+        return redirect(url_for('contacts.manage_master_list'))
+
+    lines = io.TextIOWrapper(upload.stream, encoding='utf-8-sig', errors='replace', newline='')
+    try:
+        report = contact_service.import_contacts(IMPORT_FORMATS[extension](lines))
+    except (ValueError, UnicodeError) as e:
+        if wants_json:
+            return jsonify({'error': str(e)}), 400
+        flash(f'Import failed: {str(e)}', 'danger')
+        return redirect(url_for('contacts.manage_master_list'))
+
+    if wants_json:
+        return jsonify(report)
+    flash(f"Imported {report['rows']} rows: {report['created']} new contacts, {report['updated']} updated.",
+          'success')
+    if report['error_count']:
+        shown = '; '.join(f"row {error['row']}: {error['error']}" for error in report['errors'][:10])
+        more = report['error_count'] - min(10, len(report['errors']))
+        flash(f"{report['error_count']} rows skipped: {shown}" + (f" (and {more} more)" if more else ''), 'warning')
+    return redirect(url_for('contacts.manage_master_list'))
+
+@bp.route('/segments', methods=['POST'])
+@login_required
+def create_segment():
+    try:
+        segment_service.create_segment(request.form['name'], request.form['expression'])
+        flash('Segment saved.', 'success')
+    except ValueError as e:
+        flash(f'Error saving segment: {str(e)}', 'danger')
+    return redirect(url_for('contacts.manage_master_list'))
+
+@bp.route('/segments/<segment_id>/rebuild', methods=['POST'])
+@login_required
+def rebuild_segment(segment_id):
+    try:
+        count = segment_service.rebuild(segment_id)
+        flash(f'Segment rebuilt: {count} contacts.', 'success')
+    except ValueError as e:
+        flash(str(e), 'danger')
+    return redirect(url_for('contacts.manage_master_list'))
+
+@bp.route('/segments/<segment_id>/delete', methods=['POST'])
+@login_required
+def delete_segment(segment_id):
+    segment_service.delete_segment(segment_id)
+    flash('Segment deleted.', 'success')
+    return redirect(url_for('contacts.manage_master_list'))
+
 @bp.route('/delete_contact/<contact_id>', methods=['POST'])
 @login_required
 def delete_contact(contact_id):
@@ -1,10 +1,13 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
-from .. import event_service, contact_service
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, Response, stream_with_context
+from .. import event_service, contact_service, segment_service
+from ..services.event_service import EXPORT_FIELDS
+from ..services.export_formats import EXPORT_FORMATS
 from datetime import datetime
 from bson import ObjectId
 from flask_login import login_required
 import pytz
 import json
+from ..metrics import track_route
 
 bp = Blueprint('events', __name__)
 
@@ -42,9 +45,28 @@ def manage_invitees(event_id):
         'events/manage_invitees.html',
         event=event,
         contacts=contacts,
+        segments=segment_service.get_segments(),
         current_invitee_ids=current_invitee_ids
     )
 
+@bp.route('/events/<event_id>/export', methods=['GET'])
+@login_required
+def export_invitees(event_id):
+    """Stream the guest list as ?format=csv|jsonl, optionally filtered by ?status=YES&status=NO"""
+    export_format = request.args.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return {'error': f'Unknown format: {export_format}'}, 400
+    rows = event_service.export_invitees(event_id, request.args.getlist('status'))
+    if rows is None:
+        flash('Event not found', 'error')
+        return redirect(url_for('events.manage_events'))
+    mimetype, encode = EXPORT_FORMATS[export_format]
+    return Response(
+        stream_with_context(encode(rows, EXPORT_FIELDS)),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename="invitees-{event_id}.{export_format}"'}
+    )
+
 @bp.route('/events/<event_id>/add_invitees', methods=['POST'])
 @login_required
 def add_invitees(event_id):
@@ -65,6 +87,19 @@ def add_invitees(event_id):
     
     return redirect(url_for('events.manage_invitees', event_id=event_id))
 
+@bp.route('/events/<event_id>/add_segment', methods=['POST'])
+@login_required
+def add_segment(event_id):
+    try:
+        added_count = segment_service.add_to_event(request.form['segment_id'], event_id, event_service)
+        if added_count > 0:
+            flash(f'{added_count} new invitees added from the segment!', 'success')
+        else:
+            flash('No new invitees were added (they may already be on the list).', 'info')
+    except Exception as e:
+        flash(f'Error adding segment: {str(e)}', 'error')
+    return redirect(url_for('events.manage_invitees', event_id=event_id))
+
 @bp.route('/events/<event_id>/toggle_automation', methods=['POST'])
 @login_required
 def toggle_automation(event_id):
@@ -82,6 +117,15 @@ def toggle_automation(event_id):
         
     return redirect(url_for('events.manage_invitees', event_id=event_id))
 
+@bp.route('/events/<event_id>/over_invite', methods=['POST'])
+@login_required
+def set_over_invite(event_id):
+    """Set the event's over-invite policy: 'on', 'off', or 'default' to follow OVER_INVITE_DEFAULT"""
+    policy = {'on': True, 'off': False, 'default': None}.get(request.form.get('policy'), None)
+    event_service.update_event(event_id, {'over_invite': policy})
+    flash('Over-invitation policy updated.', 'success')
+    return redirect(url_for('events.manage_invitees', event_id=event_id))
+
 @bp.route('/events/<event_id>/reorder_invitees', methods=['POST'])
 @login_required
 def reorder_invitees(event_id):
@@ -118,6 +162,7 @@ def delete_event(event_id):
 
 # --- RSVP URL Routes ---
 @bp.route('/rsvp/<token>', methods=['GET'])
+@track_route('rsvp_page')
 def rsvp_page(token):
     event, invitee = event_service.find_event_and_invitee_by_token(token)
     if not event or not invitee:
@@ -127,6 +172,7 @@ def rsvp_page(token):
     return render_template("events/rsvp_page.html", event=event, invitee=invitee, token=token)
 
 @bp.route('/rsvp/submit/<token>/<response>', methods=['GET'])
+@track_route('rsvp_submit')
 def submit_rsvp(token, response):
     success, message = event_service.process_rsvp_from_url(token, response)
     return render_template("events/rsvp_confirmation.html", success=success, message=message)
\ No newline at end of file
@@ -0,0 +1,18 @@
+# app/routes/metrics_routes.py
+from flask import Blueprint, Response, current_app, request
+from prometheus_client import CONTENT_TYPE_LATEST
+from ..metrics import render_latest
+import hmac
+
+bp = Blueprint('metrics', __name__)
+
+@bp.route('/metrics', methods=['GET'])
+def metrics():
+    token = current_app.config.get('METRICS_TOKEN')
+    if not token:
+        # Not served until a scrape token is configured
+        return '', 404
+    supplied = request.headers.get('Authorization', '')
+    if not hmac.compare_digest(supplied.encode(), f"Bearer {token}".encode()):
+        return '', 401, {'WWW-Authenticate': 'Bearer'}
+    return Response(render_latest(), headers={'Content-Type': CONTENT_TYPE_LATEST})
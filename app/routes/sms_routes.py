@@ -1,107 +1,117 @@
 # app/routes/sms_routes.py
 from flask import Blueprint, request, current_app
 from twilio.twiml.messaging_response import MessagingResponse
-from .. import event_service, sms_service
+from twilio.request_validator import RequestValidator
+from flask_login import login_required, current_user
+from .. import event_service, sms_service, delivery_status_service
+from ..services.log_query_service import LogQueryService
+from ..metrics import track_route
 import logging
-from datetime import datetime
-import json
-from logging.handlers import RotatingFileHandler
 import os
 
 bp = Blueprint('sms', __name__)
 
-# Configure logging
-def setup_sms_logger():
-    # Create logs directory if it doesn't exist
-    if not os.path.exists('logs'):
-        os.makedirs('logs')
-
-    # Create a logger for SMS events
-    logger = logging.getLogger('sms_logger')
-    logger.setLevel(logging.INFO)
-
-    # Create rotating file handler
-    handler = RotatingFileHandler(
-        'logs/sms.log',
-        maxBytes=10000000,  # 10MB
-        backupCount=5
-    )
-    
-    # Create formatter and add it to the handler
-    formatter = logging.Formatter(
-        '%(asctime)s - %(levelname)s - %(message)s'
-    )
-    handler.setFormatter(formatter)
-    
-    # Add handler to logger if it doesn't already have one
-    if not logger.handlers:
-        logger.addHandler(handler)
-    
-    return logger
-
-# Initialize logger
-sms_logger = setup_sms_logger()
+# Handlers are attached centrally by app.logging_setup
+sms_logger = logging.getLogger('sms_logger')
 
 @bp.route('/sms', methods=['POST'])
+@track_route('sms')
 def handle_sms():
-    # Log incoming request
-    request_data = {
-        'from_number': request.form.get('From'),
-        'to_number': request.form.get('To'),
-        'message_body': request.form.get('Body'),
-        'message_sid': request.form.get('MessageSid'),
-        'timestamp': datetime.utcnow().isoformat(),
-    }
-    
-    sms_logger.info(f"Incoming SMS: {json.dumps(request_data, indent=2)}")
+    message_sid = request.form.get('MessageSid')
+    log_context = {'phone': request.form.get('From'), 'message_sid': message_sid, 'sender': request.form.get('To')}
+    sms_logger.info("Incoming SMS", extra=log_context)
     
     try:
         phone_number = request.form['From']
         message_body = request.form['Body'].strip()
+        sms_logger.debug(f"Message body: {message_body}", extra=log_context)
         
-        # Log parsed message components
-        sms_logger.info(f"Parsed message - Phone: {phone_number}, Content: {message_body}")
-        
+        # Replies come back on the pool number the invitation was sent from
+        sender = sms_service.pool_number(request.form.get('To'))
+        if request.form.get('To') and not sender:
+            sms_logger.warning("Reply to a number outside the sender pool", extra=log_context)
+
         # Process the RSVP - now just handles status update
-        result = event_service.process_rsvp(phone_number, message_body)
-        
-        # Log the processing result
-        sms_logger.info(f"RSVP Processing Result - Phone: {phone_number}, Result: {result}")
+        result = event_service.process_rsvp(phone_number, message_body, sender)
+        sms_logger.info(f"RSVP processing result: {result}", extra=log_context)
         
         # Send appropriate response
         resp = MessagingResponse()
         if result == 'YES':
             message = "Thank you for your response! You're confirmed for the event."
-            sms_logger.info(f"Confirmation sent to {phone_number}")
+            sms_logger.info("Confirmation sent", extra=log_context)
         elif result == 'NO':
             message = "Thank you for letting us know you can't make it."
-            sms_logger.info(f"Decline confirmation sent to {phone_number}")
+            sms_logger.info("Decline confirmation sent", extra=log_context)
+        elif result == 'WAITLIST':
+            message = "Thank you! The event is full right now, so you're on the waitlist. We'll text you if a spot opens up."
+            sms_logger.info("Waitlist confirmation sent", extra=log_context)
+        elif result == 'FULL':
+            message = "Sorry, the event is already at full capacity."
+            sms_logger.info("Full-capacity reply sent", extra=log_context)
         else:
             message = "Sorry, we couldn't process your response. Please reply with 'EVENT_CODE YES' or 'EVENT_CODE NO'."
-            sms_logger.warning(f"Invalid response from {phone_number}: {message_body}")
+            sms_logger.warning(f"Invalid response: {message_body}", extra=log_context)
             
         resp.message(message)
         return str(resp)
         
     except KeyError as e:
-        sms_logger.error(f"Missing required field in SMS webhook: {str(e)}")
+        sms_logger.error(f"Missing required field in SMS webhook: {str(e)}", extra=log_context)
         return "Missing required field", 400
         
     except Exception as e:
-        sms_logger.error(f"Error processing SMS: {str(e)}", exc_info=True)
+        sms_logger.error(f"Error processing SMS: {str(e)}", exc_info=True, extra=log_context)
         # Send a user-friendly response
         resp = MessagingResponse()
         resp.message("Sorry, we encountered an error processing your response. Please try again later.")
         return str(resp)
 
+@bp.route('/sms/status', methods=['POST'])
+@track_route('sms_status')
+def handle_status_callback():
+    """Twilio StatusCallback: acknowledge at once, the outcome is written in the next batch"""
+    message_sid = request.form.get('MessageSid')
+    status = request.form.get('MessageStatus')
+    log_context = {'phone': request.form.get('To'), 'message_sid': message_sid}
+    if current_app.config['SMS_STATUS_VALIDATE_SIGNATURE'] and not _signed_by_twilio():
+        sms_logger.warning("Rejected status callback with an invalid signature", extra=log_context)
+        return '', 403
+    if not delivery_status_service.record(message_sid, status, request.form.get('ErrorCode')):
+        sms_logger.warning(f"Ignoring status callback with status {status}", extra=log_context)
+    elif status in ('undelivered', 'failed'):
+        sms_logger.warning(f"Message {status}", extra=log_context)
+    return '', 204
+
+def _signed_by_twilio():
+    """Check X-Twilio-Signature against the callback URL the messages were sent with"""
+    validator = RequestValidator(current_app.config['TWILIO_AUTH_TOKEN'])
+    url = current_app.config['SMS_STATUS_CALLBACK_URL'] or request.url
+    return validator.validate(url, request.form, request.headers.get('X-Twilio-Signature', ''))
+
 # Optional: Add route to view recent logs (protected by admin access)
 @bp.route('/sms/logs', methods=['GET'])
+@login_required
 def view_logs():
-    # This should be protected by authentication and admin check
+    if not current_user.is_admin:
+        return {'error': 'Unauthorized access'}, 403
+
+    log_query_service = LogQueryService(
+        os.path.join(current_app.config['LOG_DIR'], os.path.basename(current_app.config['SMS_LOG_FILE'])),
+        backup_count=current_app.config['SMS_LOG_BACKUP_COUNT']
+    )
     try:
-        with open('logs/sms.log', 'r') as log_file:
-            logs = log_file.readlines()[-100:]  # Get last 100 lines
-        return {'logs': logs}
+        logs, next_cursor = log_query_service.query(
+            limit=min(request.args.get('limit', 100, type=int), 1000),
+            phone=request.args.get('phone'),
+            message_sid=request.args.get('message_sid'),
+            since=request.args.get('since'),
+            until=request.args.get('until'),
+            cursor=request.args.get('cursor')
+        )
+        return {'logs': logs, 'next_cursor': next_cursor}
+    except ValueError as e:
+        return {'error': f'Invalid query: {str(e)}'}, 400
     except Exception as e:
         sms_logger.error(f"Error reading logs: {str(e)}")
         return {'error': 'Unable to read logs'}, 500
\ No newline at end of file
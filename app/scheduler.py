@@ -1,11 +1,12 @@
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.interval import IntervalTrigger
+from apscheduler.events import EVENT_JOB_MAX_INSTANCES, EVENT_JOB_MISSED
 from flask import current_app
+from .metrics import JOB_DURATION, JOB_RUNS, JOB_INTERVAL, JOB_SKIPPED, SWEEP_EVENTS
+from .profiling import profile_sweep
 import logging
 import atexit
-import os
-from logging.handlers import RotatingFileHandler
-from datetime import datetime
+from datetime import datetime, timedelta
 
 class TaskScheduler:
     _instance = None
@@ -14,44 +15,26 @@ class TaskScheduler:
         if not TaskScheduler._instance:
             self.event_service = event_service
             self.sms_service = sms_service
+            self.job_history_service = None
+            self.sweep_coordinator = None
+            self.deadline_tracker = None
+            self.reactive_engine = None
+            self.reactive = False
             self.app = app
             self.scheduler = BackgroundScheduler()
             self.is_running = False
+            self.base_intervals = {}
+            self.intervals = {}
+            self.skipped_runs = {}
             TaskScheduler._instance = self
             
-            # Setup logging
-            self._setup_logging()
+            self.logger = logging.getLogger('scheduler')
             
             # Register the shutdown function
             atexit.register(self.shutdown)
             
             self.logger.info("TaskScheduler initialized")
 
-    def _setup_logging(self):
-        """Setup logging configuration"""
-        if not os.path.exists('logs'):
-            os.makedirs('logs')
-
-        self.logger = logging.getLogger('scheduler')
-        self.logger.setLevel(logging.INFO)
-
-        file_handler = RotatingFileHandler(
-            'logs/scheduler.log',
-            maxBytes=1024 * 1024,  # 1MB
-            backupCount=5
-        )
-
-        console_handler = logging.StreamHandler()
-        formatter = logging.Formatter(
-            '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-        )
-        file_handler.setFormatter(formatter)
-        console_handler.setFormatter(formatter)
-
-        if not self.logger.handlers:
-            self.logger.addHandler(file_handler)
-            self.logger.addHandler(console_handler)
-
     @classmethod
     def get_instance(cls):
         """Get or create singleton instance"""
@@ -59,50 +42,63 @@ class TaskScheduler:
             cls._instance = TaskScheduler()
         return cls._instance
 
-    def init_app(self, app, event_service, sms_service):
+    def init_app(self, app, event_service, sms_service, job_history_service=None, sweep_coordinator=None,
+                 deadline_tracker=None, reactive_engine=None):
         """Initialize with Flask app"""
         self.logger.info("Initializing scheduler with Flask app")
         self.app = app
         self.event_service = event_service
         self.sms_service = sms_service
+        self.job_history_service = job_history_service
+        self.sweep_coordinator = sweep_coordinator
+        self.deadline_tracker = deadline_tracker
+        self.reactive_engine = reactive_engine
         
         if not self.is_running:
             self.start()
 
     def start(self):
-        """Start the scheduler with configurable intervals"""
+        """
+        Start the scheduler with configurable intervals. Each job runs at most
+        once at a time and missed runs are coalesced into one.
+        """
         if not self.is_running:
             try:
                 self.logger.info("Starting scheduler...")
                 
-                expiry_interval = self.app.config.get('EXPIRY_CHECK_INTERVAL', 1)
-                capacity_interval = self.app.config.get('CAPACITY_CHECK_INTERVAL', 1)
-                reminder_interval = self.app.config.get('REMINDER_CHECK_INTERVAL', 30)
+                sweep_interval = self.app.config.get('SWEEP_INTERVAL', 1)
+
+                if self.deadline_tracker:
+                    self.deadline_tracker.start(self._deadline_sweep_job)
+                if self.reactive_engine and self.reactive_engine.start():
+                    # Change streams drive the work; polling only reconciles anything missed
+                    self.reactive = True
+                    sweep_interval = max(sweep_interval, self.app.config.get('REACTIVE_RECONCILE_INTERVAL', 15))
                 
-                self.logger.info(f"Configured intervals - Expiry: {expiry_interval}min, "
-                                 f"Capacity: {capacity_interval}min, Reminder: {reminder_interval}min")
+                self.logger.info(f"Configured intervals - Sweep: {sweep_interval}min")
                 
-                self.scheduler.add_job(
-                    func=self._check_expired_invitations_job,
-                    trigger=IntervalTrigger(minutes=expiry_interval),
-                    id='check_expired_invitations',
-                    name='Check expired invitations'
-                )
-
-                self.scheduler.add_job(
-                    func=self._manage_event_capacity_job,
-                    trigger=IntervalTrigger(minutes=capacity_interval),
-                    id='manage_event_capacity',
-                    name='Manage event capacity'
-                )
-
-                self.scheduler.add_job(
-                    func=self._send_pending_reminders_job,
-                    trigger=IntervalTrigger(minutes=reminder_interval),
-                    id='send_pending_reminders',
-                    name='Send pending RSVP reminders'
-                )
-
+                jobs = [
+                    ('sweep_events', 'Expire, remind and refill events',
+                     self._sweep_events_job, sweep_interval),
+                ]
+                now = datetime.now()
+                for job_id, name, func, interval_minutes in jobs:
+                    self.base_intervals[job_id] = interval_minutes * 60
+                    self.intervals[job_id] = interval_minutes * 60
+                    self.skipped_runs[job_id] = 0
+                    JOB_INTERVAL.labels(job_id).set(interval_minutes * 60)
+                    self.scheduler.add_job(
+                        func=func,
+                        trigger=IntervalTrigger(minutes=interval_minutes),
+                        id=job_id,
+                        name=name,
+                        max_instances=1,
+                        coalesce=True,
+                        misfire_grace_time=interval_minutes * 60,
+                        next_run_time=now + timedelta(minutes=interval_minutes)
+                    )
+
+                self.scheduler.add_listener(self._on_run_skipped, EVENT_JOB_MAX_INSTANCES | EVENT_JOB_MISSED)
                 self.scheduler.start()
                 self.is_running = True
                 self.logger.info("Scheduler started successfully")
@@ -113,35 +109,129 @@ class TaskScheduler:
                 self.logger.error(f"Error starting scheduler: {str(e)}", exc_info=True)
                 self.is_running = False
 
-    def _check_expired_invitations_job(self):
-        """Job that only handles checking and marking expired invitations"""
+    def _on_run_skipped(self, event):
+        """Count runs dropped because the previous one was still going or the slot was missed"""
+        self.skipped_runs[event.job_id] = self.skipped_runs.get(event.job_id, 0) + 1
+        reason = 'overlap' if event.code == EVENT_JOB_MAX_INSTANCES else 'missed'
+        JOB_SKIPPED.labels(event.job_id, reason).inc()
+        self.logger.warning(f"Skipped a run of {event.job_id} ({reason})", extra={'job': event.job_id})
+
+    def _adapt_interval(self, job_id, events_updated):
+        """
+        Halve the interval while sweeps keep finding a backlog of work and let it
+        grow back by half again per idle run, bounded by SCHEDULER_MIN_INTERVAL_SECONDS
+        and SCHEDULER_MAX_INTERVAL_FACTOR times the configured interval.
+        """
+        if not self.app.config.get('SCHEDULER_ADAPTIVE', True) or job_id not in self.intervals:
+            return
+        base = self.base_intervals[job_id]
+        current = self.intervals[job_id]
+        lower = min(base, self.app.config.get('SCHEDULER_MIN_INTERVAL_SECONDS', 15))
+        upper = base * self.app.config.get('SCHEDULER_MAX_INTERVAL_FACTOR', 4)
+        if events_updated >= self.app.config.get('SCHEDULER_BUSY_THRESHOLD', 5):
+            interval = max(lower, current / 2)
+        elif events_updated == 0:
+            interval = min(upper, current * 1.5)
+        else:
+            interval = current
+        interval = int(interval)
+        if interval != current:
+            self.intervals[job_id] = interval
+            JOB_INTERVAL.labels(job_id).set(interval)
+            self.scheduler.reschedule_job(job_id, trigger=IntervalTrigger(seconds=interval))
+            self.logger.info(f"{job_id} interval now {interval}s ({events_updated} events updated)",
+                             extra={'job': job_id})
+
+    def get_cadence(self):
+        """Current interval, next run and skipped-run count per job"""
+        cadence = {}
+        for job_id, interval in self.intervals.items():
+            job = self.scheduler.get_job(job_id)
+            cadence[job_id] = {
+                'interval_seconds': interval,
+                'base_interval_seconds': self.base_intervals[job_id],
+                'next_run_time': job.next_run_time if job else None,
+                'skipped_runs': self.skipped_runs.get(job_id, 0),
+            }
+        return cadence
+
+    def _run_instrumented(self, job_name, sweep):
+        """
+        Run a sweep, recording its duration, outcome and number of events changed.
+        With SCHEDULER_PROFILING on, per-phase timings are collected as well, and
+        every run is appended to the job history when a history service is set.
+        """
+        config = self.app.config
+        outcome = 'error'
+        profile = None
         try:
-            with self.app.app_context():
-                self.logger.info("Starting expired invitations check...")
-                self.event_service.check_expired_invitations()
-                self.logger.info("Completed expired invitations check")
-        except Exception as e:
-            self.logger.error(f"Error in check_expired_invitations_job: {str(e)}", exc_info=True)
-
-    def _manage_event_capacity_job(self):
-        """Job that handles checking capacity and sending new invitations"""
+            with JOB_DURATION.labels(job_name).time(), profile_sweep(
+                job_name,
+                time_phases=config.get('SCHEDULER_PROFILING', False),
+                cprofile_threshold=config.get('SCHEDULER_CPROFILE_THRESHOLD', 0),
+                dump_dir=config.get('SCHEDULER_PROFILE_DIR', 'logs/profiles')
+            ) as profile:
+                result = sweep()
+            outcome = 'success'
+        finally:
+            JOB_RUNS.labels(job_name, outcome).inc()
+            if profile is not None:
+                if outcome == 'error':
+                    profile.count('errors')
+                run = profile.to_dict()
+                run['outcome'] = outcome
+                if profile.time_phases:
+                    self.logger.info(f"{job_name} phases: {run['phases']}", extra={'job': job_name})
+                if self.job_history_service:
+                    self.job_history_service.record_run(run)
+        # Sweeps return either a count of events updated or a dict of per-stage counts
+        events_updated = result.get('events_updated', 0) if isinstance(result, dict) else (result or 0)
+        SWEEP_EVENTS.labels(job_name).observe(events_updated)
+        self._adapt_interval(job_name, events_updated)
+        return result
+
+    def _sweep_events_job(self):
+        """
+        Job that expires, reminds and refills capacity for every event in one pass,
+        or for the partitions this worker can claim when sweeps are partitioned
+        """
         try:
+            if self.reactive and not self.deadline_tracker.is_leader:
+                # The process leading the deadline timers also runs the reconcile sweep
+                return
             with self.app.app_context():
-                self.logger.info("Starting event capacity management...")
-                self.event_service.manage_event_capacity()
-                self.logger.info("Completed event capacity management")
+                self.logger.info("Starting event sweep job...")
+                sweep = self.event_service.run_sweep
+                if self.sweep_coordinator:
+                    # Leave partitions another worker swept within the last half interval alone
+                    min_gap = self.intervals.get('sweep_events', 60) / 2
+                    sweep = lambda: self.sweep_coordinator.run(min_gap_seconds=min_gap)
+                if self.deadline_tracker:
+                    with self.deadline_tracker.lock:
+                        stats = self._run_instrumented('sweep_events', sweep)
+                else:
+                    stats = self._run_instrumented('sweep_events', sweep)
+                self.logger.info(f"Completed event sweep job: {stats}")
         except Exception as e:
-            self.logger.error(f"Error in manage_event_capacity_job: {str(e)}", exc_info=True)
-
-    def _send_pending_reminders_job(self):
-        """Job that handles sending reminders for pending RSVPs."""
+            self.logger.error(f"Error in sweep_events_job: {str(e)}", exc_info=True)
+
+    def _deadline_sweep_job(self, event_ids):
+        """
+        Sweep just the events with a reminder, expiry or refill due now. With
+        partitioned sweeps they go through the coordinator, which holds each
+        partition's lease and send budget; returns the events whose partition
+        was busy, for the timers to retry.
+        """
         try:
             with self.app.app_context():
-                self.logger.info("Starting pending reminders job...")
-                self.event_service.send_pending_reminders()
-                self.logger.info("Completed pending reminders job")
+                if self.sweep_coordinator:
+                    stats = self._run_instrumented('deadline_sweep',
+                                                   lambda: self.sweep_coordinator.sweep_events(event_ids))
+                    return stats['busy']
+                self._run_instrumented('deadline_sweep', lambda: self.event_service.run_sweep(event_ids=event_ids))
         except Exception as e:
-            self.logger.error(f"Error in _send_pending_reminders_job: {str(e)}", exc_info=True)
+            self.logger.error(f"Error in deadline_sweep: {str(e)}", exc_info=True)
+        return []
 
     def _log_next_run_times(self):
         """Helper method to log next scheduled run times"""
@@ -154,6 +244,10 @@ class TaskScheduler:
         if self.is_running:
             try:
                 self.logger.info("Shutting down scheduler...")
+                if self.reactive:
+                    self.reactive_engine.stop()
+                if self.deadline_tracker:
+                    self.deadline_tracker.stop()
                 self.scheduler.shutdown()
                 self.is_running = False
                 self.logger.info("Scheduler shutdown successfully")
@@ -0,0 +1,101 @@
+# app/services/async_rsvp_service.py
+from datetime import datetime
+from ..models.event import Event
+from ..metrics import DB_DURATION
+from .event_service import (parse_sms_reply, awaiting_reply, over_capacity_status, recorded_message,
+                            SEAT_AVAILABLE)
+import logging
+import pytz
+import time
+
+try:
+    from pymongo import AsyncMongoClient
+except ImportError:  # pymongo < 4.9
+    AsyncMongoClient = None
+
+class AsyncRsvpService:
+    """
+    The public RSVP paths of EventService (link lookups, link answers and SMS
+    replies) on pymongo's asyncio client, for the ASGI app in app.asgi.
+    Answers are single atomic updates of the matched invitee, so concurrent
+    replies to one event never overwrite each other's invitees.
+    """
+    def __init__(self, mongo_uri, max_pool_size=100, waitlist_enabled=True):
+        if AsyncMongoClient is None:
+            raise RuntimeError("The async serving path needs pymongo 4.9 or newer")
+        self.client = AsyncMongoClient(mongo_uri, maxPoolSize=max_pool_size, connect=False)
+        self.events_collection = self.client.get_default_database()['events']
+        self.waitlist_enabled = waitlist_enabled
+        self.timezone = pytz.timezone('UTC')
+        self.logger = logging.getLogger('event_service')
+
+    async def close(self):
+        await self.client.close()
+
+    def get_current_time(self):
+        return datetime.now(self.timezone)
+
+    async def _timed(self, operation, awaitable):
+        start = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            DB_DURATION.labels(operation).observe(time.perf_counter() - start)
+
+    async def find_event_and_invitee_by_token(self, token):
+        event_data = await self._timed('find_event_and_invitee_by_token', self.events_collection.find_one(
+            {"invitees.rsvp_token": token},
+            {"name": 1, "date": 1, "capacity": 1, "event_code": 1,
+             "invitees": {"$elemMatch": {"rsvp_token": token}}}
+        ))
+        if not event_data or not event_data.get('invitees'):
+            return None, None
+        invitee = event_data['invitees'][0]
+        return Event.from_dict(event_data), invitee
+
+    async def _record_reply(self, operation, query, response):
+        """
+        Record a reply on the invitee `query` matches; a YES only while a seat is
+        free, else as the waitlist (or full) status. Returns (event, recorded status).
+        """
+        update = {"$set": {"invitees.$.status": response, "invitees.$.responded_at": self.get_current_time()}}
+        if response == 'YES':
+            event_data = await self._timed(operation, self.events_collection.find_one_and_update(
+                dict(query, **SEAT_AVAILABLE), update, projection={"name": 1}
+            ))
+            if event_data:
+                return event_data, response
+            response = over_capacity_status(self.waitlist_enabled)
+            update["$set"]["invitees.$.status"] = response
+        event_data = await self._timed(operation, self.events_collection.find_one_and_update(
+            query, update, projection={"name": 1}
+        ))
+        return event_data, response
+
+    async def process_rsvp_from_url(self, token, response):
+        response = response.upper()
+        if response not in ['YES', 'NO']:
+            return False, "Invalid response provided."
+        awaiting = {"rsvp_token": token, "status": {"$in": ['invited', 'ERROR']}}
+        event_data, response = await self._record_reply(
+            'process_rsvp_from_url', {"invitees": {"$elemMatch": awaiting}}, response
+        )
+        if event_data:
+            return True, recorded_message(event_data['name'], response)
+        # Nothing awaiting an answer: either already answered or not a token we sent
+        event, invitee = await self.find_event_and_invitee_by_token(token)
+        if not event or not invitee:
+            return False, "This invitation link is invalid."
+        return True, "You have already responded."
+
+    async def process_rsvp(self, phone_number, message_body, sender=None):
+        """Async EventService.process_rsvp; returns 'YES', 'NO', 'WAITLIST', 'FULL' or None"""
+        reply = parse_sms_reply(message_body)
+        if not reply:
+            return None
+        event_code, response = reply
+        awaiting = awaiting_reply(phone_number, sender)
+        event_data, response = await self._record_reply(
+            'process_rsvp', {"event_code": event_code, "invitees": {"$elemMatch": awaiting}}, response
+        )
+        return response if event_data else None
@@ -0,0 +1,95 @@
+# app/services/contact_import.py
+import csv
+import re
+
+# Contact phones are stored as the 10 digits the master list form asks for
+US_PHONE = re.compile(r'^1?(\d{10})$')
+TAG_SEPARATORS = re.compile(r'[,;]')
+
+def normalize_phone(value):
+    """10-digit phone from common spellings ("+1 (555) 010-0000", "555.010.0000"); None if it is not one"""
+    match = US_PHONE.match(re.sub(r'\D', '', value or ''))
+    return match.group(1) if match else None
+
+def normalize_contact(row):
+    """
+    Validate and normalize one imported row into a contact dict.
+    Raises ValueError with a reason the import report can show.
+    """
+    name = ' '.join((row.get('name') or '').split())
+    if not name:
+        raise ValueError('missing name')
+    phone = normalize_phone(row.get('phone'))
+    if not phone:
+        raise ValueError(f"invalid phone number '{row.get('phone') or ''}'")
+    tags = row.get('tags') or []
+    if isinstance(tags, str):
+        tags = TAG_SEPARATORS.split(tags)
+    tags = sorted({tag.strip() for tag in tags if tag.strip()})
+    return {'name': name, 'phone': phone, 'tags': tags}
+
+def csv_rows(lines):
+    """
+    (row number, row) from a CSV with a header row. Column names are matched
+    case-insensitively; 'name' and 'phone' are required, 'tags' is optional.
+    """
+    reader = csv.DictReader(lines)
+    if reader.fieldnames is None:
+        return
+    reader.fieldnames = [field.strip().lower() for field in reader.fieldnames]
+    missing = {'name', 'phone'} - set(reader.fieldnames)
+    if missing:
+        raise ValueError(f"CSV header is missing {', '.join(sorted(missing))}")
+    for row in reader:
+        # reader.line_num is the physical line the row ended on; header is line 1
+        yield reader.line_num, row
+
+def vcf_rows(lines):
+    """(card number, row) from a vCard file: FN (or N) as name, the first TEL, CATEGORIES as tags"""
+    card = None
+    number = 0
+    for raw in _unfold(lines):
+        line = raw.rstrip('\r\n')
+        if not line:
+            continue
+        name, _, value = line.partition(':')
+        field = name.split(';')[0].upper()
+        if '.' in field:
+            # Grouped properties, e.g. item1.TEL
+            field = field.split('.', 1)[1]
+        if field == 'BEGIN' and value.upper() == 'VCARD':
+            card = {}
+            number += 1
+        elif field == 'END' and card is not None:
+            yield number, card
+            card = None
+        elif card is None:
+            continue
+        elif field == 'FN':
+            card['name'] = value
+        elif field == 'N' and not card.get('name'):
+            parts = value.split(';')
+            card['name'] = ' '.join(part for part in (parts[1:2] + parts[:1]) if part)
+        elif field == 'TEL' and 'phone' not in card:
+            card['phone'] = value
+        elif field == 'CATEGORIES':
+            card['tags'] = value
+
+def _unfold(lines):
+    """Join vCard continuation lines (starting with a space or tab) onto the line before"""
+    pending = None
+    for line in lines:
+        if line[:1] in (' ', '\t') and pending is not None:
+            pending = pending.rstrip('\r\n') + line[1:]
+            continue
+        if pending is not None:
+            yield pending
+        pending = line
+    if pending is not None:
+        yield pending
+
+# file extension -> row reader
+IMPORT_FORMATS = {
+    'csv': csv_rows,
+    'vcf': vcf_rows,
+}
@@ -1,20 +1,34 @@
 # app/services/contact_service.py
 from bson import ObjectId
+from pymongo import UpdateOne
 from ..models.contact import Contact
+from .contact_import import normalize_contact
+from .write_batcher import WriteBatcher
+import logging
 
 class ContactService:
-    def __init__(self, db):
+    def __init__(self, db, reporting_db=None, import_batch_size=1000, import_max_errors=1000, segments=None):
         self.db = db
         self.contacts_collection = db['master_list']
+        # Listings may come from a secondary; single-contact reads stay on the primary
+        self.reporting_collection = (reporting_db if reporting_db is not None else db)['master_list']
+        self.import_batch_size = max(1, import_batch_size)
+        self.import_max_errors = import_max_errors
+        # SegmentService kept current with every contact written or deleted here
+        self.segments = segments
+        self.logger = logging.getLogger('contact_service')
 
     def create_contact(self, contact_data):
         contact = Contact.from_dict(contact_data)
-        result = self.contacts_collection.insert_one(contact.to_dict())
+        document = contact.to_dict()
+        result = self.contacts_collection.insert_one(document)
+        if self.segments:
+            self.segments.contacts_changed([{'_id': result.inserted_id, 'tags': document.get('tags')}])
         return str(result.inserted_id)
 
     def get_contacts(self, filters=None):
         query = filters or {}
-        contacts = list(self.contacts_collection.find(query))
+        contacts = list(self.reporting_collection.find(query))
         for contact in contacts:
             contact['_id'] = str(contact['_id'])
         return contacts
@@ -27,16 +41,93 @@ class ContactService:
             {"_id": ObjectId(contact_id)},
             {"$set": contact_data}
         )
-        return self.get_contact(contact_id)
+        contact = self.get_contact(contact_id)
+        if self.segments and contact:
+            self.segments.contacts_changed([contact])
+        return contact
 
     def delete_contact(self, contact_id):
-        return self.contacts_collection.delete_one({"_id": ObjectId(contact_id)})
+        result = self.contacts_collection.delete_one({"_id": ObjectId(contact_id)})
+        if self.segments and result.deleted_count:
+            self.segments.contacts_removed([contact_id])
+        return result
 
     def filter_by_tags(self, tags):
         if not tags:
             return self.get_contacts()
-        return list(self.contacts_collection.find({"tags": {"$in": tags}}))
+        return list(self.reporting_collection.find({"tags": {"$in": tags}}))
     
     def get_all_tags(self):
-        tags = self.contacts_collection.distinct('tags')
-        return sorted(filter(None, tags))
\ No newline at end of file
+        tags = self.reporting_collection.distinct('tags')
+        return sorted(filter(None, tags))
+
+    def import_contacts(self, rows):
+        """
+        Upsert contacts from (row number, row) pairs, e.g. from contact_import's
+        csv_rows or vcf_rows over an uploaded file. Rows are validated as they
+        stream and written in unordered bulk_writes of `import_batch_size`, keyed
+        on phone: an existing contact keeps its tags and gains the imported ones,
+        and takes the imported name. Only one batch is held in memory.
+
+        Returns a report: rows read, contacts created and updated, and the
+        rejected rows as [{'row', 'error'}] (the first `import_max_errors`;
+        `error_count` has them all).
+        """
+        report = {'rows': 0, 'created': 0, 'updated': 0, 'error_count': 0, 'errors': []}
+        # phone -> (first row number, contact); rows repeating a phone within a
+        # batch are merged so the unordered upserts never race on one phone
+        pending = {}
+        for number, row in rows:
+            report['rows'] += 1
+            try:
+                contact = normalize_contact(row)
+            except ValueError as e:
+                self._import_error(report, number, str(e))
+                continue
+            queued = pending.get(contact['phone'])
+            if queued:
+                queued[1]['name'] = contact['name']
+                queued[1]['tags'] = sorted(set(queued[1]['tags']) | set(contact['tags']))
+            else:
+                pending[contact['phone']] = (number, contact)
+            if len(pending) >= self.import_batch_size:
+                self._write_import_batch(pending, report)
+                pending = {}
+        self._write_import_batch(pending, report)
+        self.logger.info(f"Imported {report['rows']} rows: {report['created']} created, "
+                         f"{report['updated']} updated, {report['error_count']} rejected")
+        return report
+
+    def _write_import_batch(self, pending, report):
+        if not pending:
+            return
+        batcher = WriteBatcher(self.contacts_collection, batch_size=len(pending) + 1, flush_interval=float('inf'))
+        for number, contact in pending.values():
+            batcher.add(number, UpdateOne(
+                {'phone': contact['phone']},
+                {'$set': {'name': contact['name']}, '$addToSet': {'tags': {'$each': contact['tags']}}},
+                upsert=True
+            ))
+        batcher.flush()
+        for number, error in batcher.failed.items():
+            self._import_error(report, number, error)
+        created, updated = [], []
+        for phone, (number, contact) in pending.items():
+            if number in batcher.upserted:
+                # New contacts hold exactly the imported tags
+                created.append({'_id': batcher.upserted[number], 'tags': contact['tags']})
+            elif number not in batcher.failed:
+                updated.append(phone)
+        report['created'] += len(created)
+        report['updated'] += len(updated)
+        if self.segments:
+            changed = list(created)
+            if updated:
+                # Existing contacts merged the imported tags into theirs; read back what they have now
+                changed += self.contacts_collection.find({'phone': {'$in': updated}}, {'tags': 1})
+            self.segments.contacts_changed(changed)
+
+    def _import_error(self, report, number, error):
+        report['error_count'] += 1
+        if len(report['errors']) < self.import_max_errors:
+            report['errors'].append({'row': number, 'error': error})
\ No newline at end of file
@@ -0,0 +1,114 @@
+# app/services/deadline_columns.py
+from datetime import datetime, timezone
+
+try:
+    import numpy as np
+except ImportError:  # optional; EventService then evaluates deadlines invitee by invitee
+    np = None
+
+EPOCH = datetime(1970, 1, 1)
+EPOCH_UTC = EPOCH.replace(tzinfo=timezone.utc)
+
+
+def _column(field):
+    """One entry per invitee, null where the field is missing, so columns stay aligned"""
+    return {'$map': {'input': '$invitees', 'as': 'i', 'in': {'$ifNull': [f'$$i.{field}', None]}}}
+
+
+def _epoch_column(field):
+    """Like _column, as milliseconds since the epoch (date minus date), so no datetimes reach Python"""
+    return {'$map': {'input': '$invitees', 'as': 'i', 'in': {'$subtract': [f'$$i.{field}', EPOCH]}}}
+
+
+def epoch_seconds(value):
+    """Seconds since the epoch of a stored (naive UTC) or timezone-aware datetime; None stays None"""
+    if value is None:
+        return None
+    return (value - (EPOCH_UTC if value.tzinfo else EPOCH)).total_seconds()
+
+
+# $project stage loading an event's deadline fields as columns instead of invitee documents;
+# phone and sender are only read for the invitees a reminder goes to
+COLUMN_PROJECTION = {
+    'name': 1, 'date': 1, 'capacity': 1, 'event_code': 1, 'invitation_expiry_hours': 1, 'message_templates': 1,
+    'over_invite': 1, 'automation_status': 1,
+    'ids': _column('_id'),
+    'status': _column('status'),
+    'invited_at': _epoch_column('invited_at'),
+    'reminder_sent_at': _column('reminder_sent_at'),
+    'phone': _column('phone'),
+    'sender': _column('sender'),
+}
+
+
+class DeadlineColumns:
+    """
+    An event's invitee statuses, invitation times and reminder flags as NumPy
+    arrays, so expiries and due reminders are found with a few array
+    operations instead of datetime arithmetic per invitee. Only the invitees
+    that match are then looked at one by one.
+
+    Built from an aggregation with COLUMN_PROJECTION (`from_projection`), so
+    the invitee documents are never loaded at all. Invitation times are epoch
+    seconds, NaN where an invitee was never invited.
+    """
+    def __init__(self, ids, status, invited_at, reminded, phones=None, senders=None):
+        self.ids = ids
+        self.status = np.array(['' if value is None else value for value in status], dtype=str)
+        self.invited_at = np.array(invited_at, dtype=float)
+        self.reminded = np.array(reminded, dtype=bool)
+        self.phones = phones
+        self.senders = senders
+
+    @classmethod
+    def from_projection(cls, event_data):
+        return cls(
+            event_data['ids'],
+            event_data['status'],
+            np.array(event_data['invited_at'], dtype=float) / 1000,
+            [bool(value) for value in event_data['reminder_sent_at']],
+            phones=event_data['phone'],
+            senders=event_data['sender'],
+        )
+
+    def __len__(self):
+        return len(self.ids)
+
+    def invitee(self, index):
+        """The fields a reminder needs of the invitee at `index`"""
+        return {'_id': self.ids[index], 'phone': self.phones[index], 'sender': self.senders[index]}
+
+    def _hours_elapsed(self, now):
+        # NaN (never invited) stays NaN, which fails every comparison
+        return (epoch_seconds(now) - self.invited_at) / 3600
+
+    def expire(self, now, expiry_hours):
+        """Indexes of invitations past their expiry; they are marked EXPIRED in the columns"""
+        due = (self.status == 'invited') & (self._hours_elapsed(now) > expiry_hours)
+        indexes = np.flatnonzero(due)
+        self.status[indexes] = 'EXPIRED'
+        return indexes.tolist()
+
+    def reminders_due(self, now, expiry_hours):
+        """(index, hours remaining) of unreminded invitations past half their window, with time left"""
+        elapsed = self._hours_elapsed(now)
+        remaining = np.round(expiry_hours - elapsed)
+        due = (self.status == 'invited') & ~self.reminded & (elapsed >= expiry_hours / 2) & (remaining > 0)
+        indexes = np.flatnonzero(due)
+        return list(zip(indexes.tolist(), remaining[indexes].astype(int).tolist()))
+
+    def may_refill(self, capacity, counts_invited=True, waitlist=False):
+        """Whether a refill has anything to do: people pending and a seat free, or waitlisted guests and a free seat"""
+        confirmed = np.count_nonzero(self.status == 'YES')
+        taken = confirmed + (np.count_nonzero(self.status == 'invited') if counts_invited else 0)
+        if taken < capacity and (self.status == 'pending').any():
+            return True
+        return bool(waitlist and confirmed < capacity and (self.status == 'WAITLIST').any())
+
+    def may_be_due(self, now, expiry_hours, capacity, counts_invited=True, waitlist=False):
+        """Whether a (possibly stale) event has a reminder or expiry due, or seats to refill"""
+        # Reminded invitees are next due at expiry, the rest at half the window
+        due_after = np.where(self.reminded, expiry_hours, expiry_hours / 2)
+        if ((self.status == 'invited') & (self._hours_elapsed(now) >= due_after)).any():
+            return True
+        return self.may_refill(capacity, counts_invited, waitlist)
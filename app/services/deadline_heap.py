@@ -0,0 +1,85 @@
+# app/services/deadline_heap.py
+from collections import defaultdict
+import heapq
+import itertools
+import threading
+import time
+
+class DeadlineHeap:
+    """
+    Thread-safe min-heap of keyed deadlines (epoch seconds). Rescheduling or
+    cancelling a key leaves its old entry in the heap and skips it when popped,
+    so every operation stays O(log n).
+    """
+    def __init__(self):
+        self.heap = []
+        self.deadlines = {}
+        self.keys_by_event = defaultdict(set)
+        self.counter = itertools.count()
+        self.condition = threading.Condition()
+
+    def __len__(self):
+        return len(self.deadlines)
+
+    def schedule(self, key, event_id, when):
+        """Set the deadline for `key`, which belongs to `event_id`"""
+        with self.condition:
+            if self.deadlines.get(key) == when:
+                return
+            self.deadlines[key] = when
+            self.keys_by_event[event_id].add(key)
+            heapq.heappush(self.heap, (when, next(self.counter), key, event_id))
+            if self.heap[0][2] == key:
+                # New earliest deadline; wake the waiter so it does not oversleep
+                self.condition.notify_all()
+
+    def cancel(self, key, event_id):
+        with self.condition:
+            self.deadlines.pop(key, None)
+            self.keys_by_event.get(event_id, set()).discard(key)
+
+    def cancel_event(self, event_id):
+        with self.condition:
+            for key in self.keys_by_event.pop(event_id, ()):
+                self.deadlines.pop(key, None)
+
+    def clear(self):
+        with self.condition:
+            self.heap = []
+            self.deadlines.clear()
+            self.keys_by_event.clear()
+            self.condition.notify_all()
+
+    def next_deadline(self):
+        with self.condition:
+            self._drop_stale()
+            return self.heap[0][0] if self.heap else None
+
+    def _drop_stale(self):
+        while self.heap and self.deadlines.get(self.heap[0][2]) != self.heap[0][0]:
+            heapq.heappop(self.heap)
+
+    def pop_due(self, now=None):
+        """Remove and return (key, event_id) for every deadline at or before `now`"""
+        now = time.time() if now is None else now
+        due = []
+        with self.condition:
+            while True:
+                self._drop_stale()
+                if not self.heap or self.heap[0][0] > now:
+                    return due
+                when, _, key, event_id = heapq.heappop(self.heap)
+                del self.deadlines[key]
+                self.keys_by_event[event_id].discard(key)
+                if not self.keys_by_event[event_id]:
+                    del self.keys_by_event[event_id]
+                due.append((key, event_id))
+
+    def wait(self, timeout):
+        """Sleep until the earliest deadline, a new earlier deadline, or `timeout` seconds"""
+        with self.condition:
+            self._drop_stale()
+            if self.heap:
+                timeout = min(timeout, max(0.0, self.heap[0][0] - time.time()))
+            if timeout > 0:
+                self.condition.wait(timeout)
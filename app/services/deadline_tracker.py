@@ -0,0 +1,199 @@
+# app/services/deadline_tracker.py
+from datetime import datetime, timedelta
+from pymongo.errors import PyMongoError
+from .deadline_heap import DeadlineHeap
+import logging
+import os
+import pytz
+import socket
+import threading
+import time
+
+LEADER_LEASE_ID = 'deadline_timers'
+# Seconds before retrying events whose sweep partition was busy
+RETRY_SECONDS = 5
+
+# Just the fields needed to work out an event's deadlines
+DEADLINE_PROJECTION = {
+    'capacity': 1, 'automation_status': 1, 'invitation_expiry_hours': 1,
+    'invitees._id': 1, 'invitees.status': 1, 'invitees.invited_at': 1, 'invitees.reminder_sent_at': 1,
+}
+
+class DeadlineTracker:
+    """
+    In-memory min-heap of upcoming per-invitee deadlines: the reminder at half
+    the expiry window and the expiry itself, plus a "refill" when an active
+    event has free seats and people waiting. Each deadline fires `sweep` (a
+    callable taking a list of event ids and returning any it could not sweep
+    yet) at that second rather than waiting for the next polling sweep.
+
+    A refill found right after the event was swept is held back by
+    `refill_backoff_seconds`: seats that sweep left free are down to failed
+    sends or a spent SMS budget, and sweeping again at once would not help.
+
+    The heap is rebuilt from an indexed query when this process becomes the
+    leader and every `refresh_seconds` after that. In between it is kept
+    current by EventService (invitations sent, reminders sent, replies) and,
+    in reactive mode, by the events change stream. Only one process holds
+    the heap at a time, chosen through a lease in `sweep_leases`.
+    """
+    def __init__(self, db, invitation_expiry_hours=24, lease_seconds=30, refresh_seconds=300,
+                 refill_backoff_seconds=60):
+        self.db = db
+        self.events_collection = db['events']
+        self.leases_collection = db['sweep_leases']
+        self.invitation_expiry_hours = invitation_expiry_hours
+        self.lease_seconds = lease_seconds
+        self.refresh_seconds = refresh_seconds
+        self.refill_backoff_seconds = refill_backoff_seconds
+        # event id -> time.time() the event was last swept, while a refill may follow
+        self.swept_at = {}
+        self.heap = DeadlineHeap()
+        self.sweep = None
+        # Held while sweeping so timer and polling sweeps never overlap in this process
+        self.lock = threading.Lock()
+        self.is_leader = False
+        self.refreshed_at = 0
+        self.stopping = threading.Event()
+        self.logger = logging.getLogger('scheduler')
+
+    @property
+    def worker_id(self):
+        # Read per call: the tracker may be built before gunicorn forks its workers
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+    def start(self, sweep):
+        self.sweep = sweep
+        threading.Thread(target=self._lead, name='deadline-leader', daemon=True).start()
+        threading.Thread(target=self._fire, name='deadline-timers', daemon=True).start()
+        self.logger.info("Deadline timers started")
+
+    def stop(self):
+        self.stopping.set()
+        self.heap.clear()
+
+    # Leadership
+
+    def _renew_lease(self):
+        now = datetime.utcnow()
+        try:
+            self.leases_collection.update_one(
+                {'_id': LEADER_LEASE_ID},
+                {'$setOnInsert': {'owner': None, 'expires_at': datetime(1970, 1, 1)}},
+                upsert=True
+            )
+            lease = self.leases_collection.find_one_and_update(
+                {'_id': LEADER_LEASE_ID,
+                 '$or': [{'owner': self.worker_id}, {'expires_at': {'$lte': now}}]},
+                {'$set': {'owner': self.worker_id, 'expires_at': now + timedelta(seconds=self.lease_seconds)}}
+            )
+            return lease is not None
+        except PyMongoError as e:
+            self.logger.error(f"Error renewing deadline timer lease: {str(e)}")
+            return False
+
+    def _lead(self):
+        while not self.stopping.is_set():
+            leader = self._renew_lease()
+            if leader and not self.is_leader:
+                self.logger.info("Deadline timers are now led by this process")
+                self.is_leader = True
+                self.rebuild()
+            elif not leader and self.is_leader:
+                self.logger.warning("Lost the deadline timer lease, standing by")
+                self.is_leader = False
+                self.heap.clear()
+            elif leader and time.monotonic() - self.refreshed_at >= self.refresh_seconds:
+                # Picks up invitations sent by other processes' sweeps
+                self.rebuild()
+            self.stopping.wait(self.lease_seconds / 3)
+
+    # Deadlines
+
+    def rebuild(self):
+        """Reload deadlines for every active event with outstanding invitations"""
+        self.refreshed_at = time.monotonic()
+        try:
+            events = self.events_collection.find(
+                {'invitees.status': 'invited', 'automation_status': 'active'}, DEADLINE_PROJECTION
+            )
+            self.heap.clear()
+            for event_data in events:
+                self.schedule_event(event_data)
+            self.logger.info(f"Deadline heap rebuilt with {len(self.heap)} deadlines")
+        except PyMongoError as e:
+            self.logger.error(f"Error rebuilding deadline heap: {str(e)}")
+
+    def _epoch(self, value):
+        return value.replace(tzinfo=pytz.utc).timestamp()
+
+    def schedule_event(self, event_data, swept=False):
+        """
+        Replace an event's deadlines with those implied by its current invitees;
+        `swept` says the event has just been swept, which delays its next refill
+        """
+        if not self.is_leader:
+            return
+        event_id = event_data['_id']
+        self.heap.cancel_event(event_id)
+        if swept:
+            self.swept_at[event_id] = time.time()
+        if event_data.get('automation_status') != 'active':
+            self.swept_at.pop(event_id, None)
+            return
+        expiry_seconds = event_data.get('invitation_expiry_hours', self.invitation_expiry_hours) * 3600
+        taken = 0
+        pending = False
+        for invitee in event_data.get('invitees', []):
+            status = invitee.get('status')
+            if status == 'YES':
+                taken += 1
+            elif status == 'pending':
+                pending = True
+            elif status == 'invited':
+                taken += 1
+                if not invitee.get('invited_at'):
+                    continue
+                invited_at = self._epoch(invitee['invited_at'])
+                if not invitee.get('reminder_sent_at'):
+                    self.heap.schedule((event_id, invitee['_id'], 'remind'), event_id,
+                                       invited_at + expiry_seconds / 2)
+                # Expiry is strictly after the window closes; give it a second of slack
+                self.heap.schedule((event_id, invitee['_id'], 'expire'), event_id,
+                                   invited_at + expiry_seconds + 1)
+        if pending and taken < event_data.get('capacity', 0):
+            refill_at = self.swept_at.get(event_id, 0) + self.refill_backoff_seconds
+            self.heap.schedule((event_id, None, 'refill'), event_id, max(time.time(), refill_at))
+        else:
+            self.swept_at.pop(event_id, None)
+
+    def request_refill(self, event_id):
+        """A seat may have been freed (e.g. a decline); refill the event straight away"""
+        if self.is_leader:
+            self.heap.schedule((event_id, None, 'refill'), event_id, time.time())
+
+    def answered(self, event_id, invitee_id, response):
+        """Drop an invitee's timers; anything but a YES (a decline, an undelivered invitation) frees a seat to refill"""
+        self.heap.cancel((event_id, invitee_id, 'remind'), event_id)
+        self.heap.cancel((event_id, invitee_id, 'expire'), event_id)
+        if response != 'YES':
+            self.request_refill(event_id)
+
+    def forget_event(self, event_id):
+        self.heap.cancel_event(event_id)
+        self.swept_at.pop(event_id, None)
+
+    def _fire(self):
+        while not self.stopping.is_set():
+            self.heap.wait(timeout=1.0)
+            due = self.heap.pop_due()
+            if not due or not self.is_leader:
+                continue
+            event_ids = list({event_id for _, event_id in due})
+            try:
+                with self.lock:
+                    busy = self.sweep(event_ids)
+                for event_id in busy or []:
+                    self.heap.schedule((event_id, None, 'refill'), event_id, time.time() + RETRY_SECONDS)
+            except Exception as e:
+                self.logger.error(f"Error in deadline sweep: {str(e)}", exc_info=True)
@@ -0,0 +1,173 @@
+# app/services/delivery_status_service.py
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
+from .write_batcher import WriteBatcher
+from ..metrics import SMS_DELIVERY_STATUS
+import atexit
+import logging
+import threading
+import time
+
+# Twilio reports a message's progress in this order; a late, lower-ranked
+# callback never overwrites a later one
+STATUS_RANK = {
+    'accepted': 0, 'scheduled': 0, 'queued': 1, 'sending': 2, 'sent': 3,
+    'delivered': 4, 'undelivered': 4, 'failed': 4, 'canceled': 4,
+}
+FINAL_RANK = 4
+FINAL_STATUSES = [status for status, rank in STATUS_RANK.items() if rank == FINAL_RANK]
+# Outcomes after which the invitation will never reach the invitee
+UNDELIVERABLE = ('undelivered', 'failed', 'canceled')
+
+class DeliveryStatusService:
+    """
+    Applies Twilio StatusCallback reports to the invitation they belong to.
+    The webhook only records the callback in memory; a background thread
+    writes the buffered statuses as unordered bulk_writes keyed by
+    message_sid every `flush_interval` seconds, or sooner once `batch_size`
+    are waiting, so a burst of callbacks after a wave costs a handful of
+    round trips.
+
+    An invitation that is undelivered or failed gives up its seat straight
+    away: the invitee moves to UNDELIVERED, and the deadline tracker drops
+    their timers and refills the event. Without a tracker, the next sweep
+    fills the seat.
+
+    A final status can beat the sweep's write of the message_sid it belongs
+    to. One that matches no stored invitation is kept and applied again on
+    each flush for `retry_seconds` before it is dropped.
+    """
+    def __init__(self, db, deadline_tracker=None, batch_size=500, flush_interval=2.0, retry_seconds=60):
+        self.events_collection = db['events']
+        self.deadline_tracker = deadline_tracker
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retry_seconds = retry_seconds
+        self.pending = {}
+        # message_sid -> (status, error_code, time.monotonic() to give up at)
+        self.unmatched = {}
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.thread = None
+        self.logger = logging.getLogger('sms_service')
+
+    def record(self, message_sid, status, error_code=None):
+        """Buffer one callback; returns False if it is not a status we know"""
+        status = (status or '').lower()
+        if not message_sid or status not in STATUS_RANK:
+            return False
+        SMS_DELIVERY_STATUS.labels(status).inc()
+        with self.lock:
+            previous = self.pending.get(message_sid)
+            if previous is None or STATUS_RANK[status] >= STATUS_RANK[previous[0]]:
+                self.pending[message_sid] = (status, error_code)
+            waiting = len(self.pending)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name='delivery-status', daemon=True)
+                self.thread.start()
+                atexit.register(self.flush)
+        if waiting >= self.batch_size:
+            self.wakeup.set()
+        return True
+
+    def _run(self):
+        while True:
+            self.wakeup.wait(self.flush_interval)
+            self.wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                self.logger.error(f"Error applying delivery statuses: {str(e)}", exc_info=True)
+
+    def _operation(self, message_sid, status, error_code):
+        fields = {'invitees.$.delivery_status': status}
+        if status in UNDELIVERABLE:
+            # Only an invitation still awaiting a reply gives up its seat
+            selector = {'message_sid': message_sid, 'status': 'invited'}
+            fields['invitees.$.status'] = 'UNDELIVERED'
+            fields['invitees.$.error_message'] = f"Twilio reported the message {status}" + (
+                f" (error {error_code})" if error_code else ''
+            )
+        elif STATUS_RANK[status] < FINAL_RANK:
+            # Callbacks can arrive out of order; never step back from a final outcome
+            selector = {'message_sid': message_sid, 'delivery_status': {'$nin': FINAL_STATUSES}}
+        else:
+            selector = {'message_sid': message_sid}
+        return UpdateOne({'invitees': {'$elemMatch': selector}}, {'$set': fields})
+
+    def flush(self):
+        """Write every buffered status; returns how many were applied"""
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            retries, self.unmatched = self.unmatched, {}
+        for message_sid, (status, error_code, _) in retries.items():
+            # A newer callback for the same message wins
+            if message_sid not in pending:
+                pending[message_sid] = (status, error_code)
+        if not pending:
+            return 0
+        writes = WriteBatcher(self.events_collection, self.batch_size, float('inf'))
+        for message_sid, (status, error_code) in pending.items():
+            writes.add(message_sid, self._operation(message_sid, status, error_code))
+        writes.flush()
+        for message_sid, message in writes.failed.items():
+            self.logger.error(f"Failed to record delivery status: {message}", extra={'message_sid': message_sid})
+
+        final = [sid for sid, (status, _) in pending.items()
+                 if STATUS_RANK[status] == FINAL_RANK and sid not in writes.failed]
+        unmatched = self._unmatched(final)
+        self._keep_unmatched(unmatched, pending, retries)
+
+        undelivered = [sid for sid in final if pending[sid][0] in UNDELIVERABLE and sid not in unmatched]
+        if undelivered:
+            self._release_seats(undelivered)
+        return writes.written
+
+    def _unmatched(self, message_sids):
+        """The message_sids no stored invitation has (yet)"""
+        if not message_sids:
+            return set()
+        try:
+            stored = set()
+            events = self.events_collection.find(
+                {'invitees.message_sid': {'$in': message_sids}}, {'invitees.message_sid': 1}
+            )
+            for event_data in events:
+                stored.update(invitee.get('message_sid') for invitee in event_data['invitees'])
+            return set(message_sids) - stored
+        except PyMongoError as e:
+            self.logger.error(f"Error checking delivery statuses: {str(e)}")
+            return set()
+
+    def _keep_unmatched(self, unmatched, pending, retries):
+        """Hold unmatched final statuses for the next flush until they have waited retry_seconds"""
+        now = time.monotonic()
+        kept = {}
+        for message_sid in unmatched:
+            status, error_code = pending[message_sid]
+            give_up_at = retries[message_sid][2] if message_sid in retries else now + self.retry_seconds
+            if now < give_up_at:
+                kept[message_sid] = (status, error_code, give_up_at)
+            else:
+                self.logger.warning(f"Dropping {status} status for a message no invitation has",
+                                    extra={'message_sid': message_sid})
+        with self.lock:
+            self.unmatched.update(kept)
+
+    def _release_seats(self, message_sids):
+        """Stop the timers of undelivered invitations and refill their events"""
+        self.logger.info(f"{len(message_sids)} invitations were undelivered, releasing their seats")
+        if not self.deadline_tracker:
+            return
+        try:
+            events = self.events_collection.find(
+                {'invitees.message_sid': {'$in': message_sids}},
+                {'invitees._id': 1, 'invitees.message_sid': 1, 'invitees.status': 1}
+            )
+            wanted = set(message_sids)
+            for event_data in events:
+                for invitee in event_data['invitees']:
+                    if invitee.get('message_sid') in wanted and invitee.get('status') == 'UNDELIVERED':
+                        self.deadline_tracker.answered(event_data['_id'], invitee['_id'], 'UNDELIVERED')
+        except PyMongoError as e:
+            self.logger.error(f"Error releasing undelivered seats: {str(e)}")
@@ -1,150 +1,599 @@
 # app/services/event_service.py
 from datetime import datetime, timedelta
 from bson import ObjectId
+from pymongo import UpdateOne
 from ..models.event import Event
+from ..metrics import observe_db
+from ..profiling import current_profile
+from .write_batcher import WriteBatcher
+from .deadline_columns import COLUMN_PROJECTION, DeadlineColumns, np
 import logging
-from logging.handlers import RotatingFileHandler
-import os
 import pytz
 import secrets
+import zlib
+
+SHARD_KEY_SPACE = 2 ** 32
+
+# Invitee fields included in exports, in column order
+EXPORT_FIELDS = ('name', 'phone', 'status', 'invited_at', 'responded_at', 'reminder_sent_at')
+
+# What a sweep's scan phase reads to tell whether an event has anything due
+SCAN_PROJECTION = {
+    'capacity': 1, 'invitation_expiry_hours': 1, 'over_invite': 1,
+    'invitees.status': 1, 'invitees.invited_at': 1, 'invitees.reminder_sent_at': 1,
+}
+
+# Matches an event that still has a free seat, for accepting a YES atomically
+SEAT_AVAILABLE = {'$expr': {'$lt': [
+    {'$size': {'$filter': {'input': '$invitees', 'as': 'i', 'cond': {'$eq': ['$$i.status', 'YES']}}}},
+    '$capacity'
+]}}
+
+# Invitee fields a refill claims before its messages go out; written one invitee at a time through array filters
+REFILL_FIELDS = ('status', 'invited_at', 'rsvp_token', 'sender', 'promoted_at')
+
+def deadline_update(event_id, now, expired_ids, reminded_ids):
+    """
+    An UpdateOne writing only the invitees a sweep expired or reminded, matched
+    by _id through array filters rather than by position; an invitation that
+    was answered in the meantime is not expired. None if nothing changed.
+    """
+    changes, array_filters = {}, []
+    if expired_ids:
+        changes['invitees.$[expired].status'] = 'EXPIRED'
+        changes['invitees.$[expired].expired_at'] = now
+        array_filters.append({'expired._id': {'$in': list(expired_ids)}, 'expired.status': 'invited'})
+    if reminded_ids:
+        changes['invitees.$[reminded].reminder_sent_at'] = now
+        array_filters.append({'reminded._id': {'$in': list(reminded_ids)}})
+    if not changes:
+        return None
+    return UpdateOne({'_id': event_id}, {'$set': changes}, array_filters=array_filters)
+
+def refill_update(event_id, refilled):
+    """
+    An UpdateOne claiming the invitees a refill changed, given as (invitee,
+    status before) pairs. Each is matched by _id and its old status, so a
+    reply or another sweep that got there first is left alone.
+    """
+    changes, array_filters = {}, []
+    for index, (invitee, previous) in enumerate(refilled):
+        for field in REFILL_FIELDS:
+            if field in invitee:
+                changes[f'invitees.$[i{index}].{field}'] = invitee[field]
+        array_filters.append({f'i{index}._id': invitee['_id'], f'i{index}.status': previous})
+    return UpdateOne({'_id': event_id}, {'$set': changes}, array_filters=array_filters)
+
+def outcome_update(event_id, outcomes):
+    """
+    An UpdateOne recording what became of a refill's messages, given as
+    (guard, fields) pairs: `guard` matches one claimed invitee as the claim
+    left it and `fields` are set on it.
+    """
+    changes, array_filters = {}, []
+    for index, (guard, fields) in enumerate(outcomes):
+        for field, value in fields.items():
+            changes[f'invitees.$[o{index}].{field}'] = value
+        array_filters.append({f'o{index}.{field}': value for field, value in guard.items()})
+    return UpdateOne({'_id': event_id}, {'$set': changes}, array_filters=array_filters)
+
+def shard_key_for(event_id):
+    """Stable 32-bit hash of an event _id; sweeps split the hash space into equal ranges"""
+    return zlib.crc32(ObjectId(event_id).binary)
+
+def shard_partition(event_id, partitions):
+    """Index of the partition (see shard_key_range) an event falls in"""
+    key = shard_key_for(event_id)
+    return next(index for index in range(partitions) if key < SHARD_KEY_SPACE * (index + 1) // partitions)
+
+def shard_key_range(index, partitions):
+    """Query on shard_key matching the events in partition `index` of `partitions`"""
+    return {'$gte': SHARD_KEY_SPACE * index // partitions,
+            '$lt': SHARD_KEY_SPACE * (index + 1) // partitions}
+
+def parse_sms_reply(message_body):
+    """(event_code, 'YES' or 'NO') for a reply of the form "<EVENT_CODE> YES|NO", else None"""
+    parts = message_body.upper().split()
+    if len(parts) != 2 or parts[1] not in ['YES', 'NO']:
+        return None
+    return parts[0], parts[1]
+
+def over_capacity_status(waitlist_enabled):
+    """What a YES is recorded as once the event is full: held on the waitlist, or turned away"""
+    return 'WAITLIST' if waitlist_enabled else 'FULL'
+
+def recorded_message(event_name, response):
+    """What the RSVP link page says once a response is recorded"""
+    if response == 'WAITLIST':
+        return f"Thank you! {event_name} is full right now, so you're on the waitlist. We'll text you if a spot opens up."
+    if response == 'FULL':
+        return f"Sorry, {event_name} is already at full capacity."
+    return f"Thank you! Your response for {event_name} has been recorded."
+
+def awaiting_reply(phone_number, sender=None):
+    """$elemMatch filter for the invitee an SMS reply from `phone_number` (to `sender`) answers"""
+    awaiting = {"phone": phone_number, "status": {"$in": ['invited', 'ERROR']}}
+    if sender:
+        awaiting["sender"] = {"$in": [sender, None]}
+    return awaiting
 
 class EventService:
-    def __init__(self, db, sms_service=None, invitation_expiry_hours=24):
+    def __init__(self, db, sms_service=None, invitation_expiry_hours=24,
+                 write_batch_size=500, write_flush_interval=5.0, deadline_tracker=None, reporting_db=None,
+                 over_invite=None, over_invite_default=False, waitlist_enabled=True, vectorize_min_invitees=0):
         self.db = db
         self.events_collection = db['events']
+        # Dashboards and the sweep scan may read stale data from secondaries;
+        # anything that is written back, and the RSVP paths, read the primary
+        self.reporting_collection = (reporting_db if reporting_db is not None else db)['events']
         self.sms_service = sms_service
         self.invitation_expiry_hours = invitation_expiry_hours
+        self.write_batch_size = write_batch_size
+        self.write_flush_interval = write_flush_interval
+        self.deadline_tracker = deadline_tracker
+        # OverInvitePolicy for events that opt in (or all events, with over_invite_default)
+        self.over_invite = over_invite
+        self.over_invite_default = over_invite_default
+        self.waitlist_enabled = waitlist_enabled
+        # Events with at least this many invitees are scanned as NumPy columns rather
+        # than invitee documents (0 disables; needs numpy)
+        self.vectorize_min_invitees = vectorize_min_invitees if np is not None else 0
         self.timezone = pytz.timezone('UTC')
         
-        self.logger = self._setup_logging()
-
-    def _setup_logging(self):
-        logger = logging.getLogger('event_service')
-        logger.setLevel(logging.INFO)
-
-        if not logger.handlers:
-            if not os.path.exists('logs'):
-                os.makedirs('logs')
-
-            file_handler = RotatingFileHandler('logs/event_service.log', maxBytes=1024 * 1024, backupCount=5)
-            console_handler = logging.StreamHandler()
-            formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-            file_handler.setFormatter(formatter)
-            console_handler.setFormatter(formatter)
-            logger.addHandler(file_handler)
-            logger.addHandler(console_handler)
-        return logger
+        self.logger = logging.getLogger('event_service')
 
     def get_current_time(self):
         return datetime.now(self.timezone)
 
-    def check_expired_invitations(self):
-        self.logger.info("Starting expired invitations check")
-        events = self.events_collection.find({})
-        for event_data in events:
-            try:
-                event = Event.from_dict(event_data)
-                if self._check_event_expired_invitations(event):
-                    self.update_event(str(event_data['_id']), {"invitees": event.invitees})
-            except Exception as e:
-                self.logger.error(f"Error checking expiration for event {event_data.get('_id')}: {str(e)}")
+    def _hydrate(self, event_data):
+        """Build an Event from a document, honouring its stored expiry window"""
+        return Event.from_dict(
+            event_data,
+            invitation_expiry_hours=event_data.get('invitation_expiry_hours', self.invitation_expiry_hours)
+        )
 
-    def _check_event_expired_invitations(self, event):
-        now = self.get_current_time()
-        updated = False
+    def _write_batcher(self):
+        return WriteBatcher(self.events_collection, self.write_batch_size, self.write_flush_interval)
+
+    def _flush_writes(self, writes):
+        """Send the sweep's remaining writes and log any that failed; returns how many failed"""
+        with current_profile().phase('write'):
+            writes.flush()
+        for event_id, message in writes.failed.items():
+            self.logger.error(f"Failed to write sweep changes: {message}", extra={'event_id': event_id})
+        return len(writes.failed)
+
+    def _check_event_expired_invitations(self, event, now=None, columns=None):
+        """
+        Mark overdue invitations EXPIRED in place and return the expired invitees' ids.
+        With DeadlineColumns, only the invitees its mask picks out are touched.
+        """
+        now = now or self.get_current_time()
+        if columns is not None:
+            indexes = columns.expire(now, event.invitation_expiry_hours)
+            if indexes:
+                self.logger.info(f"Expiring {len(indexes)} invitations in event {event.event_code}",
+                                 extra={'event_id': event._id})
+            return [columns.ids[index] for index in indexes]
+        expired = []
         for invitee in event.invitees:
             if invitee.get('status') == 'invited' and 'invited_at' in invitee:
                 invited_at = invitee['invited_at'].replace(tzinfo=self.timezone)
                 hours_elapsed = (now - invited_at).total_seconds() / 3600
                 if hours_elapsed > event.invitation_expiry_hours:
-                    self.logger.info(f"Expiring invitation for {invitee.get('phone')} in event {event.event_code}")
+                    self.logger.info(f"Expiring invitation in event {event.event_code}",
+                                     extra={'event_id': event._id, 'invitee_id': invitee.get('_id')})
                     invitee['status'] = 'EXPIRED'
                     invitee['expired_at'] = now
-                    updated = True
-        return updated
+                    expired.append(invitee['_id'])
+        return expired
 
-    def manage_event_capacity(self):
-        self.logger.info("Starting event capacity management")
-        events = self.events_collection.find({})
-        for event_data in events:
-            try:
-                event = Event.from_dict(event_data)
-                available_spots = self._calculate_available_spots(event)
-                if available_spots > 0:
-                    next_invitees = self._get_next_invitees(event, available_spots)
-                    if next_invitees:
-                        self._send_invitations(event, next_invitees)
-            except Exception as e:
-                self.logger.error(f"Error managing capacity for event {event_data.get('_id')}: {str(e)}")
+    def _uses_over_invite(self, event):
+        enabled = event.over_invite if event.over_invite is not None else self.over_invite_default
+        return bool(enabled) and self.over_invite is not None
 
-    def _calculate_available_spots(self, event):
+    def _calculate_available_spots(self, event, now=None):
+        if self._uses_over_invite(event):
+            return self.over_invite.invitations_to_send(event, now or self.get_current_time())
         confirmed_count = sum(1 for i in event.invitees if i.get('status') == 'YES')
         invited_count = sum(1 for i in event.invitees if i.get('status') == 'invited')
         return event.capacity - (confirmed_count + invited_count)
 
+    def _promote_waitlist(self, event, now=None):
+        """Move waitlisted guests into free seats, earliest reply first; returns the promoted invitees"""
+        if not self.waitlist_enabled:
+            return []
+        waitlisted = [i for i in event.invitees if i.get('status') == 'WAITLIST']
+        if not waitlisted:
+            return []
+        free = event.capacity - sum(1 for i in event.invitees if i.get('status') == 'YES')
+        waitlisted.sort(key=lambda i: i.get('responded_at') or datetime.max)
+        now = now or self.get_current_time()
+        promoted = waitlisted[:max(0, free)]
+        for invitee in promoted:
+            invitee['status'] = 'YES'
+            invitee['promoted_at'] = now
+            self.logger.info(f"Promoted from the waitlist of event {event.event_code}",
+                             extra={'event_id': event._id, 'invitee_id': invitee.get('_id')})
+        return promoted
+
     def _get_next_invitees(self, event, limit):
         pending_invitees = [i for i in event.invitees if i.get('status') == 'pending']
         pending_invitees.sort(key=lambda x: x.get('priority', float('inf')))
         return pending_invitees[:limit]
 
-    def _send_invitations(self, event, invitees):
+    def _refill_capacity(self, event):
+        """
+        Pick who fills any free seats, from the waitlist first and then the next
+        pending people, and render their invitations. Events on the over-invite
+        policy keep more invitations outstanding than there are seats. The
+        invitees are changed in place to what the claim writes; returns
+        (invitee, status before, message) for each, for _send_refill_wave.
+        """
+        profile = current_profile()
         now = self.get_current_time()
-        updates_made = False
-        for invitee in invitees:
-            try:
-                rsvp_token = secrets.token_urlsafe(8)
-                invitee_name = invitee.get('name', 'Guest')
-                message_sid, status, error_message = self.sms_service.send_invitation(
-                    phone_number=invitee['phone'],
-                    event_name=event.name,
-                    event_date=event.date,
-                    invitee_name=invitee_name,
-                    rsvp_token=rsvp_token
+        refilled = [(invitee, 'WAITLIST', self.sms_service.render_confirmation(event.name, 'YES'))
+                    for invitee in self._promote_waitlist(event, now)]
+        with profile.phase('compute', event._id):
+            available_spots = self._calculate_available_spots(event)
+            next_invitees = self._get_next_invitees(event, available_spots) if available_spots > 0 else []
+        if next_invitees:
+            refilled += self._prepare_invitations(event, next_invitees, now)
+        return refilled
+
+    def _prepare_invitations(self, event, invitees, now):
+        """Render a wave of invitations and mark the invitees invited in place; returns (invitee, 'pending', message)"""
+        with current_profile().phase('render', event._id):
+            rsvp_tokens = [secrets.token_urlsafe(8) for _ in invitees]
+            messages = self.sms_service.render_invitations(event, invitees, rsvp_tokens)
+        for invitee, rsvp_token in zip(invitees, rsvp_tokens):
+            invitee['status'] = 'invited'
+            invitee['invited_at'] = now
+            invitee['rsvp_token'] = rsvp_token
+            # Replies to this invitation arrive on the number it is sent from
+            invitee['sender'] = self.sms_service.sender_number(invitee['phone'], invitee.get('sender'))
+        return [(invitee, 'pending', message) for invitee, message in zip(invitees, messages)]
+
+    def _send_refill_wave(self, wave, budget, writes, stats):
+        """
+        Claim a wave of refills, given as (event, expired, reminded, refilled), in
+        one unordered bulk_write and only then send their messages, so a reply
+        to a new invitation always finds the invitee invited and a promoted
+        guest's seat cannot be taken meanwhile. Promotions are confirmed first,
+        then the invitations go out, each across the sender pool with one
+        sending thread per number and within the SendBudget. What became of
+        each message is queued on `writes` (see _send_outcome). Returns the ids
+        of events whose claim failed; nothing is sent for them.
+        """
+        profile = current_profile()
+        claims = WriteBatcher(self.events_collection, len(wave), self.write_flush_interval)
+        with profile.phase('write'):
+            for event, _, _, refilled in wave:
+                claims.add(event._id, refill_update(event._id, [(invitee, previous) for invitee, previous, _ in refilled]))
+            claims.flush()
+        stats['write_round_trips'] += claims.round_trips
+        messages = {'confirmation': [], 'invitation': []}
+        for event, _, _, refilled in wave:
+            if event._id in claims.failed:
+                self.logger.error(f"Failed to write sweep changes: {claims.failed[event._id]}",
+                                  extra={'event_id': event._id})
+                continue
+            for invitee, previous, message in refilled:
+                messages['confirmation' if previous == 'WAITLIST' else 'invitation'].append((event, invitee, message))
+        outcomes = {}
+        for kind, sends in messages.items():
+            if not sends:
+                continue
+            with profile.phase('sms'):
+                results = self.sms_service.send_wave(
+                    kind, [(invitee['phone'], message, invitee.get('sender')) for _, invitee, message in sends], budget
                 )
-                invitee['status'] = status
-                invitee['invited_at'] = now
-                invitee['rsvp_token'] = rsvp_token
-                if message_sid: invitee['message_sid'] = message_sid
-                if error_message: invitee['error_message'] = error_message
-                updates_made = True
-                self.logger.info(f"Updated invitee status to {status} for {invitee['phone']}")
-            except Exception as e:
-                self.logger.error(f"Failed to process invitation for {invitee['phone']}: {str(e)}")
-                invitee['status'] = 'ERROR'
-                invitee['error_message'] = str(e)
-                updates_made = True
-        if updates_made:
-            self.update_event(str(event._id), {"invitees": event.invitees})
-
-    def send_pending_reminders(self):
-        self.logger.info("Starting pending reminder check...")
-        now = self.get_current_time()
-        events = self.events_collection.find({})
-        for event_data in events:
-            event = Event.from_dict(event_data)
-            updates_made = False
-            for invitee in event.invitees:
-                if invitee.get('status') == 'invited' and not invitee.get('reminder_sent_at'):
+            for (event, invitee, _), result in zip(sends, results):
+                outcomes.setdefault(event._id, []).append(self._send_outcome(event, invitee, kind, result))
+        for event_id, event_outcomes in outcomes.items():
+            writes.add(event_id, outcome_update(event_id, event_outcomes))
+        for event, expired, reminded, refilled in wave:
+            if event._id in claims.failed:
+                self._count_sweep(stats, expired, reminded, [])
+                stats['errors'] += 1
+                continue
+            self._count_sweep(stats, expired, reminded,
+                              [invitee for invitee, previous, _ in refilled if invitee['status'] != previous])
+        return set(claims.failed)
+
+    def _send_outcome(self, event, invitee, kind, result):
+        """
+        (guard, fields) recording a refill message's send_wave result on its
+        invitee, for outcome_update; the invitee is updated in place too. A sent
+        message stores its message_sid, and an invitation Twilio refused is
+        recorded as such. An invitation the budget had no room for goes back to
+        pending, and a promotion whose confirmation was not sent goes back to
+        the waitlist, for a later sweep to retry.
+        """
+        profile = current_profile()
+        message_sid, status, error_message = result or (None, None, None)
+        guard = {'_id': invitee['_id']}
+        if kind == 'invitation':
+            guard['rsvp_token'] = invitee['rsvp_token']
+        if status == 'SENT':
+            profile.count('messages_sent')
+            fields = {'message_sid': message_sid}
+        elif kind == 'invitation' and status:
+            fields = {'status': status, 'error_message': error_message}
+        elif kind == 'invitation':
+            profile.count('deferred')
+            fields = {'status': 'pending', 'invited_at': None}
+        else:
+            profile.count('deferred')
+            fields = {'status': 'WAITLIST', 'promoted_at': None}
+            if error_message:
+                fields['error_message'] = error_message
+        if 'status' in fields:
+            # Never overwrite a reply that came in since the claim
+            guard['status'] = 'invited' if kind == 'invitation' else 'YES'
+        if status:
+            self.logger.info(f"Sent {kind}: {status}", extra={
+                'event_id': event._id, 'invitee_id': invitee.get('_id'), 'message_sid': message_sid})
+        invitee.update(fields)
+        return guard, fields
+
+    def _send_event_reminders(self, event, now, budget=None, columns=None):
+        """Remind invitees past half their expiry window; returns the reminded invitees' ids"""
+        profile = current_profile()
+        reminded = []
+        if columns is not None:
+            with profile.phase('compute', event._id):
+                due = columns.reminders_due(now, event.invitation_expiry_hours)
+            for index, hours_remaining in due:
+                invitee = columns.invitee(index)
+                if self._send_reminder(event, invitee, hours_remaining, now, budget):
+                    reminded.append(invitee['_id'])
+            return reminded
+        for invitee in event.invitees:
+            if invitee.get('status') == 'invited' and not invitee.get('reminder_sent_at'):
+                with profile.phase('compute', event._id):
                     invited_at = invitee['invited_at'].replace(tzinfo=self.timezone)
                     hours_since_invited = (now - invited_at).total_seconds() / 3600
                     reminder_threshold = event.invitation_expiry_hours / 2
-                    if hours_since_invited >= reminder_threshold:
-                        self.logger.info(f"Sending reminder to {invitee['name']} for event {event.event_code}")
-                        hours_remaining = round(event.invitation_expiry_hours - hours_since_invited)
-                        if hours_remaining <= 0: continue
-                        sid, status, err = self.sms_service.send_reminder(
-                            phone_number=invitee['phone'],
-                            event_name=event.name,
-                            expiry_hours=hours_remaining
-                        )
-                        if status == "SENT":
-                            invitee['reminder_sent_at'] = now
-                            updates_made = True
-                        else:
-                            self.logger.error(f"Failed to send reminder to {invitee['phone']}: {err}")
-            if updates_made:
-                self.update_event(str(event._id), {"invitees": event.invitees})
+                if hours_since_invited >= reminder_threshold:
+                    hours_remaining = round(event.invitation_expiry_hours - hours_since_invited)
+                    if hours_remaining <= 0: continue
+                    if self._send_reminder(event, invitee, hours_remaining, now, budget):
+                        reminded.append(invitee['_id'])
+        return reminded
+
+    def _send_reminder(self, event, invitee, hours_remaining, now, budget=None):
+        """Send one reminder and stamp reminder_sent_at on the invitee; returns whether it went out"""
+        profile = current_profile()
+        self.logger.info(f"Sending reminder for event {event.event_code}",
+                         extra={'event_id': event._id, 'invitee_id': invitee.get('_id')})
+        with profile.phase('render', event._id):
+            message = self.sms_service.render_reminder(event, hours_remaining)
+        if budget is not None and not budget.acquire(message.segments):
+            profile.count('deferred')
+            return False
+        with profile.phase('sms', event._id):
+            sid, status, err = self.sms_service.send_message(
+                'reminder', invitee['phone'], message, invitee.get('sender')
+            )
+        if status == "SENT":
+            profile.count('messages_sent')
+            invitee['reminder_sent_at'] = now
+            return True
+        profile.count('errors')
+        self.logger.error(f"Failed to send reminder: {err}",
+                          extra={'event_id': event._id, 'invitee_id': invitee.get('_id')})
+        return False
+
+    def run_sweep(self, partition=None, budget=None, event_ids=None):
+        """
+        Single pass over all events that, per event, expires overdue invitations,
+        sends due reminders and then refills the seats that were freed. Expiries
+        and reminders are queued on a WriteBatcher as array-filter updates of just
+        those invitees, so the pass costs one read cursor and a bulk_write per
+        batch rather than a round trip per event. Refills are gathered into waves
+        of up to write_batch_size events, each claimed in one bulk_write before
+        its invitations go out (see _send_refill_wave). Every write is guarded on
+        the invitee's old status and never overwrites a reply recorded meanwhile.
+        Returns counts for each stage.
+
+        `partition` is an (index, count) pair restricting the pass to events whose
+        shard_key falls in that partition; `budget` paces its SMS sends.
+        `event_ids` limits it to those events, as the reactive engine does.
+        """
+        self.logger.info(f"Starting event sweep{f' of partition {partition[0]}/{partition[1]}' if partition else ''}")
+        profile = current_profile()
+        now = self.get_current_time()
+        stats = {'events_scanned': 0, 'events_updated': 0, 'expired': 0, 'reminded': 0, 'invited': 0, 'errors': 0,
+                 'write_round_trips': 0}
+        writes = self._write_batcher()
+        swept = []
+        wave = []
+        unclaimed = set()
+        query = {'shard_key': shard_key_range(*partition)} if partition else {}
+        if event_ids is not None:
+            query['_id'] = {'$in': list(event_ids)}
+        for event_data, columns in profile.iterate('query', self._scan(query, now, stats)):
+            event_id = event_data.get('_id')
+            try:
+                with profile.phase('hydrate', event_id):
+                    event = self._hydrate(event_data)
+                with profile.phase('compute', event_id):
+                    expired = self._check_event_expired_invitations(event, now, columns)
+                reminded = self._send_event_reminders(event, now, budget, columns)
+                if columns is not None:
+                    # Read as columns: the invitees are only loaded if there are seats to refill
+                    with profile.phase('compute', event_id):
+                        refill = columns.may_refill(event.capacity, not self._uses_over_invite(event),
+                                                    self.waitlist_enabled)
+                    if not refill:
+                        self._count_sweep(stats, expired, reminded, [])
+                        if expired or reminded:
+                            with profile.phase('write', event_id):
+                                writes.add(event._id, deadline_update(event._id, now, expired, reminded))
+                        continue
+                    with profile.phase('query', event_id):
+                        event = self._load_for_refill(event_id, expired)
+                    if event is None:
+                        continue
+                refilled = self._refill_capacity(event)
+                if expired or reminded:
+                    with profile.phase('write', event_id):
+                        writes.add(event._id, deadline_update(event._id, now, expired, reminded))
+                if refilled:
+                    wave.append((event, expired, reminded, refilled))
+                else:
+                    self._count_sweep(stats, expired, reminded, [])
+                swept.append(event)
+            except Exception as e:
+                stats['errors'] += 1
+                self.logger.error(f"Error sweeping event: {str(e)}", extra={'event_id': event_id})
+            if len(wave) >= self.write_batch_size:
+                unclaimed |= self._send_refill_wave(wave, budget, writes, stats)
+                wave = []
+        if wave:
+            unclaimed |= self._send_refill_wave(wave, budget, writes, stats)
+        failed = self._flush_writes(writes)
+        stats['events_updated'] -= failed
+        stats['errors'] += failed
+        stats['write_round_trips'] += writes.round_trips
+        if self.deadline_tracker:
+            # New invitations and reminders move these events' deadlines. Events read
+            # only as columns keep theirs; a stale timer just sweeps the event again
+            for event in swept:
+                if event._id not in writes.failed and event._id not in unclaimed:
+                    self.deadline_tracker.schedule_event(dict(event.to_dict(), _id=event._id), swept=True)
+        for name, value in stats.items():
+            profile.count(name, value)
+        self.logger.info(f"Completed event sweep: {stats}")
+        return stats
+
+    def _count_sweep(self, stats, expired, reminded, refilled):
+        if expired or reminded or refilled:
+            stats['events_updated'] += 1
+        stats['expired'] += len(expired)
+        stats['reminded'] += len(reminded)
+        stats['invited'] += len(refilled)
+
+    def _load_for_refill(self, event_id, expired):
+        """
+        Read a column-scanned event's invitees from the primary to refill it. The
+        sweep's expiries are still queued, so they are applied to this copy too.
+        """
+        event_data = self.events_collection.find_one({'_id': event_id})
+        if not event_data:
+            return None
+        event = self._hydrate(event_data)
+        expired = set(expired)
+        for invitee in event.invitees:
+            if invitee.get('_id') in expired and invitee.get('status') == 'invited':
+                invitee['status'] = 'EXPIRED'
+        return event
+
+    def _scan(self, query, now, stats):
+        """
+        (event document, DeadlineColumns or None) for each event a sweep should
+        process. Events with at least vectorize_min_invitees invitees come from
+        _column_scan; the rest are read whole. With secondary reads, the scan
+        reads a projection from a secondary and only events with something due
+        are re-read from the primary, in batches, before they are changed and
+        written back, so a stale copy is never written over newer replies.
+        """
+        if self.vectorize_min_invitees:
+            large = f'invitees.{self.vectorize_min_invitees - 1}'
+            yield from self._column_scan(dict(query, **{large: {'$exists': True}}), now, stats)
+            query = dict(query, **{large: {'$exists': False}})
+        if self.reporting_collection is self.events_collection:
+            for event_data in self.events_collection.find(query):
+                stats['events_scanned'] += 1
+                yield event_data, None
+            return
+        due = []
+        for event_data in self.reporting_collection.find(query, SCAN_PROJECTION):
+            stats['events_scanned'] += 1
+            if self._may_be_due(event_data, now):
+                due.append(event_data['_id'])
+            if len(due) >= self.write_batch_size:
+                yield from ((event_data, None) for event_data in self.events_collection.find({'_id': {'$in': due}}))
+                due = []
+        if due:
+            yield from ((event_data, None) for event_data in self.events_collection.find({'_id': {'$in': due}}))
 
+    def _column_scan(self, query, now, stats):
+        """
+        Events read with COLUMN_PROJECTION, each with its DeadlineColumns, so
+        their invitee documents never reach Python. With secondary reads, only
+        events whose columns show something due are re-read from the primary.
+        """
+        def columns(collection, match):
+            for event_data in collection.aggregate([{'$match': match}, {'$project': COLUMN_PROJECTION}]):
+                yield event_data, DeadlineColumns.from_projection(event_data)
+
+        if self.reporting_collection is self.events_collection:
+            for item in columns(self.events_collection, query):
+                stats['events_scanned'] += 1
+                yield item
+            return
+        due = []
+        for event_data, event_columns in columns(self.reporting_collection, query):
+            stats['events_scanned'] += 1
+            if event_columns.may_be_due(
+                    now, event_data.get('invitation_expiry_hours', self.invitation_expiry_hours),
+                    event_data.get('capacity', 0), self._counts_invited(event_data), self.waitlist_enabled):
+                due.append(event_data['_id'])
+            if len(due) >= self.write_batch_size:
+                yield from columns(self.events_collection, {'_id': {'$in': due}})
+                due = []
+        if due:
+            yield from columns(self.events_collection, {'_id': {'$in': due}})
+
+    def _counts_invited(self, event_data):
+        """Whether outstanding invitations hold seats; over-invited events may want more out while every seat is spoken for"""
+        over_invite = event_data.get('over_invite')
+        return not (over_invite if over_invite is not None else self.over_invite_default)
+
+    def _may_be_due(self, event_data, now):
+        """Whether a (possibly stale) event has a reminder or expiry due, or seats to refill"""
+        expiry = timedelta(hours=event_data.get('invitation_expiry_hours', self.invitation_expiry_hours))
+        counts_invited = self._counts_invited(event_data)
+        taken = confirmed = 0
+        pending = waitlisted = False
+        for invitee in event_data.get('invitees', []):
+            status = invitee.get('status')
+            if status == 'YES':
+                taken += 1
+                confirmed += 1
+            elif status == 'WAITLIST':
+                waitlisted = True
+            elif status == 'pending':
+                pending = True
+            elif status == 'invited':
+                taken += counts_invited
+                invited_at = invitee.get('invited_at')
+                # Reminded invitees are next due at expiry, the rest at half the window
+                due_after = expiry if invitee.get('reminder_sent_at') else expiry / 2
+                if invited_at and now - invited_at.replace(tzinfo=self.timezone) >= due_after:
+                    return True
+        capacity = event_data.get('capacity', 0)
+        return (pending and taken < capacity) or (waitlisted and self.waitlist_enabled and confirmed < capacity)
+
+    def assign_shard_keys(self):
+        """Backfill shard_key on events stored without one, in unordered bulk_writes; returns how many were set"""
+        writes = self._write_batcher()
+        for event_data in self.events_collection.find({'shard_key': None}, {'_id': 1}):
+            writes.add(event_data['_id'], UpdateOne(
+                {'_id': event_data['_id'], 'shard_key': None},
+                {'$set': {'shard_key': shard_key_for(event_data['_id'])}}
+            ))
+        writes.flush()
+        for event_id, error in writes.failed.items():
+            self.logger.error(f"Error assigning shard key to event {event_id}: {error}")
+        assigned = writes.written
+        if assigned:
+            self.logger.info(f"Assigned shard keys to {assigned} events")
+        return assigned
+
+    @observe_db
     def find_event_and_invitee_by_token(self, token):
         event_data = self.events_collection.find_one({"invitees.rsvp_token": token})
         if not event_data: return None, None
@@ -152,33 +601,113 @@ class EventService:
         invitee = next((i for i in event.invitees if i.get("rsvp_token") == token), None)
         return event, invitee
 
+    @observe_db
+    def process_rsvp(self, phone_number, message_body, sender=None):
+        """
+        Record an SMS reply of the form "<EVENT_CODE> YES|NO".
+        `sender` is the pool number the reply was sent to; when given, only an
+        invitation sent from that number (or from an unrecorded one) matches.
+        Returns the recorded response ('YES' or 'NO'; a YES to a full event is
+        'WAITLIST' or 'FULL'), or None if it could not be applied.
+        """
+        reply = parse_sms_reply(message_body)
+        if not reply:
+            return None
+        event_code, response = reply
+        awaiting = awaiting_reply(phone_number, sender)
+        before, response = self._answer({"event_code": event_code}, awaiting, response)
+        return response if before else None
+
+    def _answer(self, query, awaiting, response):
+        """
+        Record `response` on the invitee of the event matching `query` that
+        `awaiting` ($elemMatch) picks out; a YES only while a seat is free, else
+        as the waitlist (or full) status. Returns (pre-image with the event name
+        and that invitee, or None if nothing matched; the recorded status).
+        """
+        query = dict(query, invitees={"$elemMatch": awaiting})
+        # The pre-image's matched invitee tells the deadline timers whose reply this was
+        before = self._record_reply(dict(query, **SEAT_AVAILABLE) if response == 'YES' else query, response, awaiting)
+        if not before and response == 'YES':
+            # Every seat is taken (over-invited events can get more YES replies than seats)
+            response = over_capacity_status(self.waitlist_enabled)
+            before = self._record_reply(query, response, awaiting)
+        if before and self.deadline_tracker:
+            self.deadline_tracker.answered(before['_id'], before['invitees'][0]['_id'], response)
+        return before, response
+
+    def _record_reply(self, query, status, awaiting):
+        return self.events_collection.find_one_and_update(
+            query,
+            {"$set": {
+                "invitees.$.status": status,
+                "invitees.$.responded_at": self.get_current_time()
+            }},
+            projection={"name": 1, "invitees": {"$elemMatch": awaiting}}
+        )
+
     def process_rsvp_from_url(self, token, response):
-        event, invitee = self.find_event_and_invitee_by_token(token)
-        if not event or not invitee: return False, "This invitation link is invalid."
-        if invitee['status'] not in ['invited', 'ERROR']: return True, "You have already responded."
         response = response.upper()
         if response not in ['YES', 'NO']: return False, "Invalid response provided."
-        invitee['status'] = response
-        invitee['responded_at'] = self.get_current_time()
-        self.update_event(str(event._id), {"invitees": event.invitees})
-        return True, f"Thank you! Your response for {event.name} has been recorded."
+        awaiting = {"rsvp_token": token, "status": {"$in": ['invited', 'ERROR']}}
+        before, response = self._answer({}, awaiting, response)
+        if before:
+            return True, recorded_message(before['name'], response)
+        # Nothing awaiting an answer: either already answered or not a token we sent
+        event, invitee = self.find_event_and_invitee_by_token(token)
+        if not event or not invitee: return False, "This invitation link is invalid."
+        return True, "You have already responded."
 
+    @observe_db
     def get_event(self, event_id):
         event_data = self.events_collection.find_one({"_id": ObjectId(event_id)})
         return Event.from_dict(event_data) if event_data else None
 
+    def export_invitees(self, event_id, statuses=None, batch_size=1000):
+        """
+        Stream an event's invitees as dicts of EXPORT_FIELDS, optionally only
+        those whose status is in `statuses`. The invitees are unwound on the
+        server and read through a cursor `batch_size` at a time, so memory
+        stays flat however long the guest list is. Returns None if there is
+        no such event.
+        """
+        if not ObjectId.is_valid(event_id):
+            return None
+        event_id = ObjectId(event_id)
+        if not self.reporting_collection.count_documents({'_id': event_id}, limit=1):
+            return None
+        pipeline = [{'$match': {'_id': event_id}}, {'$unwind': '$invitees'}]
+        if statuses:
+            pipeline.append({'$match': {'invitees.status': {'$in': list(statuses)}}})
+        pipeline += [
+            {'$replaceRoot': {'newRoot': '$invitees'}},
+            {'$project': dict({'_id': 0}, **{field: 1 for field in EXPORT_FIELDS})},
+        ]
+
+        def rows():
+            with self.reporting_collection.aggregate(pipeline, batchSize=batch_size) as cursor:
+                yield from cursor
+        return rows()
+
+    @observe_db
     def get_events(self):
-        return list(self.events_collection.find())
+        return list(self.reporting_collection.find())
 
+    @observe_db
     def create_event(self, event_data):
         event = Event.from_dict(event_data, invitation_expiry_hours=self.invitation_expiry_hours)
-        result = self.events_collection.insert_one(event.to_dict())
+        document = event.to_dict()
+        document['_id'] = ObjectId()
+        document['shard_key'] = shard_key_for(document['_id'])
+        result = self.events_collection.insert_one(document)
         return str(result.inserted_id)
 
+    @observe_db
     def update_event(self, event_id, event_data):
         self.events_collection.update_one({"_id": ObjectId(event_id)}, {"$set": event_data})
         return self.get_event(event_id)
 
+    @observe_db
     def delete_event(self, event_id):
         result = self.events_collection.delete_one({"_id": ObjectId(event_id)})
         return result.deleted_count > 0
@@ -216,6 +745,7 @@ class EventService:
 
         return newly_added_count # Return the final count
 
+    @observe_db
     def delete_invitee(self, event_id, invitee_id):
         self.events_collection.update_one({"_id": ObjectId(event_id)}, {"$pull": {"invitees": {"_id": ObjectId(invitee_id)}}})
 
@@ -0,0 +1,45 @@
+# app/services/export_formats.py
+from datetime import datetime
+import csv
+import io
+import json
+
+def _csv_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return '' if value is None else value
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+def csv_chunks(rows, fields, rows_per_chunk=500):
+    """Encode dict rows as CSV with a header, yielding text a few hundred rows at a time"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    for count, row in enumerate(rows, 1):
+        writer.writerow([_csv_value(row.get(field)) for field in fields])
+        if count % rows_per_chunk == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+def jsonl_chunks(rows, fields, rows_per_chunk=500):
+    """Encode dict rows as JSON Lines, yielding text a few hundred rows at a time"""
+    lines = []
+    for row in rows:
+        lines.append(json.dumps({field: row.get(field) for field in fields}, default=_json_default))
+        if len(lines) >= rows_per_chunk:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+# format name -> (mimetype, encoder)
+EXPORT_FORMATS = {
+    'csv': ('text/csv', csv_chunks),
+    'jsonl': ('application/x-ndjson', jsonl_chunks),
+}
@@ -0,0 +1,39 @@
+# app/services/job_history_service.py
+from pymongo import DESCENDING
+from pymongo.errors import CollectionInvalid
+import logging
+
+class JobHistoryService:
+    """Rolling history of scheduler job runs, kept in a capped collection"""
+    def __init__(self, db, max_bytes=5 * 1024 * 1024, max_runs=5000, reporting_db=None):
+        self.db = db
+        self.reporting_db = reporting_db if reporting_db is not None else db
+        self.max_bytes = max_bytes
+        self.max_runs = max_runs
+        self.collection_ready = False
+        self.logger = logging.getLogger('scheduler')
+
+    @property
+    def runs_collection(self):
+        # Created on first use rather than at app construction, which may happen before a fork
+        if not self.collection_ready:
+            if 'job_runs' not in self.db.list_collection_names():
+                try:
+                    self.db.create_collection('job_runs', capped=True, size=self.max_bytes, max=self.max_runs)
+                except CollectionInvalid:
+                    # Another worker created it first
+                    pass
+            self.collection_ready = True
+        return self.db['job_runs']
+
+    def record_run(self, run):
+        try:
+            self.runs_collection.insert_one(run)
+        except Exception as e:
+            self.logger.error(f"Error recording job run: {str(e)}", extra={'job': run.get('job')})
+
+    def recent_runs(self, job=None, limit=200):
+        query = {'job': job} if job else {}
+        # Capped collections keep insertion order, so natural order is chronological
+        runs = self.reporting_db['job_runs'].find(query, {'_id': 0})
+        return list(runs.sort('$natural', DESCENDING).limit(limit))
@@ -0,0 +1,126 @@
+# app/services/log_query_service.py
+from datetime import datetime
+import json
+import os
+
+class LogQueryService:
+    """
+    Reads a rotating log file set newest-first without loading whole files.
+
+    Files are walked backwards in fixed-size blocks starting at the live file
+    and continuing into its rotated backups (.1, .2, ...). Paging cursors are
+    "<inode>:<offset>" so they stay valid when the files rotate between pages.
+    """
+    BLOCK_SIZE = 64 * 1024
+
+    def __init__(self, log_file, backup_count=5):
+        self.log_file = log_file
+        self.backup_count = backup_count
+
+    def _log_files(self):
+        """Existing files of the set, newest first"""
+        paths = [self.log_file] + [f"{self.log_file}.{i}" for i in range(1, self.backup_count + 1)]
+        return [p for p in paths if os.path.exists(p)]
+
+    def _reverse_lines(self, f, end):
+        """Yield (start_offset, line_bytes) from `end` back to the start of the file"""
+        pos = end
+        buf = b''
+        while pos > 0:
+            size = min(self.BLOCK_SIZE, pos)
+            pos -= size
+            f.seek(pos)
+            buf = f.read(size) + buf
+            line_end = pos + len(buf)
+            lines = buf.split(b'\n')
+            buf = lines[0]
+            for line in reversed(lines[1:]):
+                start = line_end - len(line)
+                if line:
+                    yield start, line
+                line_end = start - 1
+        if buf:
+            yield 0, buf
+
+    @staticmethod
+    def _parse_time(value):
+        if isinstance(value, datetime) or value is None:
+            return value
+        return datetime.fromisoformat(value)
+
+    @staticmethod
+    def _entry_time(entry, line):
+        if entry is not None:
+            return datetime.fromisoformat(entry['ts']).replace(tzinfo=None) if entry.get('ts') else None
+        try:
+            # Plain-text lines written before structured logging: "2024-01-01 12:00:00,123 - ..."
+            return datetime.strptime(line[:23], '%Y-%m-%d %H:%M:%S,%f')
+        except ValueError:
+            return None
+
+    @staticmethod
+    def _matches(entry, line, field, value):
+        if value is None:
+            return True
+        if entry is not None:
+            return entry.get(field) == value
+        return value in line
+
+    def query(self, limit=100, phone=None, message_sid=None, since=None, until=None,
+              cursor=None, scan_limit=10000):
+        """
+        Return up to `limit` matching lines, newest first, and a cursor for the
+        next page (None once the oldest file has been exhausted). At most
+        `scan_limit` lines are examined per call so a filter that matches
+        nothing still returns promptly with a cursor to continue from.
+        """
+        since = self._parse_time(since)
+        until = self._parse_time(until)
+        if since is not None:
+            since = since.replace(tzinfo=None)
+        if until is not None:
+            until = until.replace(tzinfo=None)
+
+        files = self._log_files()
+        start_inode, start_offset = None, None
+        if cursor:
+            start_inode, start_offset = (int(part) for part in cursor.split(':'))
+            inodes = [os.stat(p).st_ino for p in files]
+            if start_inode not in inodes:
+                return [], None
+            files = files[inodes.index(start_inode):]
+
+        results = []
+        scanned = 0
+        for path in files:
+            with open(path, 'rb') as f:
+                inode = os.fstat(f.fileno()).st_ino
+                end = start_offset if inode == start_inode else os.fstat(f.fileno()).st_size
+                for offset, raw in self._reverse_lines(f, end):
+                    scanned += 1
+                    next_cursor = f"{inode}:{offset}"
+                    if scanned > scan_limit:
+                        return results, f"{inode}:{offset + len(raw)}"
+                    line = raw.decode('utf-8', errors='replace')
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        entry = None
+                    if not isinstance(entry, dict):
+                        entry = None
+
+                    if since is not None or until is not None:
+                        ts = self._entry_time(entry, line)
+                        if ts is not None:
+                            if since is not None and ts < since:
+                                # Everything further back is older still
+                                return results, None
+                            if until is not None and ts > until:
+                                continue
+
+                    if (self._matches(entry, line, 'phone', phone)
+                            and self._matches(entry, line, 'message_sid', message_sid)):
+                        results.append(line)
+                        if len(results) >= limit:
+                            return results, next_cursor
+        return results, None
@@ -0,0 +1,180 @@
+# app/services/message_templates.py
+from collections import namedtuple
+from string import Formatter
+import functools
+import logging
+import math
+import time
+
+# GSM 03.38 basic character set; everything in it costs one septet
+GSM7_BASIC = set(
+    "@£$¥èéùìòÇ\nØø\rÅåΔ_ΦΓΛΩΠΨΣΘΞÆæßÉ !\"#¤%&'()*+,-./0123456789:;<=>?"
+    "¡ABCDEFGHIJKLMNOPQRSTUVWXYZÄÖÑÜ§¿abcdefghijklmnopqrstuvwxyzäöñüà"
+)
+# Extension table characters are sent as escape + char, two septets each
+GSM7_EXTENDED = set("^{}\\[~]|€\f")
+
+DEFAULT_TEMPLATES = {
+    'invitation': ("{greeting} invited to {event_name} on {event_date}! "
+                   "Reply '{event_code} YES' to accept or '{event_code} NO' to decline.{rsvp_link}"),
+    'reminder': ("Reminder: your invitation to {event_name} expires in about {expiry_hours} {hours_word}. "
+                 "Reply '{event_code} YES' to accept or '{event_code} NO' to decline."),
+    'confirmation_yes': "Great! You're confirmed for {event_name}. We'll send you more details soon.",
+    'confirmation_no': "Thanks for letting us know you can't make it to {event_name}.",
+    'confirmation_full': "Sorry, {event_name} is now at full capacity. We'll add you to the waitlist.",
+    'confirmation_other': "Thanks for your response!",
+}
+
+EVENT_FIELDS = ('event_name', 'event_date', 'event_code')
+MESSAGE_FIELDS = {
+    'invitation': ('greeting', 'invitee_name', 'rsvp_url', 'rsvp_link'),
+    'reminder': ('expiry_hours', 'hours_word'),
+}
+
+RenderedMessage = namedtuple('RenderedMessage', ['body', 'encoding', 'segments'])
+
+
+def _gsm7_length(text):
+    """Septets needed to send `text` as GSM-7, or None if it needs UCS-2"""
+    length = 0
+    for char in text:
+        if char in GSM7_BASIC:
+            length += 1
+        elif char in GSM7_EXTENDED:
+            length += 2
+        else:
+            return None
+    return length
+
+
+def _ucs2_length(text):
+    return len(text.encode('utf-16-le')) // 2
+
+
+def _segments(length, single, multi):
+    return 1 if length <= single else math.ceil(length / multi)
+
+
+def segment_count(text):
+    """Return (encoding, segments) for an SMS body"""
+    gsm_length = _gsm7_length(text)
+    if gsm_length is not None:
+        return 'GSM-7', _segments(gsm_length, 160, 153)
+    return 'UCS-2', _segments(_ucs2_length(text), 70, 67)
+
+
+class CompiledTemplate:
+    """A template parsed once into literal text and {field} slots"""
+    def __init__(self, kind, text):
+        self.kind = kind
+        self.text = text
+        allowed = set(EVENT_FIELDS) | set(MESSAGE_FIELDS.get(kind, ()))
+        self.parts = []
+        for literal, field, format_spec, conversion in Formatter().parse(text):
+            if field is not None and field not in allowed:
+                raise ValueError(f"Unknown field '{{{field}}}' in {kind} template")
+            if format_spec or conversion:
+                raise ValueError(f"Format specs are not supported in {kind} templates")
+            self.parts.append((literal, field))
+
+    def bind(self, **event_fields):
+        """Fill in the per-event fields, leaving a BoundTemplate for per-message ones"""
+        parts = []
+        literal = ''
+        for text, field in self.parts:
+            literal += text
+            if field is None:
+                continue
+            if field in event_fields:
+                literal += str(event_fields[field])
+            else:
+                parts.append((literal, field))
+                literal = ''
+        parts.append((literal, None))
+        return BoundTemplate(self.kind, parts)
+
+
+class BoundTemplate:
+    """
+    A template with its event fields filled in. The encoding and length of the
+    fixed text are worked out here, once per event, so rendering a message only
+    has to measure the per-message values.
+    """
+    def __init__(self, kind, parts):
+        self.kind = kind
+        self.parts = parts
+        fixed = ''.join(literal for literal, _ in parts)
+        self.fixed_gsm_length = _gsm7_length(fixed)
+        self.fixed_ucs2_length = _ucs2_length(fixed)
+
+    def render(self, **fields):
+        body = []
+        gsm_length = self.fixed_gsm_length
+        ucs2_length = self.fixed_ucs2_length
+        for literal, field in self.parts:
+            body.append(literal)
+            if field is None:
+                continue
+            value = str(fields.get(field, ''))
+            body.append(value)
+            if gsm_length is not None:
+                value_length = _gsm7_length(value)
+                gsm_length = None if value_length is None else gsm_length + value_length
+            ucs2_length += _ucs2_length(value)
+        if gsm_length is not None:
+            return RenderedMessage(''.join(body), 'GSM-7', _segments(gsm_length, 160, 153))
+        return RenderedMessage(''.join(body), 'UCS-2', _segments(ucs2_length, 70, 67))
+
+
+@functools.lru_cache(maxsize=256)
+def compile_template(kind, text):
+    return CompiledTemplate(kind, text)
+
+
+@functools.lru_cache(maxsize=1024)
+def _bind(kind, text, event_name, event_date, event_code):
+    return compile_template(kind, text).bind(event_name=event_name, event_date=event_date, event_code=event_code)
+
+
+class MessageTemplateRegistry:
+    """
+    Resolves the template for a message kind: an event's own override
+    (event.message_templates), then the organisation-wide override stored in
+    the `message_templates` collection, then DEFAULT_TEMPLATES. Templates
+    are compiled once and bound once per event, and both steps are cached.
+    """
+    def __init__(self, db=None, refresh_seconds=60):
+        self.db = db
+        self.refresh_seconds = refresh_seconds
+        self.overrides = {}
+        self.loaded_at = None
+        self.logger = logging.getLogger('sms_service')
+
+    def _org_overrides(self):
+        if self.db is None:
+            return {}
+        if self.loaded_at is None or time.monotonic() - self.loaded_at >= self.refresh_seconds:
+            try:
+                self.overrides = {doc['_id']: doc['body'] for doc in self.db['message_templates'].find()}
+            except Exception as e:
+                self.logger.error(f"Error loading message templates: {str(e)}")
+            self.loaded_at = time.monotonic()
+        return self.overrides
+
+    def template_text(self, kind, event=None):
+        event_templates = getattr(event, 'message_templates', None) or {}
+        return event_templates.get(kind) or self._org_overrides().get(kind) or DEFAULT_TEMPLATES[kind]
+
+    def set_template(self, kind, text):
+        """Store an organisation-wide override after checking it compiles"""
+        if kind not in DEFAULT_TEMPLATES:
+            raise ValueError(f"Unknown message kind '{kind}'")
+        compile_template(kind, text)
+        self.db['message_templates'].update_one({'_id': kind}, {'$set': {'body': text}}, upsert=True)
+        self.loaded_at = None
+
+    def bind(self, kind, event_name, event_date, event_code=None, event=None):
+        return _bind(kind, self.template_text(kind, event), event_name, str(event_date), event_code)
+
+    def bind_event(self, kind, event):
+        return self.bind(kind, event.name, event.date, event.event_code, event=event)
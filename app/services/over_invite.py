@@ -0,0 +1,168 @@
+# app/services/over_invite.py
+from bisect import bisect_right
+from collections import namedtuple
+import logging
+import math
+import threading
+import time
+
+# Statuses counted as an acceptance (an over-capacity YES is still a YES) and as a lapse
+ACCEPTED = ('YES', 'WAITLIST', 'FULL')
+LAPSED = ('EXPIRED', 'UNDELIVERED')
+# Keep the response-time samples bounded
+MAX_DELAY_SAMPLES = 5000
+
+# Resolved invitation counts and sorted reply delays, in hours
+ResponseStats = namedtuple('ResponseStats', ['accepted', 'declined', 'lapsed', 'yes_delays', 'no_delays'])
+
+EMPTY_STATS = ResponseStats(0, 0, 0, [], [])
+
+
+def _hours(invitee):
+    invited_at, responded_at = invitee.get('invited_at'), invitee.get('responded_at')
+    if not invited_at or not responded_at:
+        return None
+    return max(0.0, (responded_at.replace(tzinfo=None) - invited_at.replace(tzinfo=None)).total_seconds() / 3600)
+
+
+def response_stats(invitees):
+    """ResponseStats over invitee dicts (status, invited_at, responded_at)"""
+    accepted = declined = lapsed = 0
+    yes_delays, no_delays = [], []
+    for invitee in invitees:
+        status = invitee.get('status')
+        if status in ACCEPTED:
+            accepted += 1
+            delays = yes_delays
+        elif status == 'NO':
+            declined += 1
+            delays = no_delays
+        elif status in LAPSED:
+            lapsed += 1
+            continue
+        else:
+            continue
+        hours = _hours(invitee)
+        if hours is not None and len(delays) < MAX_DELAY_SAMPLES:
+            delays.append(hours)
+    return ResponseStats(accepted, declined, lapsed, sorted(yes_delays), sorted(no_delays))
+
+
+class OverInvitePolicy:
+    """
+    Decides how many invitations to send so an event fills in fewer expiry
+    cycles. Rather than inviting exactly `capacity - (YES + invited)` people,
+    it keeps enough invitations outstanding that the YES replies expected from
+    them cover the open seats.
+
+    An outstanding invitation that has gone `t` hours without a reply turns
+    into a YES with probability a(1 - Fy(t)) / (1 - a Fy(t) - b Fn(t)), where
+    a and b are the accept and decline rates, and Fy and Fn are the
+    distributions of how long YES and NO replies take. The rates blend this
+    event's replies with those of recent events. The history counts as
+    `prior_weight` replies, so each event's own rate takes over as its
+    replies come in. New invitations are expected to yield `a` each.
+
+    Outstanding invitations plus confirmed guests never exceed
+    `capacity * max_factor`. Until there are `min_samples` resolved
+    invitations to go on, it invites exactly as many people as there are
+    free seats. YES replies beyond capacity go to the waitlist (see
+    EventService).
+    """
+    def __init__(self, db, max_factor=2.0, prior_weight=20, min_samples=10, min_accept_rate=0.05,
+                 history_events=50, refresh_seconds=600):
+        self.events_collection = db['events']
+        self.max_factor = max(1.0, max_factor)
+        self.prior_weight = prior_weight
+        self.min_samples = min_samples
+        self.min_accept_rate = min_accept_rate
+        self.history_events = history_events
+        self.refresh_seconds = refresh_seconds
+        self._history = None
+        self._history_loaded = 0
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger('event_service')
+
+    def history(self):
+        """Reply statistics over the most recent events, re-read every `refresh_seconds`"""
+        with self._lock:
+            if self._history is None or time.monotonic() - self._history_loaded >= self.refresh_seconds:
+                self._history = self._load_history()
+                self._history_loaded = time.monotonic()
+            return self._history
+
+    def _load_history(self):
+        try:
+            invitees = self.events_collection.aggregate([
+                {'$sort': {'created_at': -1}},
+                {'$limit': self.history_events},
+                {'$project': {'_id': 0, 'invitees.status': 1, 'invitees.invited_at': 1, 'invitees.responded_at': 1}},
+                {'$unwind': '$invitees'},
+                {'$replaceRoot': {'newRoot': '$invitees'}},
+            ])
+            return response_stats(invitees)
+        except Exception as e:
+            self.logger.error(f"Could not load reply history: {str(e)}")
+            return EMPTY_STATS
+
+    def invitations_to_send(self, event, now):
+        """How many pending people to invite now; at least as many as there are free seats"""
+        confirmed = outstanding = 0
+        ages = []
+        for invitee in event.invitees:
+            status = invitee.get('status')
+            if status == 'YES':
+                confirmed += 1
+            elif status == 'invited':
+                outstanding += 1
+                invited_at = invitee.get('invited_at')
+                if invited_at:
+                    ages.append(max(0.0, (now - invited_at.replace(tzinfo=now.tzinfo)).total_seconds() / 3600))
+        exact = event.capacity - (confirmed + outstanding)
+        seats = event.capacity - confirmed
+        if seats <= 0:
+            return 0
+
+        own, history = response_stats(event.invitees), self.history()
+        rates = self._rates(own, history)
+        if rates is None:
+            return exact
+        accept, decline = rates
+        yes_delays = sorted(own.yes_delays + history.yes_delays)
+        no_delays = sorted(own.no_delays + history.no_delays)
+        window = event.invitation_expiry_hours
+
+        expected = sum(self._yield(age, accept, decline, yes_delays, no_delays, window) for age in ages)
+        wanted = math.ceil(max(0.0, seats - expected) / max(accept, self.min_accept_rate))
+        ceiling = math.floor(event.capacity * self.max_factor) - (confirmed + outstanding)
+        return max(exact, min(wanted, ceiling), 0)
+
+    def _rates(self, own, history):
+        """(accept rate, decline rate), or None without enough resolved invitations"""
+        own_total = own.accepted + own.declined + own.lapsed
+        history_total = history.accepted + history.declined + history.lapsed
+        if history_total >= self.min_samples:
+            weight = self.prior_weight
+            accept = (own.accepted + weight * history.accepted / history_total) / (own_total + weight)
+            decline = (own.declined + weight * history.declined / history_total) / (own_total + weight)
+        elif own_total >= self.min_samples:
+            accept, decline = own.accepted / own_total, own.declined / own_total
+        else:
+            return None
+        return accept, decline
+
+    @staticmethod
+    def _cdf(delays, hours, window):
+        """Share of replies that arrive within `hours`; uniform over the window without samples"""
+        if not delays:
+            return min(1.0, hours / window) if window else 1.0
+        return bisect_right(delays, hours) / len(delays)
+
+    def _yield(self, age, accept, decline, yes_delays, no_delays, window):
+        """Chance that an invitation unanswered after `age` hours still ends in a YES"""
+        answered_yes = accept * self._cdf(yes_delays, age, window)
+        answered_no = decline * self._cdf(no_delays, age, window)
+        unanswered = 1.0 - answered_yes - answered_no
+        if unanswered <= 1e-9:
+            return 0.0
+        return min(1.0, max(0.0, (accept - answered_yes) / unanswered))
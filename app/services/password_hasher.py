@@ -0,0 +1,60 @@
+# app/services/password_hasher.py
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import bcrypt
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when every hashing slot is taken and the wait timed out."""
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt on a small dedicated thread pool so request workers are not
+    pinned to the CPU during login bursts. The number of in-flight and queued
+    jobs is bounded; callers get PasswordHasherBusy instead of piling up.
+
+    The bound is per process and callers wait on the result, so it only comes
+    into play with several request threads per process (gunicorn.conf.py
+    runs threaded workers); a sync worker hashes one password at a time.
+    """
+    def __init__(self, rounds=12, max_workers=2, max_pending=8, acquire_timeout=2.0):
+        self.rounds = rounds
+        self.acquire_timeout = acquire_timeout
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='bcrypt')
+        self._slots = threading.BoundedSemaphore(max_workers + max_pending)
+
+    def _run(self, func, *args):
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            raise PasswordHasherBusy('Password hashing queue is full')
+        try:
+            future = self.executor.submit(func, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future.result()
+
+    def hash(self, password):
+        return self._run(self._hash, password.encode('utf-8'), self.rounds)
+
+    def check(self, password, password_hash):
+        if isinstance(password_hash, str):
+            password_hash = password_hash.encode('utf-8')
+        return self._run(bcrypt.checkpw, password.encode('utf-8'), password_hash)
+
+    def needs_rehash(self, password_hash):
+        """True when the stored hash was made with a different cost factor."""
+        if isinstance(password_hash, str):
+            password_hash = password_hash.encode('utf-8')
+        try:
+            return int(password_hash.split(b'$')[2]) != self.rounds
+        except (IndexError, ValueError):
+            return True
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
+
+    @staticmethod
+    def _hash(password, rounds):
+        return bcrypt.hashpw(password, bcrypt.gensalt(rounds=rounds))
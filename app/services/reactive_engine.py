@@ -0,0 +1,73 @@
+# app/services/reactive_engine.py
+from pymongo.errors import OperationFailure, PyMongoError
+import logging
+import threading
+
+class ReactiveEngine:
+    """
+    Feeds the DeadlineTracker from the `events` change stream, so status
+    changes, capacity edits and automation toggles made by any process
+    reschedule that event's reminder, expiry and refill deadlines at once
+    instead of waiting for the next polling sweep.
+
+    Change streams need a replica set or sharded cluster; start() returns
+    False on a standalone mongod and the scheduler keeps polling. Changes are
+    only applied while this process leads the deadline tracker.
+    """
+    def __init__(self, db, deadline_tracker):
+        self.db = db
+        self.events_collection = db['events']
+        self.deadline_tracker = deadline_tracker
+        self.resume_token = None
+        self.stopping = threading.Event()
+        self.logger = logging.getLogger('scheduler')
+
+    def change_streams_available(self):
+        try:
+            with self.events_collection.watch(max_await_time_ms=1) as stream:
+                stream.try_next()
+            return True
+        except Exception as e:
+            # Standalone servers reject $changeStream; any failure here means keep polling
+            self.logger.info(f"Change streams unavailable, keeping the polling sweep: {str(e)}")
+            return False
+
+    def start(self):
+        """Start watching; returns False when change streams are not supported"""
+        if not self.change_streams_available():
+            return False
+        threading.Thread(target=self._watch, name='reactive-watch', daemon=True).start()
+        self.logger.info("Reactive engine started")
+        return True
+
+    def stop(self):
+        self.stopping.set()
+
+    def _handle(self, change):
+        operation = change['operationType']
+        if operation == 'delete':
+            self.deadline_tracker.forget_event(change['documentKey']['_id'])
+        elif operation in ('insert', 'update', 'replace'):
+            # Updates carry the post-image through full_document='updateLookup'
+            event_data = change.get('fullDocument')
+            if event_data is not None:
+                self.deadline_tracker.schedule_event(event_data)
+
+    def _watch(self):
+        while not self.stopping.is_set():
+            try:
+                with self.events_collection.watch(full_document='updateLookup',
+                                                  resume_after=self.resume_token) as stream:
+                    for change in stream:
+                        self.resume_token = stream.resume_token
+                        self._handle(change)
+                        if self.stopping.is_set():
+                            return
+            except PyMongoError as e:
+                self.logger.error(f"Change stream interrupted, resuming: {str(e)}")
+                if isinstance(e, OperationFailure) and e.code == 286:
+                    # Resume point fell off the oplog; start fresh and re-read current state
+                    self.resume_token = None
+                    if self.deadline_tracker.is_leader:
+                        self.deadline_tracker.rebuild()
+                self.stopping.wait(1)
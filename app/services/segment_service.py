@@ -0,0 +1,259 @@
+# app/services/segment_service.py
+from datetime import datetime
+from functools import lru_cache
+from bson import ObjectId
+from pymongo import DeleteOne, UpdateOne
+from pymongo.errors import BulkWriteError
+import logging
+import pytz
+import re
+
+# Tokens of a segment expression: parentheses, "quoted tags" and bare words
+TOKEN = re.compile(r'\s*(\(|\)|"[^"]*"|[^\s()"]+)')
+KEYWORDS = ('AND', 'OR', 'NOT')
+
+
+@lru_cache(maxsize=256)
+def parse_expression(expression):
+    """
+    Parse a boolean tag expression such as `family AND (work OR "book club") AND NOT vip`
+    into a tree of ('tag', name), ('not', node), ('and', [nodes]) and ('or', [nodes]).
+    NOT binds tighter than AND, AND tighter than OR. Raises ValueError if malformed.
+    """
+    tokens, position = [], 0
+    expression = expression.strip()
+    while position < len(expression):
+        match = TOKEN.match(expression, position)
+        if not match or not match.group(1):
+            raise ValueError(f"Unexpected character at position {position}")
+        tokens.append(match.group(1))
+        position = match.end()
+        while position < len(expression) and expression[position].isspace():
+            position += 1
+    if not tokens:
+        raise ValueError("Empty expression")
+    node, rest = _parse_or(tokens)
+    if rest:
+        raise ValueError(f"Unexpected '{rest[0]}'")
+    return node
+
+
+def _parse_or(tokens):
+    terms = []
+    node, tokens = _parse_and(tokens)
+    terms.append(node)
+    while tokens and tokens[0].upper() == 'OR':
+        node, tokens = _parse_and(tokens[1:])
+        terms.append(node)
+    return (terms[0] if len(terms) == 1 else ('or', terms)), tokens
+
+
+def _parse_and(tokens):
+    terms = []
+    node, tokens = _parse_not(tokens)
+    terms.append(node)
+    while tokens and tokens[0].upper() == 'AND':
+        node, tokens = _parse_not(tokens[1:])
+        terms.append(node)
+    return (terms[0] if len(terms) == 1 else ('and', terms)), tokens
+
+
+def _parse_not(tokens):
+    if not tokens:
+        raise ValueError("Expression ends too early")
+    token = tokens[0]
+    if token.upper() == 'NOT':
+        node, tokens = _parse_not(tokens[1:])
+        return ('not', node), tokens
+    if token == '(':
+        node, tokens = _parse_or(tokens[1:])
+        if not tokens or tokens[0] != ')':
+            raise ValueError("Missing ')'")
+        return node, tokens[1:]
+    if token == ')' or token.upper() in KEYWORDS:
+        raise ValueError(f"Expected a tag, found '{token}'")
+    tag = token[1:-1].strip() if token.startswith('"') else token
+    if not tag:
+        raise ValueError("Empty tag")
+    return ('tag', tag), tokens[1:]
+
+
+def to_query(node):
+    """The master_list query selecting the contacts a parsed expression matches"""
+    kind = node[0]
+    if kind == 'tag':
+        return {'tags': node[1]}
+    if kind == 'not':
+        if node[1][0] == 'tag':
+            return {'tags': {'$ne': node[1][1]}}
+        return {'$nor': [to_query(node[1])]}
+    return {f"${kind}": [to_query(child) for child in node[1]]}
+
+
+def matches(node, tags):
+    """Evaluate a parsed expression against one contact's set of tags"""
+    kind = node[0]
+    if kind == 'tag':
+        return node[1] in tags
+    if kind == 'not':
+        return not matches(node[1], tags)
+    if kind == 'and':
+        return all(matches(child, tags) for child in node[1])
+    return any(matches(child, tags) for child in node[1])
+
+
+class SegmentService:
+    """
+    Saved audience segments: a name and a boolean tag expression whose member
+    contact ids are kept in `segment_members`. A segment is built once with a
+    scan of the master list; after that ContactService reports every contact
+    it writes or deletes, and only those contacts are re-evaluated, so member
+    counts are read straight off the segment document.
+    """
+    def __init__(self, db, reporting_db=None, export_batch_size=1000):
+        self.db = db
+        self.segments_collection = db['segments']
+        self.members_collection = db['segment_members']
+        self.contacts_collection = db['master_list']
+        # Listing segments may come from a secondary; membership writes stay on the primary
+        self.reporting_collection = (reporting_db if reporting_db is not None else db)['segments']
+        self.export_batch_size = max(1, export_batch_size)
+        self.timezone = pytz.timezone('UTC')
+        self.logger = logging.getLogger('contact_service')
+
+    def get_current_time(self):
+        return datetime.now(self.timezone)
+
+    def get_segments(self):
+        segments = list(self.reporting_collection.find().sort('name', 1))
+        for segment in segments:
+            segment['_id'] = str(segment['_id'])
+        return segments
+
+    def get_segment(self, segment_id):
+        return self.segments_collection.find_one({'_id': ObjectId(segment_id)})
+
+    def create_segment(self, name, expression):
+        """Save a segment and build its membership; raises ValueError for a bad expression or a taken name"""
+        name = name.strip()
+        if not name:
+            raise ValueError("A segment needs a name")
+        parse_expression(expression)
+        if self.segments_collection.find_one({'name': name}, {'_id': 1}):
+            raise ValueError(f"A segment named '{name}' already exists")
+        result = self.segments_collection.insert_one({
+            'name': name,
+            'expression': expression.strip(),
+            'member_count': 0,
+            'created_at': self.get_current_time(),
+        })
+        self.rebuild(result.inserted_id)
+        return str(result.inserted_id)
+
+    def delete_segment(self, segment_id):
+        segment_id = ObjectId(segment_id)
+        self.segments_collection.delete_one({'_id': segment_id})
+        self.members_collection.delete_many({'segment_id': segment_id})
+
+    def rebuild(self, segment_id):
+        """
+        Recompute a segment from the master list. Members are upserted with the
+        rebuild's start time and older ones removed afterwards, so incremental
+        updates landing during the scan are kept. Returns the member count.
+        """
+        segment_id = ObjectId(segment_id)
+        segment = self.segments_collection.find_one({'_id': segment_id})
+        if not segment:
+            raise ValueError("Segment not found")
+        started = self.get_current_time()
+        query = to_query(parse_expression(segment['expression']))
+        operations = []
+        for contact in self.contacts_collection.find(query, {'_id': 1}).batch_size(self.export_batch_size):
+            operations.append(self._member_upsert(segment_id, contact['_id'], started))
+            if len(operations) >= self.export_batch_size:
+                self._write(operations)
+                operations = []
+        self._write(operations)
+        self.members_collection.delete_many({'segment_id': segment_id, 'seen_at': {'$lt': started}})
+        count = self.members_collection.count_documents({'segment_id': segment_id})
+        self.segments_collection.update_one(
+            {'_id': segment_id}, {'$set': {'member_count': count, 'rebuilt_at': started}}
+        )
+        return count
+
+    def contacts_changed(self, contacts):
+        """
+        Re-evaluate every segment for contacts that were created or whose tags
+        may have changed; `contacts` are master_list documents with _id and tags.
+        """
+        if not contacts:
+            return
+        now = self.get_current_time()
+        for segment in self.segments_collection.find({}, {'expression': 1}):
+            node = parse_expression(segment['expression'])
+            operations = []
+            for contact in contacts:
+                if matches(node, set(contact.get('tags') or [])):
+                    operations.append(self._member_upsert(segment['_id'], contact['_id'], now))
+                else:
+                    operations.append(DeleteOne({'segment_id': segment['_id'], 'contact_id': contact['_id']}))
+            added, removed = self._write(operations)
+            if added or removed:
+                self.segments_collection.update_one({'_id': segment['_id']},
+                                                    {'$inc': {'member_count': added - removed}})
+
+    def contacts_removed(self, contact_ids):
+        """Drop deleted contacts from every segment they were in"""
+        contact_ids = [ObjectId(contact_id) for contact_id in contact_ids]
+        if not contact_ids:
+            return
+        removed = {}
+        for member in self.members_collection.find({'contact_id': {'$in': contact_ids}}, {'segment_id': 1}):
+            removed[member['segment_id']] = removed.get(member['segment_id'], 0) + 1
+        self.members_collection.delete_many({'contact_id': {'$in': contact_ids}})
+        for segment_id, count in removed.items():
+            self.segments_collection.update_one({'_id': segment_id}, {'$inc': {'member_count': -count}})
+
+    def member_batches(self, segment_id):
+        """The segment's contacts (_id, name, phone, tags), `export_batch_size` at a time"""
+        member_ids = []
+        cursor = self.members_collection.find(
+            {'segment_id': ObjectId(segment_id)}, {'contact_id': 1}
+        ).batch_size(self.export_batch_size)
+        for member in cursor:
+            member_ids.append(member['contact_id'])
+            if len(member_ids) >= self.export_batch_size:
+                yield self._contacts(member_ids)
+                member_ids = []
+        if member_ids:
+            yield self._contacts(member_ids)
+
+    def add_to_event(self, segment_id, event_id, event_service):
+        """Invite every member of a segment to an event, batch by batch; returns how many were new"""
+        if not self.get_segment(segment_id):
+            raise ValueError("Segment not found")
+        return sum(event_service.add_invitees(event_id, batch) for batch in self.member_batches(segment_id))
+
+    def _contacts(self, contact_ids):
+        return list(self.contacts_collection.find(
+            {'_id': {'$in': contact_ids}}, {'name': 1, 'phone': 1, 'tags': 1}
+        ))
+
+    def _member_upsert(self, segment_id, contact_id, seen_at):
+        return UpdateOne(
+            {'segment_id': segment_id, 'contact_id': contact_id},
+            {'$set': {'seen_at': seen_at}},
+            upsert=True
+        )
+
+    def _write(self, operations):
+        """Unordered bulk_write of membership changes; returns (members added, members removed)"""
+        if not operations:
+            return 0, 0
+        try:
+            result = self.members_collection.bulk_write(operations, ordered=False)
+            return result.upserted_count, result.deleted_count
+        except BulkWriteError as e:
+            # A concurrent writer added the same member first; everything else applied
+            self.logger.warning(f"{len(e.details.get('writeErrors', []))} segment membership writes failed")
+            return e.details.get('nUpserted', 0), e.details.get('nRemoved', 0)
@@ -2,54 +2,137 @@ from twilio.rest import Client
 from twilio.base.exceptions import TwilioRestException
 import logging
 from datetime import datetime, timedelta
-import os
 from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import threading
+import zlib
+from ..metrics import SMS_SEND_DURATION, SMS_SENDS, SMS_RATE_LIMITED, SMS_SEGMENTS
+from .message_templates import MessageTemplateRegistry
+import time
+
+class SendBudget:
+    """
+    Token bucket that paces one sweep partition's sends at its share of the
+    SMS rate limit. acquire() waits for a token and gives up once the
+    partition's deadline has passed, leaving the rest for the next sweep.
+    """
+    def __init__(self, rate_per_second, deadline=None):
+        self.rate = max(rate_per_second, 0.01)
+        self.capacity = max(1.0, self.rate)
+        self.tokens = self.capacity
+        self.deadline = deadline  # time.monotonic() value
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        """Take `tokens` (a message's segment count), capped at what the bucket can hold"""
+        tokens = min(tokens, self.capacity)
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return True
+                wait = (tokens - self.tokens) / self.rate
+            if self.deadline is not None and now + wait > self.deadline:
+                return False
+            time.sleep(wait)
+
+class SenderLimiter:
+    """Sliding one-second window of segments sent from one sender"""
+    def __init__(self, max_per_second):
+        self.max_per_second = max_per_second
+        self.recent = deque()
+        self.lock = threading.Lock()
+
+    def reserve(self, segments):
+        """Claim room for `segments`; returns 0 on success or the seconds to wait before retrying"""
+        with self.lock:
+            now = time.monotonic()
+            while self.recent and now - self.recent[0] >= 1:
+                self.recent.popleft()
+            # A long message may exceed the whole allowance; let it through on an idle second
+            if self.recent and len(self.recent) + segments > self.max_per_second:
+                index = min(len(self.recent) - 1, max(0, len(self.recent) + segments - self.max_per_second - 1))
+                return max(0.001, self.recent[index] + 1 - now)
+            self.recent.extend([now] * segments)
+            return 0
 
 class SMSService:
-    def __init__(self, twilio_sid, twilio_auth_token, twilio_phone):
-        self.client = Client(twilio_sid, twilio_auth_token)
+    def __init__(self, twilio_sid, twilio_auth_token, twilio_phone, api_base_url=None,
+                 rsvp_base_url=None, max_messages_per_day=100, max_messages_per_second=3, templates=None,
+                 sender_pool=None, messaging_service_sid=None, sender_max_wait=1.0, status_callback_url=None):
+        self.twilio_sid = twilio_sid
+        self.twilio_auth_token = twilio_auth_token
+        self.api_base_url = api_base_url
+        self._client = None
         self.twilio_phone = twilio_phone
+        self.rsvp_base_url = rsvp_base_url.rstrip('/') if rsvp_base_url else None
+        self.templates = templates or MessageTemplateRegistry()
+
+        # Outbound numbers. With a Messaging Service, Twilio picks the number (and keeps
+        # it sticky per recipient); the pool then only tells inbound replies apart.
+        self.senders = list(sender_pool or []) or [twilio_phone]
+        self.messaging_service_sid = messaging_service_sid
+        # Twilio posts delivery outcomes of invitations here (see DeliveryStatusService)
+        self.status_callback_url = status_callback_url
         
-        # Rate limiting settings
-        self.max_messages_per_day = 100  # Twilio's default limit
-        self.max_messages_per_second = 3   # Conservative rate limit
+        # Rate limiting settings, both counted in segments
+        self.max_messages_per_day = max_messages_per_day  # Twilio's default limit is 100
+        self.max_messages_per_second = max_messages_per_second  # Per sender
+        self.sender_max_wait = sender_max_wait  # seconds a send may wait for its sender's bucket
         
         # Initialize rate limiting trackers
-        self.daily_message_count = 0
+        self.daily_segment_count = 0
         self.daily_reset_time = datetime.now()
-        self.recent_messages = deque(maxlen=100)  # Track recent message timestamps
+        if messaging_service_sid:
+            self.limiters = {messaging_service_sid: SenderLimiter(max_messages_per_second * len(self.senders))}
+        else:
+            self.limiters = {sender: SenderLimiter(max_messages_per_second) for sender in self.senders}
         self.lock = threading.Lock()  # Thread-safe counter updates
         
-        # Setup logging
-        self._setup_logging()
-        
-    def _setup_logging(self):
-        """Configure logging for SMS service"""
-        if not os.path.exists('logs'):
-            os.makedirs('logs')
-            
         self.logger = logging.getLogger('sms_service')
-        self.logger.setLevel(logging.INFO)
-        
-        if not self.logger.handlers:
-            # File handler for SMS service logs
-            file_handler = logging.FileHandler('logs/sms_service.log')
-            file_handler.setFormatter(
-                logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-            )
-            self.logger.addHandler(file_handler)
-            
-            # Console handler
-            console_handler = logging.StreamHandler()
-            console_handler.setFormatter(
-                logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-            )
-            self.logger.addHandler(console_handler)
-
-    def _check_rate_limits(self):
+
+    @property
+    def client(self):
+        """Twilio REST client, created on first use so its HTTP session is never shared across a fork"""
+        if self._client is None:
+            client = Client(self.twilio_sid, self.twilio_auth_token)
+            if self.api_base_url:
+                # Point the REST client at a Twilio stand-in (see benchmarks/twilio_fake.py)
+                client.api.base_url = self.api_base_url.rstrip('/')
+            self._client = client
+        return self._client
+
+    def sender_for(self, phone_number, preferred=None):
+        """
+        Sender for a recipient: the number they were first messaged from if it is
+        still in the pool, else a stable hash of their number so every message to
+        them comes from the same sender.
         """
-        Check if we're within rate limits
+        if self.messaging_service_sid:
+            return self.messaging_service_sid
+        if preferred in self.limiters:
+            return preferred
+        return self.senders[zlib.crc32(phone_number.encode()) % len(self.senders)]
+
+    def sender_number(self, phone_number, preferred=None):
+        """The pool number a recipient is messaged from, or None when Twilio picks it"""
+        return None if self.messaging_service_sid else self.sender_for(phone_number, preferred)
+
+    def pool_number(self, number):
+        """Map an inbound `To` back to the pool; None if it is not one of our senders"""
+        return number if number in self.senders else None
+
+    def _check_rate_limits(self, segments=1, sender=None, wait=0):
+        """
+        Check if we're within rate limits and reserve room for the message. Both
+        limits are counted in segments, which is what Twilio bills and measures
+        throughput in; the per-second one is kept per sender, and a send may wait
+        up to `wait` seconds for its sender's bucket. A send that then fails
+        hands its daily segments back with _release_daily_segments.
         Returns: (bool, str) - (is_allowed, reason_if_not_allowed)
         """
         now = datetime.now()
@@ -57,57 +140,72 @@ class SMSService:
         with self.lock:
             # Reset daily counter if needed
             if (now - self.daily_reset_time).days >= 1:
-                self.daily_message_count = 0
+                self.daily_segment_count = 0
                 self.daily_reset_time = now
             
-            # Check daily limit
-            if self.daily_message_count >= self.max_messages_per_day:
+            # Check daily limit, reserving the segments so concurrent sends cannot overshoot it
+            if self.daily_segment_count + segments > self.max_messages_per_day:
                 return False, "Daily message limit exceeded"
+            self.daily_segment_count += segments
             
-            # Check per-second rate limit
-            recent_count = sum(1 for t in self.recent_messages 
-                             if (now - t).total_seconds() < 1)
-            if recent_count >= self.max_messages_per_second:
+        # Check per-second rate limit
+        limiter = self.limiters[sender or self.sender_for('')]
+        deadline = time.monotonic() + wait
+        while True:
+            delay = limiter.reserve(segments)
+            if not delay:
+                return True, None
+            if time.monotonic() + delay > deadline:
+                self._release_daily_segments(segments)
                 return False, "Per-second rate limit exceeded"
-            
-            return True, None
+            time.sleep(delay)
 
-    def _update_rate_limiting_stats(self):
-        """Update rate limiting counters after successful send"""
-        now = datetime.now()
+    def _release_daily_segments(self, segments):
+        """Give back the daily allowance reserved for a message that was not sent"""
         with self.lock:
-            self.daily_message_count += 1
-            self.recent_messages.append(now)
+            self.daily_segment_count = max(0, self.daily_segment_count - segments)
+
+    def _create(self, sender, phone_number, body, status_callback=None):
+        options = {'status_callback': status_callback} if status_callback else {}
+        if sender == self.messaging_service_sid:
+            return self.client.messages.create(body=body, messaging_service_sid=sender, to=phone_number, **options)
+        return self.client.messages.create(body=body, from_=sender, to=phone_number, **options)
 
-    def send_invitation(self, phone_number, event_name, event_date, event_code):
+    def _send(self, kind, phone_number, message, sender=None, wait=0):
         """
-        Send an invitation SMS with rate limiting and error handling
+        Send one rendered SMS with rate limiting and error handling
         Returns: (message_sid, status, error_message)
         """
+        sender = sender or self.sender_for(phone_number)
+        reserved = 0
         try:
             # Check rate limits
-            is_allowed, limit_reason = self._check_rate_limits()
+            is_allowed, limit_reason = self._check_rate_limits(message.segments, sender, wait)
             if not is_allowed:
-                self.logger.warning(f"Rate limit prevented sending to {phone_number}: {limit_reason}")
+                self.logger.warning(f"Rate limit prevented {kind} to {phone_number}: {limit_reason}")
+                SMS_RATE_LIMITED.labels(limit_reason).inc()
+                SMS_SENDS.labels(kind, 'rate_limited').inc()
                 return None, "ERROR", limit_reason
+            reserved = message.segments
             
             # Send message
-            message = self.client.messages.create(
-                body=f"You're invited to {event_name} on {event_date}! "
-                     f"Reply '{event_code} YES' to accept or '{event_code} NO' to decline.",
-                from_=self.twilio_phone,
-                to=phone_number
-            )
+            with SMS_SEND_DURATION.labels(kind).time():
+                # Only invitations hold a seat, so only they need delivery callbacks
+                sent = self._create(sender, phone_number, message.body,
+                                    self.status_callback_url if kind == 'invitation' else None)
             
-            # Update rate limiting stats
-            self._update_rate_limiting_stats()
+            SMS_SENDS.labels(kind, 'sent').inc()
+            SMS_SEGMENTS.labels(kind, message.encoding).inc(message.segments)
             
-            self.logger.info(f"Successfully sent invitation to {phone_number} for {event_name}")
-            return message.sid, "SENT", None
+            self.logger.info(f"Successfully sent {kind}",
+                             extra={'phone': phone_number, 'message_sid': sent.sid})
+            return sent.sid, "SENT", None
             
         except TwilioRestException as e:
-            error_msg = f"Twilio error sending SMS to {phone_number}: {str(e)}"
+            self._release_daily_segments(reserved)
+            error_msg = f"Twilio error sending {kind} to {phone_number}: {str(e)}"
             self.logger.error(error_msg)
+            SMS_SENDS.labels(kind, 'error').inc()
             
             # Categorize common Twilio errors
             if e.code == 21610:  # Invalid phone number
@@ -120,51 +218,120 @@ class SMSService:
                 return None, "ERROR", f"Twilio error: {str(e)}"
                 
         except Exception as e:
-            error_msg = f"Unexpected error sending SMS to {phone_number}: {str(e)}"
+            self._release_daily_segments(reserved)
+            error_msg = f"Unexpected error sending {kind} to {phone_number}: {str(e)}"
             self.logger.error(error_msg)
+            SMS_SENDS.labels(kind, 'error').inc()
             return None, "ERROR", f"Unexpected error: {str(e)}"
 
-    def send_confirmation(self, phone_number, event_name, status):
+    def _invitation_fields(self, invitee_name, rsvp_token):
+        rsvp_url = f"{self.rsvp_base_url}/rsvp/{rsvp_token}" if rsvp_token and self.rsvp_base_url else ''
+        return {
+            'greeting': f"Hi {invitee_name}, you're" if invitee_name else "You're",
+            'invitee_name': invitee_name or '',
+            'rsvp_url': rsvp_url,
+            'rsvp_link': f" Or RSVP here: {rsvp_url}" if rsvp_url else '',
+        }
+
+    def render_invitations(self, event, invitees, rsvp_tokens):
+        """Render a whole wave of invitations for one event, binding the event's template once"""
+        template = self.templates.bind_event('invitation', event)
+        return [
+            template.render(**self._invitation_fields(invitee.get('name', 'Guest'), rsvp_token))
+            for invitee, rsvp_token in zip(invitees, rsvp_tokens)
+        ]
+
+    def render_reminder(self, event, expiry_hours):
+        return self.templates.bind_event('reminder', event).render(
+            expiry_hours=expiry_hours, hours_word='hour' if expiry_hours == 1 else 'hours'
+        )
+
+    def render_confirmation(self, event_name, status):
+        kind = {'YES': 'confirmation_yes', 'NO': 'confirmation_no', 'FULL': 'confirmation_full'}.get(
+            status, 'confirmation_other')
+        return self.templates.bind(kind, event_name, '').render()
+
+    def send_message(self, kind, phone_number, message, sender=None):
+        """
+        Send a message produced by one of the render_* methods, from `sender`
+        (see sender_for), pacing on that sender's bucket rather than failing.
+        Returns: (message_sid, status, error_message)
+        """
+        return self._send(kind, phone_number, message, self.sender_for(phone_number, sender),
+                          wait=self.sender_max_wait)
+
+    def send_wave(self, kind, recipients, budget=None):
+        """
+        Send a batch of (phone_number, message, sender) with one worker per sender,
+        so a wave goes out as fast as the pool allows. With a SendBudget, each
+        send first takes its segments from it; once it runs dry the remaining
+        results are None and those recipients are left for a later sweep.
+        Returns: a list of (message_sid, status, error_message) or None, in order
         """
-        Send a confirmation SMS with rate limiting and error handling
+        results = [None] * len(recipients)
+        queues = {}
+        for index, (phone_number, message, sender) in enumerate(recipients):
+            sender = self.sender_for(phone_number, sender)
+            # A Messaging Service shares one bucket across the pool; still send on one lane per number
+            lane = zlib.crc32(phone_number.encode()) % len(self.senders) if sender == self.messaging_service_sid else 0
+            queues.setdefault((sender, lane), []).append(index)
+
+        def drain(lane, indexes):
+            sender, _ = lane
+            for index in indexes:
+                phone_number, message, _ = recipients[index]
+                if budget is not None and not budget.acquire(message.segments):
+                    return
+                results[index] = self._send(kind, phone_number, message, sender, wait=self.sender_max_wait)
+
+        if len(queues) == 1:
+            drain(*next(iter(queues.items())))
+        else:
+            with ThreadPoolExecutor(max_workers=len(queues)) as pool:
+                for future in [pool.submit(drain, lane, indexes) for lane, indexes in queues.items()]:
+                    future.result()
+        return results
+
+    def send_confirmation(self, phone_number, event_name, status, sender=None):
+        """
+        Send a confirmation SMS with rate limiting and error handling, from
+        `sender` (the number the invitation went out from) when it is given
         Returns: (bool, error_message)
         """
+        reserved = 0
         try:
+            message = self.render_confirmation(event_name, status)
+            sender = self.sender_for(phone_number, sender)
+
             # Check rate limits
-            is_allowed, limit_reason = self._check_rate_limits()
+            is_allowed, limit_reason = self._check_rate_limits(message.segments, sender)
             if not is_allowed:
                 self.logger.warning(f"Rate limit prevented confirmation to {phone_number}: {limit_reason}")
+                SMS_RATE_LIMITED.labels(limit_reason).inc()
+                SMS_SENDS.labels('confirmation', 'rate_limited').inc()
                 return False, limit_reason
-
-            # Prepare message based on status
-            if status == 'YES':
-                message_text = f"Great! You're confirmed for {event_name}. We'll send you more details soon."
-            elif status == 'NO':
-                message_text = f"Thanks for letting us know you can't make it to {event_name}."
-            elif status == 'FULL':
-                message_text = f"Sorry, {event_name} is now at full capacity. We'll add you to the waitlist."
-            else:
-                message_text = "Thanks for your response!"
+            reserved = message.segments
 
             # Send message
-            self.client.messages.create(
-                body=message_text,
-                from_=self.twilio_phone,
-                to=phone_number
-            )
+            with SMS_SEND_DURATION.labels('confirmation').time():
+                self._create(sender, phone_number, message.body)
             
-            # Update rate limiting stats
-            self._update_rate_limiting_stats()
+            SMS_SENDS.labels('confirmation', 'sent').inc()
+            SMS_SEGMENTS.labels('confirmation', message.encoding).inc(message.segments)
             
             self.logger.info(f"Successfully sent confirmation to {phone_number} for {event_name}")
             return True, None
             
         except TwilioRestException as e:
+            self._release_daily_segments(reserved)
             error_msg = f"Twilio error sending confirmation to {phone_number}: {str(e)}"
             self.logger.error(error_msg)
+            SMS_SENDS.labels('confirmation', 'error').inc()
             return False, str(e)
             
         except Exception as e:
+            self._release_daily_segments(reserved)
             error_msg = f"Unexpected error sending confirmation to {phone_number}: {str(e)}"
             self.logger.error(error_msg)
+            SMS_SENDS.labels('confirmation', 'error').inc()
             return False, str(e)
\ No newline at end of file
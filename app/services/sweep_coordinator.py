@@ -0,0 +1,164 @@
+# app/services/sweep_coordinator.py
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pymongo import ReturnDocument
+from .sms_service import SendBudget
+from .event_service import shard_partition
+from ..profiling import SweepProfile, current_profile, use_profile
+import logging
+import os
+import socket
+import time
+import zlib
+
+class SweepCoordinator:
+    """
+    Splits the event sweep into hash partitions (equal shard_key ranges) that
+    scheduler workers claim through short leases in the `sweep_leases`
+    collection. Every process running the scheduler drains whatever partitions
+    are free, so adding worker containers spreads the sweep across them.
+
+    Each claimed partition is swept on its own thread with a SendBudget of
+    SMS_MAX_PER_SECOND / partitions, so all partitions together stay within
+    the global send rate however they are spread across workers.
+    """
+    def __init__(self, db, event_service, partitions, lease_seconds=300, max_workers=4,
+                 sms_max_per_second=3):
+        self.db = db
+        self.event_service = event_service
+        self.partitions = partitions
+        self.lease_seconds = lease_seconds
+        self.max_workers = max_workers
+        self.partition_rate = sms_max_per_second / partitions
+        self.leases_collection = db['sweep_leases']
+        self.leases_seeded = False
+        self.logger = logging.getLogger('scheduler')
+
+    @property
+    def worker_id(self):
+        # Read per call: the coordinator may be built before gunicorn forks its workers
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+    def _seed_leases(self):
+        """Make sure every partition has a lease document; done on the first run, not at import"""
+        epoch = datetime(1970, 1, 1)
+        for index in range(self.partitions):
+            self.leases_collection.update_one(
+                {'_id': index},
+                {'$setOnInsert': {'owner': None, 'expires_at': epoch, 'swept_at': epoch}},
+                upsert=True
+            )
+        self.leases_seeded = True
+
+    def _claim(self, index, swept_before=None):
+        """Take the lease on a partition that is free and, if given, was last swept before `swept_before`"""
+        now = datetime.utcnow()
+        query = {'_id': index, 'expires_at': {'$lte': now}}
+        if swept_before is not None:
+            query['swept_at'] = {'$lt': swept_before}
+        lease = self.leases_collection.find_one_and_update(
+            query,
+            {'$set': {'owner': self.worker_id, 'expires_at': now + timedelta(seconds=self.lease_seconds)}},
+            return_document=ReturnDocument.AFTER
+        )
+        return lease is not None
+
+    def _release(self, index, swept=True):
+        """Give a partition's lease back; `swept` records a full sweep of it"""
+        now = datetime.utcnow()
+        release = {'owner': None, 'expires_at': now}
+        if swept:
+            release['swept_at'] = now
+        self.leases_collection.update_one({'_id': index, 'owner': self.worker_id}, {'$set': release})
+
+    def _budget(self):
+        # Stop sending a little before the lease runs out so another worker cannot overlap
+        return SendBudget(self.partition_rate, deadline=time.monotonic() + self.lease_seconds * 0.75)
+
+    def _claim_next(self, swept_before):
+        # Start at a worker-specific offset so workers do not all race for partition 0
+        start = zlib.crc32(self.worker_id.encode()) % self.partitions
+        for step in range(self.partitions):
+            index = (start + step) % self.partitions
+            if self._claim(index, swept_before):
+                return index
+        return None
+
+    def _drain(self, parent, swept_before):
+        """Claim and sweep partitions one at a time until none are left; runs on a pool thread"""
+        profile = SweepProfile(parent.job, time_phases=parent.time_phases)
+        swept = []
+        with use_profile(profile):
+            while True:
+                index = self._claim_next(swept_before)
+                if index is None:
+                    break
+                try:
+                    self.event_service.run_sweep(partition=(index, self.partitions), budget=self._budget())
+                    swept.append(index)
+                except Exception as e:
+                    profile.count('errors')
+                    self.logger.error(f"Error sweeping partition {index}: {str(e)}", exc_info=True)
+                finally:
+                    self._release(index)
+        return profile, swept
+
+    def run(self, min_gap_seconds=0):
+        """
+        Sweep every partition this worker can claim, in parallel. Returns the
+        same per-stage counts as EventService.run_sweep plus the partitions swept.
+        """
+        parent = current_profile()
+        if not self.leases_seeded:
+            self._seed_leases()
+        # Fixed per run so a partition is swept at most once by each run
+        swept_before = datetime.utcnow() - timedelta(seconds=min_gap_seconds)
+        self.event_service.assign_shard_keys()
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, self.partitions)) as pool:
+            futures = [pool.submit(self._drain, parent, swept_before)
+                       for _ in range(min(self.max_workers, self.partitions))]
+            results = [future.result() for future in futures]
+
+        totals = SweepProfile(parent.job)
+        partitions = []
+        for profile, swept in results:
+            parent.merge(profile)
+            totals.merge(profile)
+            partitions.extend(swept)
+        stats = {name: totals.counters[name] for name in
+                 ('events_scanned', 'events_updated', 'expired', 'reminded', 'invited', 'errors',
+                  'write_round_trips')}
+        stats['partitions'] = sorted(partitions)
+        self.logger.info(f"Swept partitions {stats['partitions']} of {self.partitions}")
+        return stats
+
+    def sweep_events(self, event_ids):
+        """
+        Sweep just `event_ids`, as the deadline timers do. Each partition's lease
+        is held for the sweep of its events, which send within the partition's
+        budget, so a timer sweep never overlaps a partition sweep on another
+        worker. Returns the summed run_sweep counts, plus under 'busy' the ids
+        of events whose partition was leased elsewhere, to be retried.
+        """
+        if not self.leases_seeded:
+            self._seed_leases()
+        by_partition = {}
+        for event_id in event_ids:
+            by_partition.setdefault(shard_partition(event_id, self.partitions), []).append(event_id)
+        stats = {}
+        busy = []
+        for index, ids in sorted(by_partition.items()):
+            if not self._claim(index):
+                busy.extend(ids)
+                continue
+            try:
+                result = self.event_service.run_sweep(
+                    partition=(index, self.partitions), budget=self._budget(), event_ids=ids
+                )
+            finally:
+                # A handful of events is not a sweep of the partition
+                self._release(index, swept=False)
+            for name, value in result.items():
+                stats[name] = stats.get(name, 0) + value
+        stats['busy'] = busy
+        return stats
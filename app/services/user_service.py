@@ -1,15 +1,14 @@
 # app/services/user_service.py
 from bson import ObjectId
-import bcrypt
 from ..models.user import User
+from .password_hasher import PasswordHasher, PasswordHasherBusy
 
 class UserService:
-    def __init__(self, db):
+    def __init__(self, db, password_hasher=None):
         self.db = db
         self.users_collection = db['users']
-        # Create unique index for email and username
-        self.users_collection.create_index('email', unique=True)
-        self.users_collection.create_index('username', unique=True)
+        self.password_hasher = password_hasher or PasswordHasher()
+        # email and username are unique through indexes in app.indexes
 
     def create_user(self, username, email, password, is_admin=False, registration_method=None):
         # Check if user already exists
@@ -17,7 +16,7 @@ class UserService:
             raise ValueError('Username or email already exists')
         
         # Hash the password
-        password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
+        password_hash = self.password_hasher.hash(password)
         
         # Create user document
         user = User(
@@ -42,7 +41,20 @@ class UserService:
         return User.from_dict(user_data) if user_data else None
 
     def verify_password(self, user, password):
-        return bcrypt.checkpw(password.encode('utf-8'), user.password_hash)
+        if not self.password_hasher.check(password, user.password_hash):
+            return False
+        # Upgrade hashes made with an old cost factor while we have the plaintext
+        if self.password_hasher.needs_rehash(user.password_hash):
+            try:
+                new_hash = self.password_hasher.hash(password)
+            except PasswordHasherBusy:
+                return True
+            self.users_collection.update_one(
+                {'_id': user._id, 'password_hash': user.password_hash},
+                {'$set': {'password_hash': new_hash}}
+            )
+            user.password_hash = new_hash
+        return True
 
     def make_admin(self, user_id):
         result = self.users_collection.update_one(
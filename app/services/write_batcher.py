@@ -0,0 +1,61 @@
+# app/services/write_batcher.py
+from pymongo.errors import BulkWriteError, PyMongoError
+from ..metrics import DB_DURATION
+import logging
+import time
+
+class WriteBatcher:
+    """
+    Collects a sweep's per-event writes and sends them as unordered bulk_writes,
+    flushing once `batch_size` operations are queued or the oldest has waited
+    `flush_interval` seconds, and once more when the sweep calls flush().
+
+    Writes are keyed by event so a failed operation is reported against its
+    event in `failed` while the rest of the batch still applies. Upserts that
+    inserted a document report its _id under their key in `upserted`.
+    """
+    def __init__(self, collection, batch_size=500, flush_interval=5.0):
+        self.collection = collection
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.operations = []
+        self.keys = []
+        self.first_queued = None
+        self.written = 0
+        self.round_trips = 0
+        self.failed = {}
+        self.upserted = {}
+        self.logger = logging.getLogger('event_service')
+
+    def add(self, key, operation):
+        if not self.operations:
+            self.first_queued = time.monotonic()
+        self.operations.append(operation)
+        self.keys.append(key)
+        if (len(self.operations) >= self.batch_size
+                or time.monotonic() - self.first_queued >= self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        if not self.operations:
+            return
+        operations, keys = self.operations, self.keys
+        self.operations, self.keys = [], []
+        self.round_trips += 1
+        try:
+            with DB_DURATION.labels('bulk_write').time():
+                result = self.collection.bulk_write(operations, ordered=False)
+            self.written += len(operations)
+            for index, upserted_id in result.upserted_ids.items():
+                self.upserted[keys[index]] = upserted_id
+        except BulkWriteError as e:
+            # Unordered: everything but the reported operations was applied
+            errors = e.details.get('writeErrors', [])
+            for error in errors:
+                self.failed[keys[error['index']]] = error.get('errmsg', 'write failed')
+            for upsert in e.details.get('upserted', []):
+                self.upserted[keys[upsert['index']]] = upsert['_id']
+            self.written += len(operations) - len(errors)
+        except PyMongoError as e:
+            for key in keys:
+                self.failed[key] = str(e)
@@ -0,0 +1,7 @@
+# asgi.py
+# Public RSVP and SMS webhook routes on an event loop, e.g.
+#   uvicorn asgi:app --workers 2
+# Run next to the Flask app (run.py / gunicorn) and send /rsvp and /sms here.
+from app.asgi import create_asgi_app
+
+app = create_asgi_app()
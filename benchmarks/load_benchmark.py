@@ -0,0 +1,376 @@
+# benchmarks/load_benchmark.py
+"""
+End-to-end load benchmark against a local Twilio stand-in.
+
+Seeds N events x M invitees, runs the scheduler sweeps, then drives /sms
+replies and /rsvp clicks at a target rate through the Flask app, and reports
+sweep durations, p50/p99 route latency and SMS sends per second.
+
+    # against a local mongod (the database is dropped and reseeded)
+    python -m benchmarks.load_benchmark --events 50 --invitees 200 --rate 100
+
+    # without MongoDB (needs `pip install mongomock`)
+    python -m benchmarks.load_benchmark --mongomock
+"""
+from werkzeug.serving import make_server
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+
+from .twilio_fake import create_fake_twilio
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def start_fake_twilio(args):
+    fake = create_fake_twilio(
+        latency_ms=args.twilio_latency_ms,
+        jitter_ms=args.twilio_latency_ms / 4,
+        error_rate=args.error_rate,
+        max_rps=args.twilio_max_rps,
+        seed=args.seed
+    )
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    server = make_server('127.0.0.1', 0, fake, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, fake.config['FAKE_TWILIO_STATS']
+
+
+def _mongomock_array_filter_update(self, op):
+    """mongomock has no arrayFilters; apply `<array>.$[name].<field>` $sets to the matching elements here"""
+    document = self.find_one(op._filter)
+    if document is None:
+        return 0
+    filters = {}
+    for array_filter in op._array_filters:
+        name = next(iter(array_filter)).split('.', 1)[0]
+        filters[name] = {key.split('.', 1)[1]: value for key, value in array_filter.items()}
+
+    def matches(element, conditions):
+        for field, condition in conditions.items():
+            if isinstance(condition, dict) and '$in' in condition:
+                if element.get(field) not in condition['$in']:
+                    return False
+            elif element.get(field) != condition:
+                return False
+        return True
+
+    # Elements are picked before any are changed, as the server does
+    paths = [(re.match(r'^(\w+)\.\$\[(\w+)\]\.(\w+)$', path).groups(), value)
+             for path, value in op._doc['$set'].items()]
+    targets = {(array, name): [element for element in document.get(array, []) if matches(element, filters[name])]
+               for (array, name, _), _ in paths}
+    arrays = {}
+    for (array, name, field), value in paths:
+        for element in targets[(array, name)]:
+            element[field] = value
+        arrays[array] = document[array]
+    return self.update_one({'_id': document['_id']}, {'$set': arrays}).modified_count
+
+
+def _mongomock_update_one(update_one):
+    """Wrap mongomock's update_one so updates with array_filters go through _mongomock_array_filter_update"""
+    def patched(self, filter, update, upsert=False, array_filters=None, **kwargs):
+        if not array_filters:
+            return update_one(self, filter, update, upsert=upsert, **kwargs)
+        from pymongo import UpdateOne
+        from pymongo.results import UpdateResult
+        modified = _mongomock_array_filter_update(self, UpdateOne(filter, update, array_filters=array_filters))
+        return UpdateResult({'n': modified, 'nModified': modified}, True)
+    return patched
+
+
+def _mongomock_bulk_write(self, requests, ordered=True, **kwargs):
+    """mongomock's bulk builder predates pymongo's newer UpdateOne fields; apply ops one by one"""
+    from pymongo.results import BulkWriteResult
+    counts = {'nInserted': 0, 'nUpserted': 0, 'nMatched': 0, 'nModified': 0, 'nRemoved': 0, 'upserted': []}
+    for index, op in enumerate(requests):
+        kind = type(op).__name__
+        if kind == 'InsertOne':
+            self.insert_one(op._doc)
+            counts['nInserted'] += 1
+        elif kind in ('DeleteOne', 'DeleteMany'):
+            delete = self.delete_one if kind == 'DeleteOne' else self.delete_many
+            counts['nRemoved'] += delete(op._filter).deleted_count
+        elif getattr(op, '_array_filters', None):
+            counts['nMatched'] += 1
+            counts['nModified'] += _mongomock_array_filter_update(self, op)
+        else:
+            method = {'UpdateOne': self.update_one, 'UpdateMany': self.update_many,
+                      'ReplaceOne': self.replace_one}[kind]
+            result = method(op._filter, op._doc, upsert=op._upsert)
+            counts['nMatched'] += result.matched_count
+            counts['nModified'] += result.modified_count
+            if result.upserted_id is not None:
+                counts['nUpserted'] += 1
+                counts['upserted'].append({'index': index, '_id': result.upserted_id})
+    return BulkWriteResult(counts, True)
+
+
+def _mongomock_find_one_and_update(self, filter, update, projection=None, sort=None, upsert=False,
+                                   return_document=False, **kwargs):
+    """mongomock applies positional ($) updates to the wrong element here; update_one gets it right"""
+    before = self.find_one(filter, projection, sort=sort)
+    if before is None and not upsert:
+        return None
+    result = self.update_one(filter, update, upsert=upsert)
+    if not return_document:  # ReturnDocument.BEFORE
+        return before
+    target = before['_id'] if before is not None else result.upserted_id
+    return self.find_one({'_id': target}, projection)
+
+
+def build_app(args, twilio_url):
+    if args.mongomock:
+        import mongomock
+        import flask_pymongo
+        flask_pymongo.MongoClient = mongomock.MongoClient
+        # mongomock has no capped collections; a plain one is fine for a benchmark
+        create_collection = mongomock.database.Database.create_collection
+        mongomock.database.Database.create_collection = (
+            lambda self, name, **kwargs: create_collection(self, name)
+        )
+        mongomock.collection.Collection.bulk_write = _mongomock_bulk_write
+        mongomock.collection.Collection.update_one = _mongomock_update_one(mongomock.collection.Collection.update_one)
+        mongomock.collection.Collection.find_one_and_update = _mongomock_find_one_and_update
+
+    from app import create_app
+    from app.config import Config
+
+    class BenchmarkConfig(Config):
+        MONGO_URI = args.mongo_uri
+        TWILIO_SID = 'AC' + '0' * 32
+        TWILIO_AUTH_TOKEN = 'benchmark'
+        TWILIO_PHONE = '+15550000000'
+        TWILIO_PHONE_POOL = [f"+1555000{i:04d}" for i in range(args.senders)] if args.senders > 1 else []
+        TWILIO_API_BASE_URL = twilio_url
+        SMS_MAX_PER_DAY = 10 ** 9
+        SMS_MAX_PER_SECOND = args.sms_max_per_second
+        SWEEP_PARTITIONS = args.partitions
+        SWEEP_WORKERS = args.sweep_workers
+        SECONDARY_READS_ENABLED = args.secondary_reads
+        SCHEDULER_ENABLED = False
+        # Indexes are synced below, the way a deploy would before starting workers
+        INDEX_CHECK_ON_STARTUP = 'off'
+        LOG_LEVEL = 'WARNING'
+        SMS_LOG_LEVEL = 'WARNING'
+        TESTING = True
+
+    app = create_app(BenchmarkConfig)
+    from app import mongo
+    from app.indexes import sync_indexes
+    sync_indexes(mongo.db)
+    return app
+
+
+def seed(event_service, args):
+    from app.models.event import Event
+    from bson import ObjectId
+
+    event_service.events_collection.delete_many({})
+    now = event_service.get_current_time()
+    docs = []
+    for e in range(args.events):
+        event = Event(f"Benchmark {e}", (now + timedelta(days=7)).strftime('%Y-%m-%d'), args.capacity,
+                      invitation_expiry_hours=event_service.invitation_expiry_hours)
+        event.automation_status = 'active'
+        event.invitees = [{
+            "_id": ObjectId(),
+            "name": f"Guest {e}-{i}",
+            "phone": f"+1555{e:03d}{i:04d}",
+            "status": "pending",
+            "priority": i,
+            "added_at": now,
+            "contact_id": str(ObjectId())
+        } for i in range(args.invitees)]
+        docs.append(event.to_dict())
+    event_service.events_collection.insert_many(docs)
+
+
+def shift_invited_at(event_service, hours):
+    """Move every invitation back in time so reminder/expiry sweeps have work to do"""
+    for event_data in event_service.events_collection.find({}, {"invitees": 1}):
+        for invitee in event_data['invitees']:
+            if invitee.get('invited_at'):
+                invitee['invited_at'] = invitee['invited_at'] - timedelta(hours=hours)
+        event_service.events_collection.update_one(
+            {"_id": event_data['_id']}, {"$set": {"invitees": event_data['invitees']}}
+        )
+
+
+def run_sweeps(app, event_service, twilio_stats, coordinator=None):
+    expiry = event_service.invitation_expiry_hours
+    results = []
+
+    def timed(name, sweep):
+        before = twilio_stats.snapshot()['accepted']
+        start = time.perf_counter()
+        with app.app_context():
+            updated = sweep()
+        duration = time.perf_counter() - start
+        if isinstance(updated, dict):
+            updated = updated['events_updated']
+        sent = twilio_stats.snapshot()['accepted'] - before
+        results.append({
+            'sweep': name,
+            'duration_s': round(duration, 3),
+            'events_updated': updated,
+            'sms_sent': sent,
+            'sends_per_s': round(sent / duration, 1) if duration else None,
+        })
+
+    # The single-pass sweep the scheduler runs: expire, remind and refill per event,
+    # across all partitions in parallel when sweeps are partitioned
+    sweep = coordinator.run if coordinator else event_service.run_sweep
+    name = f"run_sweep x{coordinator.partitions}" if coordinator else 'run_sweep'
+    timed(name, sweep)
+    shift_invited_at(event_service, expiry * 0.6)
+    timed(f'{name} (reminders due)', sweep)
+    shift_invited_at(event_service, expiry * 0.6)
+    timed(f'{name} (expire + refill)', sweep)
+    return results
+
+
+def collect_targets(event_service):
+    """Split outstanding invitations between link clicks and SMS replies so each answers once"""
+    rsvp_tokens, sms_replies = [], []
+    for event_data in event_service.events_collection.find({}, {"event_code": 1, "invitees": 1}):
+        for invitee in event_data['invitees']:
+            if invitee.get('status') != 'invited':
+                continue
+            if len(rsvp_tokens) <= len(sms_replies):
+                rsvp_tokens.append(invitee['rsvp_token'])
+            else:
+                sms_replies.append((invitee['phone'], event_data['event_code'], invitee.get('sender')))
+    return rsvp_tokens, sms_replies
+
+
+def drive_routes(app, args, rsvp_tokens, sms_replies):
+    """Fire requests at a fixed rate from a worker pool and record per-route latency"""
+    rng = random.Random(args.seed)
+    rng.shuffle(rsvp_tokens)
+    rng.shuffle(sms_replies)
+    total = int(args.rate * args.duration)
+    plan = []
+    for n in range(total):
+        if n % 2 == 0 and rsvp_tokens:
+            plan.append(('rsvp', rsvp_tokens.pop()))
+        elif sms_replies:
+            plan.append(('sms', sms_replies.pop()))
+    latencies = {'rsvp': [], 'sms': []}
+    statuses = {}
+    lock = threading.Lock()
+    local = threading.local()
+
+    def fire(item):
+        route, target = item
+        client = getattr(local, 'client', None)
+        if client is None:
+            client = local.client = app.test_client()
+        start = time.perf_counter()
+        if route == 'rsvp':
+            response = client.get(f"/rsvp/submit/{target}/{rng.choice(['yes', 'no'])}")
+        else:
+            phone, code, sender = target
+            response = client.post('/sms', data={
+                'From': phone, 'To': sender or '+15550000000', 'Body': f"{code} YES", 'MessageSid': 'SMbench'
+            })
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies[route].append(elapsed)
+            key = f"{route}:{response.status_code}"
+            statuses[key] = statuses.get(key, 0) + 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        for n, item in enumerate(plan):
+            delay = start + n / args.rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(fire, item)
+    wall = time.perf_counter() - start
+
+    report = {'requests': len(plan), 'wall_s': round(wall, 3),
+              'achieved_rps': round(len(plan) / wall, 1) if wall else None, 'statuses': statuses}
+    for route, values in latencies.items():
+        report[route] = {
+            'count': len(values),
+            'p50_ms': round(percentile(values, 50) * 1000, 2) if values else None,
+            'p99_ms': round(percentile(values, 99) * 1000, 2) if values else None,
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='RSVP end-to-end load benchmark')
+    parser.add_argument('--events', type=int, default=20)
+    parser.add_argument('--invitees', type=int, default=100)
+    parser.add_argument('--capacity', type=int, default=25)
+    parser.add_argument('--rate', type=float, default=50, help='target route requests per second')
+    parser.add_argument('--duration', type=float, default=10, help='seconds of route traffic')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--mongo-uri', default=os.getenv('BENCHMARK_MONGO_URI', 'mongodb://localhost:27017/rsvp-benchmark'))
+    parser.add_argument('--mongomock', action='store_true', help='use mongomock instead of a real mongod')
+    parser.add_argument('--twilio-latency-ms', type=float, default=50)
+    parser.add_argument('--twilio-max-rps', type=int, default=None)
+    parser.add_argument('--error-rate', type=float, default=0.02)
+    parser.add_argument('--sms-max-per-second', type=int, default=1000)
+    parser.add_argument('--senders', type=int, default=1, help='size of the sender number pool')
+    parser.add_argument('--partitions', type=int, default=1, help='sweep in this many leased partitions')
+    parser.add_argument('--sweep-workers', type=int, default=4, help='partitions swept in parallel')
+    parser.add_argument('--secondary-reads', action='store_true',
+                        help='scan from secondaries (point --mongo-uri at a replica set, e.g. ?replicaSet=rs0)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args()
+
+    server, twilio_stats = start_fake_twilio(args)
+    try:
+        app = build_app(args, f"http://127.0.0.1:{server.server_port}")
+        from app import event_service, sweep_coordinator
+
+        seed(event_service, args)
+        sweeps = run_sweeps(app, event_service, twilio_stats, coordinator=sweep_coordinator)
+        rsvp_tokens, sms_replies = collect_targets(event_service)
+        routes = drive_routes(app, args, rsvp_tokens, sms_replies)
+    finally:
+        server.shutdown()
+
+    report = {
+        'seeded': {'events': args.events, 'invitees_per_event': args.invitees, 'capacity': args.capacity},
+        'sweeps': sweeps,
+        'routes': routes,
+        'twilio': twilio_stats.snapshot(),
+    }
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"Seeded {args.events} events x {args.invitees} invitees (capacity {args.capacity})")
+    print(f"{'sweep':34} {'seconds':>8} {'events':>7} {'sent':>6} {'sends/s':>8}")
+    for row in sweeps:
+        print(f"{row['sweep']:34} {row['duration_s']:>8} {row['events_updated']:>7} "
+              f"{row['sms_sent']:>6} {row['sends_per_s'] or 0:>8}")
+    print(f"\nRoutes: {routes['requests']} requests in {routes['wall_s']}s ({routes['achieved_rps']} req/s)")
+    for route in ('rsvp', 'sms'):
+        stats = routes[route]
+        print(f"  {route:5} n={stats['count']:<6} p50={stats['p50_ms']}ms p99={stats['p99_ms']}ms")
+    print(f"  statuses: {routes['statuses']}")
+    print(f"Twilio stand-in: {report['twilio']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+# benchmarks/twilio_fake.py
+"""
+Local stand-in for the Twilio Messages API.
+
+Point SMSService at it with TWILIO_API_BASE_URL=http://localhost:8765 and it
+accepts the same form posts as api.twilio.com, with configurable latency,
+Twilio error codes (e.g. 21610, 21612) and 429 throttling above a send rate.
+
+    python -m benchmarks.twilio_fake --port 8765 --latency-ms 80 --error-rate 0.02 --max-rps 30
+"""
+from flask import Flask, jsonify, request
+from collections import deque
+from datetime import datetime, timezone
+import argparse
+import random
+import threading
+import time
+import uuid
+
+ERROR_MESSAGES = {
+    21610: "Attempt to send to unsubscribed recipient",
+    21611: "This 'From' number has exceeded the maximum number of queued messages",
+    21612: "The 'To' phone number is not currently reachable via SMS",
+    21614: "'To' number is not a valid mobile number",
+}
+
+
+class FakeTwilioStats:
+    """Counters shared between request threads"""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.accepted = 0
+        self.errors = 0
+        self.throttled = 0
+        self.messages = []
+
+    def snapshot(self):
+        with self.lock:
+            return {'accepted': self.accepted, 'errors': self.errors, 'throttled': self.throttled}
+
+
+def create_fake_twilio(latency_ms=50, jitter_ms=20, error_rate=0.0, error_codes=(21610, 21612),
+                       max_rps=None, keep_messages=False, seed=None):
+    app = Flask(__name__)
+    stats = FakeTwilioStats()
+    app.config['FAKE_TWILIO_STATS'] = stats
+    rng = random.Random(seed)
+    recent = deque()
+    throttle_lock = threading.Lock()
+
+    def throttled():
+        if not max_rps:
+            return False
+        now = time.monotonic()
+        with throttle_lock:
+            while recent and now - recent[0] >= 1:
+                recent.popleft()
+            if len(recent) >= max_rps:
+                return True
+            recent.append(now)
+            return False
+
+    def error_response(code, status):
+        return jsonify({
+            'code': code,
+            'message': ERROR_MESSAGES.get(code, 'Too Many Requests'),
+            'more_info': f'https://www.twilio.com/docs/errors/{code}',
+            'status': status,
+        }), status
+
+    @app.route('/2010-04-01/Accounts/<account_sid>/Messages.json', methods=['POST'])
+    def create_message(account_sid):
+        delay = max(0.0, latency_ms + rng.uniform(-jitter_ms, jitter_ms)) / 1000
+        time.sleep(delay)
+
+        if throttled():
+            with stats.lock:
+                stats.throttled += 1
+            return error_response(20429, 429)
+
+        if error_rate and rng.random() < error_rate:
+            with stats.lock:
+                stats.errors += 1
+            return error_response(rng.choice(error_codes), 400)
+
+        sid = 'SM' + uuid.uuid4().hex
+        body = request.form.get('Body', '')
+        with stats.lock:
+            stats.accepted += 1
+            if keep_messages:
+                stats.messages.append({'sid': sid, 'to': request.form.get('To'), 'body': body})
+
+        now = datetime.now(timezone.utc).strftime('%a, %d %b %Y %H:%M:%S +0000')
+        return jsonify({
+            'sid': sid,
+            'account_sid': account_sid,
+            'to': request.form.get('To'),
+            'from': request.form.get('From'),
+            'messaging_service_sid': request.form.get('MessagingServiceSid'),
+            'body': body,
+            'status': 'queued',
+            'num_segments': '1',
+            'direction': 'outbound-api',
+            'date_created': now,
+            'date_updated': now,
+            'uri': f'/2010-04-01/Accounts/{account_sid}/Messages/{sid}.json',
+        }), 201
+
+    @app.route('/_stats', methods=['GET'])
+    def get_stats():
+        return stats.snapshot()
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a local Twilio Messages API stand-in')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency-ms', type=float, default=50)
+    parser.add_argument('--jitter-ms', type=float, default=20)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--error-codes', default='21610,21612')
+    parser.add_argument('--max-rps', type=int, default=None)
+    args = parser.parse_args()
+
+    app = create_fake_twilio(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        error_codes=tuple(int(c) for c in args.error_codes.split(',')),
+        max_rps=args.max_rps
+    )
+    app.run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,15 +1,13 @@
 # create_admin.py
-from app import create_app, user_service
-from app.services.user_service import UserService
+from app import create_app
 import getpass
 
 def create_initial_admin():
     app = create_app()
     
     with app.app_context():
-        # Create a new instance of UserService
-        from app import mongo
-        user_service_instance = UserService(mongo.db)
+        # The app's UserService, so the hash uses BCRYPT_ROUNDS and the shared hasher
+        from app import user_service as user_service_instance
         
         print("Create Initial Admin User")
         print("-" * 30)
@@ -0,0 +1,36 @@
+# gunicorn.conf.py
+# Loaded automatically by gunicorn from the working directory.
+import os
+import shutil
+
+# Workers write their metric samples here so /metrics can aggregate them.
+# Must be set before prometheus_client is imported anywhere.
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/prometheus_multiproc')
+
+# Build the app once in the master and fork workers from it; each worker then
+# opens its own connections and threads in post_worker_init below
+preload_app = os.getenv('GUNICORN_PRELOAD', 'true').lower() == 'true'
+os.environ['DEFER_WORKER_INIT'] = 'true'
+
+# Threaded workers (gthread) serve several requests per process, so a login burst
+# queues on the per-process PasswordHasher bound instead of blocking the worker
+threads = int(os.getenv('GUNICORN_THREADS', '4'))
+
+
+def on_starting(server):
+    """Clear samples left over from a previous master process"""
+    metrics_dir = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+
+def post_worker_init(worker):
+    """Post-fork phase of the app: logging, index check and scheduler, per worker"""
+    from app import init_worker
+    # Under an ASGI worker class (asgi.py) the loaded app wraps the Flask one
+    init_worker(getattr(worker.wsgi, 'flask_app', worker.wsgi))
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,21 @@
+# tests/conftest.py
+import pytest
+
+
+@pytest.fixture
+def db(monkeypatch):
+    """
+    A fresh in-memory database; tests that need one are skipped without mongomock.
+    bulk_write, array filters and positional find_one_and_update go through the
+    load benchmark's shims for what mongomock lacks or gets wrong.
+    """
+    mongomock = pytest.importorskip('mongomock')
+    from benchmarks.load_benchmark import (
+        _mongomock_bulk_write, _mongomock_find_one_and_update, _mongomock_update_one
+    )
+
+    collection = mongomock.collection.Collection
+    monkeypatch.setattr(collection, 'bulk_write', _mongomock_bulk_write)
+    monkeypatch.setattr(collection, 'update_one', _mongomock_update_one(collection.update_one))
+    monkeypatch.setattr(collection, 'find_one_and_update', _mongomock_find_one_and_update)
+    return mongomock.MongoClient()['rsvp-test']
@@ -0,0 +1,67 @@
+# tests/test_contact_import.py
+import io
+import pytest
+from app.services.contact_import import csv_rows, normalize_contact, vcf_rows
+from app.services.contact_service import ContactService
+from app.services.segment_service import SegmentService
+
+
+def test_normalize_contact():
+    assert normalize_contact({'name': '  Ada   Lovelace ', 'phone': '+1 (555) 010-0000', 'tags': 'b; a,b'}) == {
+        'name': 'Ada Lovelace', 'phone': '5550100000', 'tags': ['a', 'b']}
+    with pytest.raises(ValueError):
+        normalize_contact({'name': 'Ada', 'phone': '12345'})
+    with pytest.raises(ValueError):
+        normalize_contact({'name': ' ', 'phone': '5550100000'})
+
+
+def test_csv_and_vcard_rows():
+    csv_file = io.StringIO("Name,PHONE,tags\nAda,5550100000,work\nBob,5550100001,\n")
+    assert [number for number, _ in csv_rows(csv_file)] == [2, 3]
+    with pytest.raises(ValueError):
+        list(csv_rows(io.StringIO("name,tags\nAda,work\n")))
+
+    vcard = io.StringIO("BEGIN:VCARD\nN:Lovelace;Ada\nTEL:555-010-0000\nCATEGORIES:work,fam\n ily\nEND:VCARD\n")
+    assert list(vcf_rows(vcard)) == [(1, {'name': 'Ada Lovelace', 'phone': '555-010-0000', 'tags': 'work,family'})]
+
+
+@pytest.fixture
+def contacts(db):
+    return ContactService(db, import_batch_size=2, segments=SegmentService(db))
+
+
+def test_import_counts_created_and_updated(db, contacts):
+    contacts.create_contact({'name': 'Ada', 'phone': '5550100000', 'tags': ['vip']})
+    rows = enumerate([
+        {'name': 'Ada L', 'phone': '555-010-0000', 'tags': 'work'},
+        {'name': 'Bob', 'phone': '5550100001', 'tags': 'work'},
+        {'name': 'Bob B', 'phone': '5550100001', 'tags': 'family'},
+        {'name': 'Cy', 'phone': 'nope'},
+        {'name': 'Di', 'phone': '5550100002'},
+    ], start=2)
+
+    report = contacts.import_contacts(rows)
+
+    # Batches of two: Bob's second row lands in the next batch and updates him
+    assert (report['rows'], report['created'], report['updated'], report['error_count']) == (5, 2, 2, 1)
+    assert report['errors'][0]['row'] == 5
+    ada = db['master_list'].find_one({'phone': '5550100000'})
+    assert (ada['name'], sorted(ada['tags'])) == ('Ada L', ['vip', 'work'])
+    assert sorted(db['master_list'].find_one({'phone': '5550100001'})['tags']) == ['family', 'work']
+
+
+def test_import_keeps_segments_current(db, contacts):
+    segments = contacts.segments
+    contacts.create_contact({'name': 'Ada', 'phone': '5550100000', 'tags': ['vip']})
+    segment_id = segments.create_segment('Work, not VIP', 'work AND NOT vip')
+
+    contacts.import_contacts(enumerate([
+        {'name': 'Ada', 'phone': '5550100000', 'tags': 'work'},
+        {'name': 'Bob', 'phone': '5550100001', 'tags': 'work'},
+        {'name': 'Cy', 'phone': '5550100002', 'tags': 'home'},
+    ]))
+
+    members = [contact['phone'] for batch in segments.member_batches(segment_id) for contact in batch]
+    # Ada's existing vip tag keeps her out
+    assert members == ['5550100001']
+    assert segments.get_segment(segment_id)['member_count'] == 1
@@ -0,0 +1,68 @@
+# tests/test_deadline_heap.py
+from app.services.deadline_heap import DeadlineHeap
+
+
+def test_pops_due_deadlines_in_order():
+    heap = DeadlineHeap()
+    heap.schedule('c', 'e1', 30)
+    heap.schedule('a', 'e1', 10)
+    heap.schedule('b', 'e2', 20)
+
+    assert heap.next_deadline() == 10
+    assert heap.pop_due(now=25) == [('a', 'e1'), ('b', 'e2')]
+    assert len(heap) == 1
+    assert heap.pop_due(now=25) == []
+    assert heap.pop_due(now=30) == [('c', 'e1')]
+    assert heap.next_deadline() is None
+
+
+def test_reschedule_replaces_the_old_deadline():
+    heap = DeadlineHeap()
+    heap.schedule('a', 'e1', 10)
+    heap.schedule('b', 'e1', 20)
+    heap.schedule('a', 'e1', 30)
+
+    assert len(heap) == 2
+    assert heap.next_deadline() == 20
+    assert heap.pop_due(now=25) == [('b', 'e1')]
+    assert heap.pop_due(now=30) == [('a', 'e1')]
+
+
+def test_reschedule_earlier():
+    heap = DeadlineHeap()
+    heap.schedule('a', 'e1', 30)
+    heap.schedule('a', 'e1', 5)
+
+    assert heap.pop_due(now=5) == [('a', 'e1')]
+    assert heap.pop_due(now=30) == []
+
+
+def test_cancel_skips_the_key():
+    heap = DeadlineHeap()
+    heap.schedule('a', 'e1', 10)
+    heap.schedule('b', 'e1', 20)
+    heap.cancel('a', 'e1')
+
+    assert len(heap) == 1
+    assert heap.next_deadline() == 20
+    assert heap.pop_due(now=100) == [('b', 'e1')]
+
+
+def test_cancel_event_drops_all_its_keys():
+    heap = DeadlineHeap()
+    heap.schedule('a', 'e1', 10)
+    heap.schedule('b', 'e1', 20)
+    heap.schedule('c', 'e2', 15)
+    heap.cancel_event('e1')
+
+    assert heap.pop_due(now=100) == [('c', 'e2')]
+    assert heap.keys_by_event == {}
+
+
+def test_a_cancelled_key_can_be_scheduled_again():
+    heap = DeadlineHeap()
+    heap.schedule('a', 'e1', 10)
+    heap.cancel('a', 'e1')
+    heap.schedule('a', 'e1', 10)
+
+    assert heap.pop_due(now=10) == [('a', 'e1')]
@@ -0,0 +1,127 @@
+# tests/test_deadline_tracker.py
+from datetime import datetime, timedelta
+from bson import ObjectId
+import time
+import pytest
+from app.services.deadline_tracker import DeadlineTracker, LEADER_LEASE_ID
+
+
+class NamedTracker(DeadlineTracker):
+    """A tracker standing in for one worker process"""
+    def __init__(self, db, name, **kwargs):
+        super().__init__(db, **kwargs)
+        self.name = name
+
+    @property
+    def worker_id(self):
+        return self.name
+
+
+@pytest.fixture
+def tracker(db):
+    tracker = NamedTracker(db, 'worker-a', refill_backoff_seconds=60)
+    tracker.is_leader = True
+    return tracker
+
+
+def event_data(invitees, capacity=2):
+    return {'_id': ObjectId(), 'capacity': capacity, 'automation_status': 'active',
+            'invitation_expiry_hours': 24, 'invitees': invitees}
+
+
+def invitee(status, **fields):
+    return dict({'_id': ObjectId(), 'status': status}, **fields)
+
+
+def deadlines(tracker, event_id):
+    return {key[2]: tracker.heap.deadlines[key] for key in tracker.heap.keys_by_event.get(event_id, ())}
+
+
+def test_schedules_reminder_and_expiry(tracker):
+    invited_at = datetime.utcnow() - timedelta(hours=1)
+    event = event_data([invitee('invited', invited_at=invited_at), invitee('YES')])
+    tracker.schedule_event(event)
+
+    epoch = tracker._epoch(invited_at)
+    assert deadlines(tracker, event['_id']) == {'remind': epoch + 12 * 3600, 'expire': epoch + 24 * 3600 + 1}
+
+
+def test_refills_at_once_unless_just_swept(tracker):
+    event = event_data([invitee('pending'), invitee('YES')])
+    tracker.schedule_event(event)
+    assert deadlines(tracker, event['_id'])['refill'] <= time.time()
+
+    tracker.schedule_event(event, swept=True)
+    assert deadlines(tracker, event['_id'])['refill'] == pytest.approx(time.time() + 60, abs=1)
+
+
+def test_backoff_is_counted_from_the_last_sweep(tracker):
+    event = event_data([invitee('pending')])
+    tracker.schedule_event(event, swept=True)
+    tracker.swept_at[event['_id']] -= 50
+    # Rescheduled without a new sweep, e.g. on a rebuild
+    tracker.schedule_event(event)
+    assert deadlines(tracker, event['_id'])['refill'] == pytest.approx(time.time() + 10, abs=1)
+
+
+def test_explicit_refill_ignores_the_backoff(tracker):
+    event = event_data([invitee('pending'), invitee('invited', invited_at=datetime.utcnow())])
+    declined = event['invitees'][1]
+    tracker.schedule_event(event, swept=True)
+
+    tracker.answered(event['_id'], declined['_id'], 'NO')
+
+    assert deadlines(tracker, event['_id']) == {'refill': pytest.approx(time.time(), abs=1)}
+
+
+def test_a_full_event_forgets_its_sweep(tracker):
+    event = event_data([invitee('pending'), invitee('YES'), invitee('YES')])
+    tracker.schedule_event(event, swept=True)
+
+    assert 'refill' not in deadlines(tracker, event['_id'])
+    assert event['_id'] not in tracker.swept_at
+
+
+def test_yes_only_cancels_the_invitee_timers(tracker):
+    event = event_data([invitee('invited', invited_at=datetime.utcnow())])
+    tracker.schedule_event(event)
+
+    tracker.answered(event['_id'], event['invitees'][0]['_id'], 'YES')
+
+    assert deadlines(tracker, event['_id']) == {}
+
+
+def test_followers_keep_no_deadlines(tracker):
+    tracker.is_leader = False
+    event = event_data([invitee('pending')])
+    tracker.schedule_event(event)
+    tracker.request_refill(event['_id'])
+
+    assert len(tracker.heap) == 0
+
+
+def test_lease_is_handed_over_once_it_expires(db):
+    first = NamedTracker(db, 'worker-a', lease_seconds=30)
+    second = NamedTracker(db, 'worker-b', lease_seconds=30)
+
+    assert first._renew_lease()
+    assert not second._renew_lease()
+    # The holder renews its own lease
+    assert first._renew_lease()
+
+    db['sweep_leases'].update_one({'_id': LEADER_LEASE_ID},
+                                  {'$set': {'expires_at': datetime.utcnow() - timedelta(seconds=1)}})
+    assert second._renew_lease()
+    assert not first._renew_lease()
+    assert db['sweep_leases'].find_one({'_id': LEADER_LEASE_ID})['owner'] == 'worker-b'
+
+
+def test_rebuild_loads_active_events_with_outstanding_invitations(db, tracker):
+    active = event_data([invitee('invited', invited_at=datetime.utcnow())])
+    paused = dict(event_data([invitee('invited', invited_at=datetime.utcnow())]), automation_status='paused')
+    answered = event_data([invitee('YES')])
+    db['events'].insert_many([active, paused, answered])
+
+    tracker.rebuild()
+
+    assert set(tracker.heap.keys_by_event) == {active['_id']}
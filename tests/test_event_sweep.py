@@ -0,0 +1,111 @@
+# tests/test_event_sweep.py
+from datetime import datetime, timedelta
+from bson import ObjectId
+import pytest
+from app.services.event_service import EventService
+from app.services.sms_service import SendBudget, SMSService
+
+
+class ScriptedSMS(SMSService):
+    """Renders for real but answers send_wave from `script`, a callable per kind"""
+    def __init__(self):
+        super().__init__('AC' + '0' * 32, 'token', '+15550000000')
+        self.script = {}
+        self.waves = []
+
+    def send_wave(self, kind, recipients, budget=None):
+        self.waves.append((kind, [phone for phone, _, _ in recipients], budget))
+        answer = self.script.get(kind, lambda index, phone: (f"SM{kind[0]}{index}", 'SENT', None))
+        return [answer(index, phone) for index, (phone, _, _) in enumerate(recipients)]
+
+
+@pytest.fixture
+def sms():
+    return ScriptedSMS()
+
+
+@pytest.fixture
+def events(db, sms):
+    return EventService(db, sms_service=sms)
+
+
+def invitee(number, status, **fields):
+    return dict({'_id': ObjectId(), 'name': f"Guest {number}", 'phone': f"55501000{number:02d}",
+                 'status': status, 'priority': number}, **fields)
+
+
+def insert_event(db, invitees, capacity):
+    return db['events'].insert_one({
+        'name': 'Party', 'date': '2026-12-31', 'capacity': capacity, 'event_code': 'PTY',
+        'automation_status': 'active', 'invitation_expiry_hours': 24, 'invitees': invitees,
+    }).inserted_id
+
+
+def statuses(db, event_id):
+    return [i['status'] for i in db['events'].find_one({'_id': event_id})['invitees']]
+
+
+def test_invitations_are_claimed_before_they_are_sent(db, events, sms):
+    event_id = insert_event(db, [invitee(1, 'pending'), invitee(2, 'pending'), invitee(3, 'pending')], capacity=2)
+    seen = {}
+
+    def answer(index, phone):
+        # The claim is written before anything goes out, so a reply lands on an invited guest
+        if index == 0:
+            seen['stored'] = statuses(db, event_id)
+            seen['reply'] = events.process_rsvp(phone, 'PTY YES')
+        return f"SM{index}", 'SENT', None
+    sms.script['invitation'] = answer
+
+    stats = events.run_sweep()
+
+    assert seen == {'stored': ['invited', 'invited', 'pending'], 'reply': 'YES'}
+    assert (stats['invited'], stats['write_round_trips']) == (2, 2)
+    stored = db['events'].find_one({'_id': event_id})['invitees']
+    assert [(i['status'], i.get('message_sid')) for i in stored] == [('YES', 'SM0'), ('invited', 'SM1'), ('pending', None)]
+
+
+def test_failed_and_deferred_invitations(db, events, sms):
+    event_id = insert_event(db, [invitee(1, 'pending'), invitee(2, 'pending')], capacity=2)
+    sms.script['invitation'] = lambda index, phone: [(None, 'ERROR', 'Invalid phone number'), None][index]
+
+    stats = events.run_sweep()
+
+    stored = db['events'].find_one({'_id': event_id})['invitees']
+    assert [(i['status'], i.get('error_message'), i.get('invited_at')) for i in stored] == [
+        ('ERROR', 'Invalid phone number', stored[0]['invited_at']), ('pending', None, None)]
+    assert stats['invited'] == 1
+
+
+def test_waitlisted_guests_are_promoted_and_confirmed_within_the_budget(db, events, sms):
+    now = datetime.utcnow()
+    first = invitee(1, 'WAITLIST', responded_at=now - timedelta(hours=2), sender='+15550000000')
+    second = invitee(2, 'WAITLIST', responded_at=now - timedelta(hours=1))
+    event_id = insert_event(db, [invitee(3, 'YES'), second, first, invitee(4, 'pending')], capacity=2)
+    budget = SendBudget(100)
+
+    stats = events.run_sweep(budget=budget)
+
+    assert statuses(db, event_id) == ['YES', 'WAITLIST', 'YES', 'pending']
+    promoted = db['events'].find_one({'_id': event_id})['invitees'][2]
+    assert promoted['message_sid'] == 'SMc0' and promoted['promoted_at']
+    assert sms.waves == [('confirmation', [first['phone']], budget)]
+    assert stats['invited'] == 1
+
+
+def test_a_refused_confirmation_leaves_the_guest_waitlisted(db, events, sms):
+    event_id = insert_event(db, [invitee(1, 'WAITLIST', responded_at=datetime.utcnow()), invitee(2, 'pending')],
+                            capacity=1)
+    sms.script['confirmation'] = lambda index, phone: None
+
+    stats = events.run_sweep()
+
+    stored = db['events'].find_one({'_id': event_id})['invitees']
+    assert [(i['status'], i.get('promoted_at')) for i in stored] == [('WAITLIST', None), ('pending', None)]
+    assert stats['invited'] == 0
+    # The seat was never given away, so no invitation went out in its place
+    assert [kind for kind, _, _ in sms.waves] == ['confirmation']
+
+    del sms.script['confirmation']
+    events.run_sweep()
+    assert statuses(db, event_id) == ['YES', 'pending']
@@ -0,0 +1,101 @@
+# tests/test_message_templates.py
+from types import SimpleNamespace
+import pytest
+from app.services.message_templates import (
+    CompiledTemplate, DEFAULT_TEMPLATES, MessageTemplateRegistry, segment_count
+)
+
+
+def render(text, **fields):
+    """Render a reminder template (it takes both event and message fields)"""
+    return CompiledTemplate('reminder', text).bind(event_name='Party', event_date='2026-01-01',
+                                                   event_code='PTY').render(**fields)
+
+
+@pytest.mark.parametrize('length, segments', [(160, 1), (161, 2), (306, 2), (307, 3)])
+def test_gsm7_limits(length, segments):
+    message = render('a' * length)
+    assert (message.encoding, message.segments) == ('GSM-7', segments)
+    assert segment_count(message.body) == ('GSM-7', segments)
+
+
+@pytest.mark.parametrize('length, segments', [(70, 1), (71, 2), (134, 2), (135, 3)])
+def test_ucs2_limits(length, segments):
+    message = render('ж' * length)
+    assert (message.encoding, message.segments) == ('UCS-2', segments)
+    assert segment_count(message.body) == ('UCS-2', segments)
+
+
+def test_extension_characters_count_double():
+    # 80 two-septet characters fill a single message exactly; one more septet does not fit
+    assert render('€' * 80).segments == 1
+    assert render('€' * 80 + 'a').segments == 2
+    # Braces are written doubled in templates; each sends as one extension character
+    assert render('[]' * 39 + '{{}}').segments == 1
+    assert render('[]' * 40 + '{{').segments == 2
+
+
+def test_per_message_values_are_measured():
+    fixed = 'a' * 150
+    assert render(fixed + '{expiry_hours}', expiry_hours='1' * 10).segments == 1
+    assert render(fixed + '{expiry_hours}', expiry_hours='1' * 11).segments == 2
+    # An extension character in a value counts double as well
+    assert render(fixed + '{expiry_hours}', expiry_hours='~' * 5 + '1').segments == 2
+
+
+def test_a_value_outside_gsm7_switches_to_ucs2():
+    message = render('a' * 60 + '{hours_word}', hours_word='😀')
+    # The emoji is a surrogate pair: two UCS-2 units
+    assert (message.encoding, message.segments) == ('UCS-2', 1)
+    message = render('a' * 69 + '{hours_word}', hours_word='😀')
+    assert (message.encoding, message.segments) == ('UCS-2', 2)
+
+
+def test_event_fields_are_bound_once():
+    bound = CompiledTemplate('reminder', "{event_name} ({event_code}) in {expiry_hours} {hours_word}").bind(
+        event_name='Party', event_date='2026-01-01', event_code='PTY')
+    assert bound.fixed_gsm_length == len('Party (PTY) in  ')
+    assert bound.render(expiry_hours=2, hours_word='hours').body == 'Party (PTY) in 2 hours'
+
+
+def test_unknown_fields_are_rejected():
+    with pytest.raises(ValueError):
+        CompiledTemplate('confirmation_yes', "{rsvp_url}")
+    with pytest.raises(ValueError):
+        CompiledTemplate('reminder', "{expiry_hours:>3}")
+
+
+def event(templates=None):
+    return SimpleNamespace(name='Party', date='2026-01-01', event_code='PTY', message_templates=templates)
+
+
+def test_lookup_prefers_event_then_org_then_default(db):
+    registry = MessageTemplateRegistry(db)
+    assert registry.template_text('confirmation_no') == DEFAULT_TEMPLATES['confirmation_no']
+
+    registry.set_template('confirmation_no', "Org: sorry to miss you at {event_name}")
+    assert registry.bind_event('confirmation_no', event()).render().body == "Org: sorry to miss you at Party"
+
+    own = event({'confirmation_no': "Event: see you next time, {event_name}"})
+    assert registry.bind_event('confirmation_no', own).render().body == "Event: see you next time, Party"
+    # Kinds the event does not override still come from the organisation or the defaults
+    assert registry.template_text('confirmation_yes', own) == DEFAULT_TEMPLATES['confirmation_yes']
+
+
+def test_org_overrides_are_reread_after_the_refresh_interval(db):
+    registry = MessageTemplateRegistry(db, refresh_seconds=3600)
+    registry.template_text('confirmation_no')
+    db['message_templates'].insert_one({'_id': 'confirmation_no', 'body': "Changed elsewhere"})
+    assert registry.template_text('confirmation_no') == DEFAULT_TEMPLATES['confirmation_no']
+
+    registry.loaded_at -= 3600
+    assert registry.template_text('confirmation_no') == "Changed elsewhere"
+
+
+def test_set_template_rejects_unknown_kinds_and_fields(db):
+    registry = MessageTemplateRegistry(db)
+    with pytest.raises(ValueError):
+        registry.set_template('farewell', "Bye")
+    with pytest.raises(ValueError):
+        registry.set_template('confirmation_no', "{rsvp_url}")
+    assert db['message_templates'].count_documents({}) == 0
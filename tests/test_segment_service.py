@@ -0,0 +1,120 @@
+# tests/test_segment_service.py
+from datetime import datetime
+from bson import ObjectId
+import pytest
+from app.services.contact_service import ContactService
+from app.services.segment_service import SegmentService, matches, parse_expression, to_query
+
+
+def test_not_binds_tighter_than_and_and_and_than_or():
+    assert parse_expression('a OR b AND NOT c') == (
+        'or', [('tag', 'a'), ('and', [('tag', 'b'), ('not', ('tag', 'c'))])])
+
+
+def test_parentheses_and_quoted_tags():
+    assert parse_expression('family AND (work OR "book club") AND NOT vip') == (
+        'and', [('tag', 'family'), ('or', [('tag', 'work'), ('tag', 'book club')]), ('not', ('tag', 'vip'))])
+    assert parse_expression('NOT NOT a') == ('not', ('not', ('tag', 'a')))
+
+
+def test_keywords_are_case_insensitive():
+    assert parse_expression('a and not b') == parse_expression('a AND NOT b')
+
+
+@pytest.mark.parametrize('expression', [
+    '', '   ', 'a AND', 'AND a', 'a OR OR b', '(a OR b', 'a OR b)', '()', 'NOT', '""', 'a b', 'a "b',
+])
+def test_malformed_expressions_are_rejected(expression):
+    with pytest.raises(ValueError):
+        parse_expression(expression)
+
+
+@pytest.mark.parametrize('tags, expected', [
+    ({'family', 'work'}, True),
+    ({'family', 'book club'}, True),
+    ({'family', 'work', 'vip'}, False),
+    ({'work'}, False),
+    (set(), False),
+])
+def test_matches(tags, expected):
+    assert matches(parse_expression('family AND (work OR "book club") AND NOT vip'), tags) is expected
+
+
+def test_to_query():
+    assert to_query(parse_expression('a AND NOT b')) == {'$and': [{'tags': 'a'}, {'tags': {'$ne': 'b'}}]}
+    assert to_query(parse_expression('NOT (a OR b)')) == {'$nor': [{'$or': [{'tags': 'a'}, {'tags': 'b'}]}]}
+
+
+@pytest.fixture
+def segments(db):
+    return SegmentService(db)
+
+
+@pytest.fixture
+def contacts(db, segments):
+    return ContactService(db, segments=segments)
+
+
+def members(segments, segment_id):
+    return sorted(contact['name'] for batch in segments.member_batches(segment_id) for contact in batch)
+
+
+def test_create_segment_builds_membership(contacts, segments):
+    contacts.create_contact({'name': 'Ada', 'phone': '5550100000', 'tags': ['work']})
+    contacts.create_contact({'name': 'Bob', 'phone': '5550100001', 'tags': ['work', 'vip']})
+    contacts.create_contact({'name': 'Cy', 'phone': '5550100002', 'tags': []})
+
+    segment_id = segments.create_segment('Staff', 'work AND NOT vip')
+
+    assert members(segments, segment_id) == ['Ada']
+    assert segments.get_segment(segment_id)['member_count'] == 1
+
+
+def test_create_segment_rejects_bad_input(segments):
+    with pytest.raises(ValueError):
+        segments.create_segment('  ', 'work')
+    with pytest.raises(ValueError):
+        segments.create_segment('Staff', 'work AND')
+    segments.create_segment('Staff', 'work')
+    with pytest.raises(ValueError):
+        segments.create_segment('Staff', 'vip')
+
+
+def test_contact_changes_update_membership(contacts, segments):
+    segment_id = segments.create_segment('Staff', 'work AND NOT vip')
+
+    ada = contacts.create_contact({'name': 'Ada', 'phone': '5550100000', 'tags': ['work']})
+    bob = contacts.create_contact({'name': 'Bob', 'phone': '5550100001', 'tags': ['home']})
+    assert members(segments, segment_id) == ['Ada']
+
+    contacts.update_contact(bob, {'tags': ['work']})
+    contacts.update_contact(ada, {'tags': ['work', 'vip']})
+    assert members(segments, segment_id) == ['Bob']
+    assert segments.get_segment(segment_id)['member_count'] == 1
+
+    contacts.delete_contact(bob)
+    assert members(segments, segment_id) == []
+    assert segments.get_segment(segment_id)['member_count'] == 0
+
+
+def test_contacts_changed_counts_each_member_once(db, segments):
+    segment_id = segments.create_segment('Staff', 'work')
+    contact = {'_id': ObjectId(), 'tags': ['work']}
+
+    segments.contacts_changed([contact])
+    segments.contacts_changed([contact])
+
+    assert db['segment_members'].count_documents({'segment_id': ObjectId(segment_id)}) == 1
+    assert segments.get_segment(segment_id)['member_count'] == 1
+
+
+def test_rebuild_drops_members_that_no_longer_match(db, contacts, segments):
+    ada = contacts.create_contact({'name': 'Ada', 'phone': '5550100000', 'tags': ['work']})
+    segment_id = segments.create_segment('Staff', 'work')
+    # Changed behind the service's back, so only a rebuild notices
+    db['master_list'].update_one({'_id': ObjectId(ada)}, {'$set': {'tags': []}})
+    # Stored times have millisecond precision; make sure the first build is older
+    db['segment_members'].update_many({}, {'$set': {'seen_at': datetime(2000, 1, 1)}})
+
+    assert segments.rebuild(segment_id) == 0
+    assert members(segments, segment_id) == []
@@ -0,0 +1,78 @@
+# tests/test_sms_service.py
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+import threading
+import time
+from twilio.base.exceptions import TwilioRestException
+from app.services.message_templates import RenderedMessage
+from app.services.sms_service import SMSService
+
+
+class FakeMessages:
+    """Stands in for client.messages; fails the sends to numbers listed in `failing`"""
+    def __init__(self, failing=(), delay=0):
+        self.failing = set(failing)
+        self.delay = delay
+        self.sent = []
+        self.lock = threading.Lock()
+
+    def create(self, body, to, **kwargs):
+        time.sleep(self.delay)
+        if to in self.failing:
+            raise TwilioRestException(400, '/Messages', 'rejected', code=21612)
+        with self.lock:
+            self.sent.append(to)
+            return SimpleNamespace(sid=f"SM{len(self.sent)}")
+
+
+def service(messages, per_day=100, per_second=1000):
+    sms = SMSService('AC' + '0' * 32, 'token', '+15550000000',
+                     max_messages_per_day=per_day, max_messages_per_second=per_second)
+    sms._client = SimpleNamespace(messages=messages)
+    return sms
+
+
+def message(segments=1):
+    return RenderedMessage('x', 'GSM-7', segments)
+
+
+def test_daily_limit_counts_segments():
+    sms = service(FakeMessages(), per_day=5)
+    assert sms.send_message('invitation', '+15551230001', message(3))[1] == 'SENT'
+    # 3 + 3 would exceed 5 segments
+    assert sms.send_message('invitation', '+15551230002', message(3)) == (None, 'ERROR', 'Daily message limit exceeded')
+    assert sms.send_message('invitation', '+15551230003', message(2))[1] == 'SENT'
+    assert sms.daily_segment_count == 5
+
+
+def test_a_failed_send_gives_its_segments_back():
+    sms = service(FakeMessages(failing={'+15551230001'}), per_day=2)
+    assert sms.send_message('invitation', '+15551230001', message(2))[1] == 'ERROR'
+    assert sms.daily_segment_count == 0
+    assert sms.send_message('invitation', '+15551230002', message(2))[1] == 'SENT'
+
+
+def test_a_failed_confirmation_gives_its_segments_back():
+    sms = service(FakeMessages(failing={'+15551230001'}), per_day=10)
+    assert sms.send_confirmation('+15551230001', 'Party', 'YES')[0] is False
+    assert sms.daily_segment_count == 0
+    assert sms.send_confirmation('+15551230002', 'Party', 'YES') == (True, None)
+    assert sms.daily_segment_count == 1
+
+
+def test_concurrent_sends_never_overshoot_the_daily_limit():
+    messages = FakeMessages(delay=0.01)
+    sms = service(messages, per_day=10)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda n: sms.send_message('invitation', f"+1555123{n:04d}", message()), range(40)))
+
+    assert sum(1 for result in results if result[1] == 'SENT') == 10
+    assert len(messages.sent) == 10
+    assert sms.daily_segment_count == 10
+
+
+def test_per_second_refusal_releases_the_daily_reservation():
+    sms = service(FakeMessages(), per_day=10, per_second=2)
+    assert sms._check_rate_limits(2, '+15550000000') == (True, None)
+    assert sms._check_rate_limits(1, '+15550000000') == (False, "Per-second rate limit exceeded")
+    assert sms.daily_segment_count == 2